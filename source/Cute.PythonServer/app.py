@@ -1,23 +1,84 @@
 """
 This script runs the application using a development server.
 It contains the definition of routes and views for the application.
+In production, run it under gunicorn with `gunicorn -c gunicorn.conf.py app:app`.
+
+The metric modules are imported on the first request of their endpoint family (see startup.py).
 """
 
-import subprocess
+import io
+import time
+
+import startup
 
 from apiflask import APIFlask
-from flask import request, json
+from flask import Response, g, request, json, stream_with_context
 from pydantic.json import pydantic_encoder
+from werkzeug.exceptions import HTTPException
 
-from eval_generation import EvalGeneration
-from eval_seo import EvalSeo
-from eval_translation import EvalTranslation
+import requests
+
+import async_runner
+import extraction_cache
+import job_queue
+import llm_governor
+import result_cache
+import telemetry
+import wordnet_cache
 
 app = APIFlask(__name__, title="Cute Python Server")
 
 # Make the WSGI interface available at the top level so wfastcgi can get it.
 wsgi_app = app.wsgi_app
 
+NDJSON_BUFFER_SIZE = 1 << 16
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_labels = (request.endpoint or 'unmatched', (request.view_args or {}).get('measure', ''))
+    g.metrics_started = time.perf_counter()
+    telemetry.REQUESTS_IN_FLIGHT.labels(g.metrics_labels[0]).inc()
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if 'metrics_started' not in g:
+        return
+    endpoint, measure = g.metrics_labels
+    status = g.get('metrics_status', 500)
+    telemetry.REQUESTS_IN_FLIGHT.labels(endpoint).dec()
+    telemetry.REQUEST_SECONDS.labels(endpoint, measure).observe(time.perf_counter() - g.metrics_started)
+    telemetry.REQUESTS.labels(endpoint, measure, str(status)).inc()
+    if status >= 400:
+        telemetry.REQUEST_ERRORS.labels(endpoint, measure).inc()
+
+@telemetry.collector
+def cache_metrics():
+    wordnet = wordnet_cache.stats()
+    extractions = extraction_cache.stats()
+    caches = {"result": result_cache.stats(), "wordnet_synonyms": wordnet["Synonyms"], "wordnet_stems": wordnet["Stems"],
+              "faithfulness_truths": extractions["Truths"], "faithfulness_claims": extractions["Claims"]}
+    return [
+        ("cute_cache_hits_total", "counter", "Cache hits.",
+         [({"cache": name}, stats["Hits"]) for name, stats in caches.items()]),
+        ("cute_cache_misses_total", "counter", "Cache misses.",
+         [({"cache": name}, stats["Misses"]) for name, stats in caches.items()]),
+        ("cute_cache_hit_ratio", "gauge", "Cache hits over all lookups.",
+         [({"cache": name}, stats["Hit Rate"]) for name, stats in caches.items()]),
+    ]
+
+@app.errorhandler(TimeoutError)
+def evaluation_timeout(error):
+    return "Evaluation timed out", 504
+
+@app.errorhandler(requests.RequestException)
+def upstream_failure(error):
+    return f"Upstream API request failed: {error}", 502
 
 @app.get('/')
 def index():
@@ -27,36 +88,154 @@ def index():
 def health_check():
     return "Healthy"
 
+@app.get('/stats')
+def server_stats():
+    queue = job_queue.started()
+    return {
+        "WordNet Cache": wordnet_cache.stats(),
+        "Result Cache": result_cache.stats(),
+        "Extraction Cache": extraction_cache.stats(),
+        "LLM": llm_governor.stats(),
+        "Jobs": queue.stats() if queue is not None else None,
+        "Startup": startup.report()
+    }
+
+@app.get('/metrics')
+def prometheus_metrics():
+    return telemetry.render(), {'Content-Type': telemetry.CONTENT_TYPE}
+
 @app.post('/api/generator/<string:measure>')
 def execute_generator_command(measure:str):
 
+    if measure not in ('all', 'answer', 'faithfulness'):
+        return "Invalid generator option", 400
+
     payload = request.json
 
     options = payload['options']
 
     env = payload['env']
 
-    ensure_open_ai_is_used(env)
-    
-    generator = EvalGeneration(
-                options['llm-model'], 
-                options['threshold'], 
-                options['prompt-field'],
-                options['generated-content'],
-                options['reference-content'],
-                options['facts']
-            )
+    startup.load('generator')
+    from eval_generation import EvalGeneration
+    import model_registry
+
+    def evaluate():
+
+        generator = EvalGeneration(
+                    model_registry.get_model(env) or options['llm-model'], 
+                    options['threshold'], 
+                    options['prompt-field'],
+                    options['generated-content'],
+                    options['reference-content'],
+                    options['facts']
+                )
+
+        timeout = options.get('timeout')
+
+        match measure:
+
+            case 'all':
+                result, usage = async_runner.run(llm_governor.metered(generator.a_evaluate()), timeout)
+
+            case 'answer' | 'faithfulness':
+                result, usage = async_runner.run(llm_governor.metered(generator.a_measure(measure)), timeout)
+
+        return {**result, "Usage": usage.to_dict()}
+
+    return cached_response('generator', measure, options, {
+                'prompt-field': options['prompt-field'],
+                'generated-content': options['generated-content'],
+                'reference-content': options['reference-content'],
+                'facts': options['facts'],
+                'endpoint': env.get('Cute__OpenAiEndpoint'),
+                'deployment': env.get('Cute__OpenAiDeploymentName'),
+            }, evaluate, replay=lambda body: json.dumps(without_usage(json.loads(body))))
+
+
+@app.post('/api/generator/batch/<string:measure>')
+def execute_generator_batch_command(measure:str):
+
+    if measure not in ('all', 'answer', 'faithfulness'):
+        return "Invalid generator option", 400
+
+    payload = request.json
+
+    options = payload['options']
+
+    env = payload['env']
+
+    startup.load('generator')
+    from eval_generation import EvalGenerationBatch
+    import model_registry
+
+    # Records default to the request's prompt, reference and facts, which a content type usually shares
+    defaults = {field: options[field] for field in ('prompt-field', 'reference-content', 'facts') if field in options}
+
+    try:
+        mode, ttl = result_cache.cache_control(options)
+        items = list(validate_items(({**defaults, **item} for item in required_option(options, 'items')),
+                                    ('prompt-field', 'generated-content', 'reference-content', 'facts')))
+        batch = EvalGenerationBatch(
+                    model_registry.get_model(env) or required_option(options, 'llm-model'),
+                    required_option(options, 'threshold'),
+                    items,
+                    measure,
+                    int(options.get('concurrency', 16)),
+                    options.get('timeout'),
+                )
+    except ValueError as e:
+        return str(e), 400
+
+    result = batch.evaluate(*generator_cache(measure, options, env, mode, ttl))
+
+    return json.dumps(result, default=pydantic_encoder)
 
-    match measure:
 
-        case 'all':
-            result = generator.evaluate()
+@app.post('/api/pipeline/<string:measure>')
+def execute_pipeline_command(measure:str):
 
-        case 'answer' | 'faithfulness':
-            result = generator.measure(measure)
+    if measure not in ('all', 'answer', 'faithfulness'):
+        return "Invalid pipeline option", 400
 
-        case _:
-            return "Invalid generator option", 400
+    payload = request.json
+
+    options = payload['options']
+
+    env = payload['env']
+
+    startup.load('translator')
+    startup.load('generator')
+    from eval_pipeline import EvalPipeline
+    import model_registry
+
+    # Records default to the request's prompt, reference and facts, as in generator batches
+    defaults = {field: options[field] for field in ('prompt-field', 'reference-content', 'facts') if field in options}
+
+    try:
+        mode, ttl = result_cache.cache_control(options)
+        items = list(validate_items(({**defaults, **item} for item in required_option(options, 'items')),
+                                    ('prompt-field', 'generated-content', 'reference-content', 'facts')))
+        pipeline = EvalPipeline(
+                    model_registry.get_model(env) or required_option(options, 'llm-model'),
+                    required_option(options, 'threshold'),
+                    items,
+                    measure,
+                    options.get('lexical', 'gleu'),
+                    float(options.get('reject-below', 0.1)),
+                    float(options.get('accept-above', 0.9)),
+                    int(options.get('min-words', 1)),
+                    float(options.get('max-length-ratio', 4.0)),
+                    options.get('language', 'english'),
+                    options.get('detect-language', True),
+                    options.get('tokenizer', 'simple'),
+                    int(options.get('concurrency', 16)),
+                    options.get('timeout'),
+                )
+    except ValueError as e:
+        return str(e), 400
+
+    result = pipeline.evaluate(*generator_cache(measure, options, env, mode, ttl))
 
     return json.dumps(result, default=pydantic_encoder)
 
@@ -64,28 +243,163 @@ def execute_generator_command(measure:str):
 @app.post('/api/translator/<string:measure>')
 def execute_translator_command(measure:str):
 
+    if measure not in ('all', 'gleu', 'meteor', 'lepor'):
+        return "Invalid translator option", 400
+
     payload = request.json
 
     options = payload['options']
 
-    translator = EvalTranslation(
-                options['llm-model'], 
-                options['threshold'], 
-                options['prompt-field'],
-                options['generated-content'],
-                options['reference-content'],
+    try:
+        worst = int(options.get('worst', 5))
+    except ValueError as e:
+        return str(e), 400
+
+    startup.load('translator')
+    import translation_scoring
+
+    def evaluate():
+
+        if options.get('segment'):
+            return evaluate_segments()
+
+        match measure:
+
+            case 'all':
+                # Only the combined evaluation goes through DeepEval
+                from eval_translation import EvalTranslation
+
+                translator = EvalTranslation(
+                            options['llm-model'], 
+                            options['threshold'], 
+                            options['prompt-field'],
+                            options['generated-content'],
+                            options['reference-content'],
+                            options.get('tokenizer', 'simple'),
+                            options.get('language', 'english'),
+                        )
+
+                return translator.evaluate()
+
+            case 'gleu' | 'meteor' | 'lepor':
+                return translation_scoring.score_pair(
+                            measure,
+                            options['threshold'],
+                            options.get('tokenizer', 'simple'),
+                            options.get('language', 'english'),
+                            options['generated-content'],
+                            options['reference-content'],
+                        )
+
+    def evaluate_segments():
+        from segment_scoring import EvalTranslationSegments
+
+        mode, ttl = result_cache.cache_control(options)
+
+        def segment_key(name: str, generated: str, reference: str) -> str:
+            # Segment scores do not depend on the threshold, so they are shared across thresholds and measures
+            return result_cache.cache_key('translator', f'segment-{name.lower()}', None, None, {
+                        'generated-content': generated,
+                        'reference-content': reference,
+                        'tokenizer': options.get('tokenizer', 'simple'),
+                        'language': options.get('language', 'english'),
+                    })
+
+        def lookup(name: str, generated: str, reference: str) -> float | None:
+            body = result_cache.lookup(segment_key(name, generated, reference), mode)
+            return json.loads(body) if body is not None else None
+
+        def store(name: str, generated: str, reference: str, score: float):
+            result_cache.store(segment_key(name, generated, reference), json.dumps(score), mode, ttl)
+
+        translator = EvalTranslationSegments(
+                    options['threshold'],
+                    options['generated-content'],
+                    options['reference-content'],
+                    options.get('tokenizer', 'simple'),
+                    options.get('language', 'english'),
+                    worst,
+                )
+
+        return translator.evaluate(measure, lookup, store)
+
+    inputs = {
+                'generated-content': options['generated-content'],
+                'reference-content': options['reference-content'],
+                'tokenizer': options.get('tokenizer', 'simple'),
+                'language': options.get('language', 'english'),
+            }
+    if options.get('segment'):
+        # Segmented results have another shape, so they get their own entries
+        inputs.update(segment=True, worst=worst)
+
+    try:
+        return cached_response('translator', measure, options, inputs, evaluate)
+    except ValueError as e:
+        return str(e), 400
+
+
+@app.post('/api/translator/batch/<string:measure>')
+def execute_translator_batch_command(measure:str):
+
+    if measure not in ('all', 'gleu', 'meteor', 'lepor'):
+        return "Invalid translator option", 400
+
+    try:
+        options, items = read_batch_payload()
+        threshold = float(options.get('threshold', 0.5))
+    except ValueError as e:
+        return str(e), 400
+
+    startup.load('translator')
+    from translation_scoring import EvalTranslationBatch
+
+    translator = EvalTranslationBatch(
+                options.get('llm-model'),
+                threshold,
+                validate_items(items, ('generated-content', 'reference-content')),
+                options.get('tokenizer', 'simple'),
+                options.get('language', 'english'),
             )
 
-    match measure:
+    if wants_stream(options):
+        return stream_ndjson(translator.iter_results(measure), translator.summary)
+
+    try:
+        result = translator.evaluate(measure)
+    except ValueError as e:
+        return str(e), 400
+
+    return json.dumps(result, default=pydantic_encoder)
+
 
-        case 'all':
-            result = translator.evaluate()
+@app.post('/api/translator/corpus')
+def execute_translator_corpus_command():
 
-        case 'gleu' | 'meteor' | 'lepor':
-            result = translator.measure(measure)
+    try:
+        options, items = read_batch_payload()
+        threshold = float(options.get('threshold', 0.5))
+    except ValueError as e:
+        return str(e), 400
+
+    startup.load('translator')
+    from corpus_scoring import EvalTranslationCorpus
+
+    translator = EvalTranslationCorpus(
+                threshold,
+                validate_items(items, ('generated-content', 'reference-content')),
+                options.get('tokenizer', 'simple'),
+                options.get('language', 'english'),
+            )
 
-        case _:
-            return "Invalid translator option", 400
+    try:
+        result = translator.evaluate(
+                    int(options.get('bootstrap', 1000)),
+                    float(options.get('confidence', 0.95)),
+                    int(options['seed']) if 'seed' in options else None,
+                )
+    except ValueError as e:
+        return str(e), 400
 
     return json.dumps(result, default=pydantic_encoder)
 
@@ -97,36 +411,315 @@ def execute_seo_command():
 
     options = payload['options']
 
-    seoEvaluator = EvalSeo(
-                options['seo-input-method'], 
-                options['keyword'], 
-                options['related-keywords'],
-                options['threshold'],
+    startup.load('seo')
+    from eval_seo import EvalSeo, SEO_BACKENDS, default_backend
+
+    backend = options.get('seo-backend', default_backend())
+    if backend not in SEO_BACKENDS:
+        return f"Invalid SEO backend '{backend}'", 400
+
+    def evaluate():
+
+        seoEvaluator = EvalSeo(
+                    options['seo-input-method'], 
+                    options['keyword'], 
+                    options['related-keywords'],
+                    options['threshold'],
+                    backend,
+                )
+
+        return seoEvaluator.measure()
+
+    return cached_response('seo', 'all', options, {
+                'seo-input-method': options['seo-input-method'],
+                'keyword': options['keyword'],
+                'related-keywords': options['related-keywords'],
+                'seo-backend': backend,
+            }, evaluate)
+
+
+@app.post('/api/seo/batch')
+def execute_seo_batch_command():
+
+    try:
+        options, items = read_batch_payload()
+    except ValueError as e:
+        return str(e), 400
+
+    startup.load('seo')
+    from eval_seo import EvalSeoBatch, SEO_BACKENDS, default_backend
+
+    backend = options.get('seo-backend', default_backend())
+    if backend not in SEO_BACKENDS:
+        return f"Invalid SEO backend '{backend}'", 400
+
+    try:
+        mode, ttl = result_cache.cache_control(options)
+        threshold = float(required_option(options, 'threshold'))
+        concurrency = int(options['concurrency']) if 'concurrency' in options else None
+        worst = int(options.get('worst', 5))
+        items = list(validate_items(items, ('seo-input-method',)))
+    except ValueError as e:
+        return str(e), 400
+
+    def measure_page(item: dict, keyword: str, related_keywords: str) -> dict:
+        # Pages share cache entries with /api/seo, so re-auditing a site only analyzes changed pages
+        key = result_cache.cache_key('seo', 'all', options.get('llm-model'), options.get('threshold'), {
+                    'seo-input-method': item['seo-input-method'],
+                    'keyword': keyword,
+                    'related-keywords': related_keywords,
+                    'seo-backend': backend,
+                })
+        body, hit = result_cache.cached(key, mode, ttl, lambda: json.dumps(
+                    batch.measure_page(item, keyword, related_keywords), default=pydantic_encoder))
+        return json.loads(body)
+
+    batch = EvalSeoBatch(
+                items,
+                options.get('keyword'),
+                options.get('related-keywords'),
+                threshold,
+                concurrency,
+                worst,
+                backend,
             )
 
-    result = seoEvaluator.measure()
+    result = batch.evaluate(measure_page)
 
     return json.dumps(result, default=pydantic_encoder)
 
 
-def ensure_open_ai_is_used(env):
-    subprocess.run(["deepeval", "set-azure-openai" ,
-                "--openai-api-key", env['Cute__OpenAiApiKey'], 
-                "--openai-endpoint", env['Cute__OpenAiEndpoint'], 
-                "--deployment-name", env['Cute__OpenAiDeploymentName'],
-                "--openai-api-version", '2024-07-01-preview'
-            ])
-    
-    # ensure code preceding this is run only once
-    ensure_open_ai_is_used.__code__ = (lambda env: None).__code__
+@app.post('/api/jobs/<path:endpoint>')
+def submit_job(endpoint: str):
+
+    if job_endpoint(endpoint) is None:
+        return f"Invalid job endpoint '{endpoint}'", 400
+
+    payload = request.json
+
+    try:
+        priority = int(payload.get('options', {}).get('priority', 0))
+        status = job_queue.get_queue(run_job).submit(endpoint, endpoint.split('/')[0], payload, priority)
+    except ValueError as e:
+        return str(e), 400
+    except job_queue.QueueFull as e:
+        return str(e), 429, {'Retry-After': '5'}
+
+    return json.dumps(status), 202, {'Location': f"/api/jobs/{status['Id']}"}
+
+
+@app.get('/api/jobs')
+def list_jobs():
+    try:
+        return json.dumps(job_queue.get_queue(run_job).recent(request.args.get('status'),
+                                                             int(request.args.get('limit', 100))))
+    except ValueError as e:
+        return str(e), 400
+
+
+@app.get('/api/jobs/<string:job_id>')
+def get_job(job_id: str):
+    try:
+        status = job_queue.get_queue(run_job).get(job_id, int(request.args.get('offset', 0)))
+    except ValueError as e:
+        return str(e), 400
+    if status is None:
+        return "Job not found", 404
+    return json.dumps(status)
+
+
+@app.delete('/api/jobs/<string:job_id>')
+def cancel_job(job_id: str):
+    status = job_queue.get_queue(run_job).cancel(job_id)
+    if status is None:
+        return "Job not found", 404
+    return json.dumps(status)
+
+
+JOB_ENDPOINTS = ('execute_generator_command', 'execute_generator_batch_command', 'execute_pipeline_command',
+                 'execute_translator_command', 'execute_translator_batch_command', 'execute_translator_corpus_command',
+                 'execute_seo_command', 'execute_seo_batch_command')
+
+
+def job_endpoint(endpoint: str) -> str | None:
+    """
+    Gets the view an API path relative to /api is served by, if it is an evaluation that can run as a job.
+    """
+    try:
+        view, _ = app.url_map.bind('localhost').match(f"/api/{endpoint}", method='POST')
+    except HTTPException:
+        return None
+    return view if view in JOB_ENDPOINTS else None
+
+
+def run_job(job: job_queue.Job) -> dict:
+    """
+    Runs a job by dispatching its request to the evaluation endpoint. Batch translator jobs are streamed, so
+    each item's result is stored as it completes and a cancelled job stops at the next item.
+    """
+    payload = job.payload
+    streamed = job_endpoint(job.endpoint) == 'execute_translator_batch_command'
+    if streamed:
+        payload = dict(payload, options=dict(payload['options'], stream=True))
+
+    with app.test_request_context(f"/api/{job.endpoint}", method='POST', json=payload):
+        response = app.full_dispatch_request()
+        try:
+            if streamed and response.mimetype == 'application/x-ndjson':
+                for line in response.response:
+                    result = json.loads(line)
+                    if "Summary" in result:
+                        if "Error" in result:
+                            raise ValueError(result["Error"])
+                        return {"Summary": result["Summary"]}
+                    job.add_result(result)
+                    if job.cancelled():
+                        raise job_queue.JobCancelled()
+
+            body = response.get_data(as_text=True)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{response.status_code} {body}")
+            return json.loads(body)
+        finally:
+            response.close()
+
+
+def cached_response(endpoint: str, measure: str, options: dict, inputs: dict, evaluate, replay=None):
+    """
+    Returns the serialized result of an evaluation, from the result cache when an identical
+    evaluation was cached earlier. The X-Cache response header reports HIT or MISS, and replay
+    (if given) rewrites a cached body before it is returned.
+    """
+    try:
+        mode, ttl = result_cache.cache_control(options)
+    except ValueError as e:
+        return str(e), 400
+
+    key = result_cache.cache_key(endpoint, measure, options.get('llm-model'), options.get('threshold'), inputs)
+
+    body, hit = result_cache.cached(key, mode, ttl, lambda: json.dumps(evaluate(), default=pydantic_encoder))
+
+    if hit and replay:
+        body = replay(body)
+
+    return body, {'X-Cache': 'HIT' if hit else 'MISS'}
+
+
+def without_usage(result: dict) -> dict:
+    """
+    Zeroes the LLM usage of a cached generator result, which made no calls for this request.
+    """
+    if "Usage" in result:
+        result["Usage"] = llm_governor.Usage().to_dict()
+    return result
+
+
+def generator_cache(measure: str, options: dict, env: dict, mode: str, ttl: float):
+    """
+    Returns the functions looking up and storing the result of a generator record. Records share cache entries
+    with /api/generator, so re-evaluating a content type only measures changed entries.
+    """
+    def item_key(item: dict) -> str:
+        return result_cache.cache_key('generator', measure, options.get('llm-model'), options.get('threshold'), {
+                    'prompt-field': item['prompt-field'],
+                    'generated-content': item['generated-content'],
+                    'reference-content': item['reference-content'],
+                    'facts': item['facts'],
+                    'endpoint': env.get('Cute__OpenAiEndpoint'),
+                    'deployment': env.get('Cute__OpenAiDeploymentName'),
+                })
+
+    def lookup(item: dict) -> dict | None:
+        body = result_cache.lookup(item_key(item), mode)
+        return without_usage(json.loads(body)) if body is not None else None
+
+    def store(item: dict, result: dict):
+        result_cache.store(item_key(item), json.dumps(result, default=pydantic_encoder), mode, ttl)
+
+    return lookup, store
+
+
+def read_batch_payload():
+    """
+    Reads the options and items of a batch request. The body is either JSON with the items
+    in options['items'], or NDJSON with one item per line and the options in the query string.
+    NDJSON items are parsed lazily as the body is read. Raises ValueError without items.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        options = request.args.to_dict()
+        # The WSGI input stream is unbuffered, so iterating it directly reads the body byte by byte
+        stream = io.BufferedReader(request.stream, NDJSON_BUFFER_SIZE)
+        items = (json.loads(line) for line in stream if line.strip())
+        return options, items
+
+    payload = request.json
+
+    options = payload.get('options') if isinstance(payload, dict) else None
+
+    return options, required_option(options, 'items')
+
+
+def required_option(options: dict, name: str):
+    """
+    Gets a required option, raising ValueError (answered with 400) when it is missing.
+    """
+    if not isinstance(options, dict) or name not in options:
+        raise ValueError(f"Missing required option '{name}'")
+    return options[name]
+
+
+def validate_items(items, required: tuple[str, ...]):
+    """
+    Passes batch items through, raising ValueError at the first item missing a required field.
+    """
+    for index, item in enumerate(items):
+        missing = [field for field in required if field not in item]
+        if missing:
+            raise ValueError(f"Item {index} requires {', '.join(repr(field) for field in missing)}")
+        yield item
+
+
+def wants_stream(options: dict) -> bool:
+    """
+    Checks whether the caller opted in to a streamed NDJSON response, with options['stream'],
+    the 'stream' query parameter or an Accept header of application/x-ndjson.
+    """
+    stream = options.get('stream', request.args.get('stream', False))
+    if isinstance(stream, str):
+        stream = stream.lower() in ('1', 'true', 'yes')
+    return bool(stream) or request.accept_mimetypes.best == 'application/x-ndjson'
 
 
-# this port setting seems to be ignored - investigate later..
+def stream_ndjson(results, summary):
+    """
+    Streams results as NDJSON, one line per item as it completes, followed by a final
+    {"Summary": ...} line, or an {"Error": ...} line if the evaluation fails part way.
+    """
+    def lines():
+        try:
+            for result in results:
+                yield json.dumps(result, default=pydantic_encoder) + '\n'
+            yield json.dumps({"Summary": summary()}, default=pydantic_encoder) + '\n'
+        except ValueError as e:
+            yield json.dumps({"Error": str(e), "Summary": summary()}, default=pydantic_encoder) + '\n'
+
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+
+# Load the endpoint families configured with CUTE_WARM_UP; all others load on their first request.
+startup.warm_up()
+# Continue the jobs queued before a restart
+job_queue.resume(run_job)
+startup.mark_ready()
+app.logger.info("Startup: %s", startup.report())
+
+
+# Development server only: `flask run` does not execute this block, and production deployments run
+# the app under gunicorn (see gunicorn.conf.py).
 if __name__ == '__main__':
     import os
+    import settings
     HOST = os.environ.get('SERVER_HOST', 'localhost')
-    try:
-        PORT = int(os.environ.get('SERVER_PORT', '5555'))
-    except ValueError:
-        PORT = 5555
-    app.run(host=HOST, port=PORT, debug=True)
+    PORT = settings.int_setting('SERVER_PORT', 5555)
+    DEBUG = os.environ.get('SERVER_DEBUG', 'false').lower() in ('1', 'true', 'yes')
+    app.run(host=HOST, port=PORT, debug=DEBUG)
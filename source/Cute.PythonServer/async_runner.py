@@ -0,0 +1,78 @@
+"""
+Shared asyncio event loop for the LLM-backed metrics.
+
+Request threads hand their coroutines to one event loop running on a background thread, so many generator
+evaluations can wait on LLM latency at the same time while a global limiter bounds the outbound LLM calls.
+
+    CUTE_LLM_CONCURRENCY  Maximum number of LLM-backed metric measurements in flight (default: 32).
+    CUTE_LLM_TIMEOUT      Default timeout of a generator evaluation in seconds (default: 120).
+"""
+
+import asyncio
+import threading
+
+from contextlib import asynccontextmanager
+
+import settings
+
+_loop = None
+_loop_lock = threading.Lock()
+_limiter = None
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Gets the shared event loop, starting its thread on first use.
+
+    Returns:
+        asyncio.AbstractEventLoop: The running event loop.
+    """
+    global _loop
+
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="cute-async-runner", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run(coroutine, timeout: float = None):
+    """
+    Runs a coroutine on the shared event loop and waits for its result.
+
+    Args:
+        coroutine: The coroutine to run.
+        timeout (float): Seconds after which the coroutine is cancelled and TimeoutError is raised.
+            Defaults to CUTE_LLM_TIMEOUT.
+
+    Returns:
+        The result of the coroutine.
+    """
+    timeout = default_timeout() if timeout is None else timeout
+    future = asyncio.run_coroutine_threadsafe(asyncio.wait_for(coroutine, timeout), get_loop())
+    return future.result()
+
+
+@asynccontextmanager
+async def llm_slot():
+    """
+    Holds one of the global LLM concurrency slots for the duration of the block.
+    """
+    global _limiter
+
+    if _limiter is None:
+        _limiter = asyncio.Semaphore(settings.int_setting('CUTE_LLM_CONCURRENCY', 32))
+    async with _limiter:
+        yield
+
+
+def default_timeout() -> float:
+    """
+    Gets the default timeout of a generator evaluation.
+
+    Returns:
+        float: The timeout in seconds.
+    """
+    return float(settings.int_setting('CUTE_LLM_TIMEOUT', 120))
@@ -0,0 +1,725 @@
+"""
+Benchmark suite of the Cute Python Server.
+
+Times the translation metrics (each DeepEval metric class in eval_translation and the batch scoring path) on
+synthetic and multilingual corpora of several sizes and sentence lengths, the indexed hLEPOR engine against the
+hlepor package on long documents (checking that both score the corpora alike), the SEO metric against a local stub of
+the SEO Review Tools API and with the local analyzer, the generator metrics against a mock Azure OpenAI endpoint
+(and one throttling calls like a deployment over its rate limit), and the latency percentiles and throughput of
+every route of the app served over HTTP. Results are written as JSON so runs on different commits can be compared:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json
+    python benchmark.py --compare before.json after.json
+
+Corpora are generated from a fixed seed and the stubs answer locally (the mock LLM after --llm-latency seconds),
+so the timings measure this server and not the network. Use --quick for a short smoke run and --suite to run
+only some suites. A benchmark that fails records its error and the run continues.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+from importlib import metadata
+
+from stub_server import start_stub
+
+FORMAT_VERSION = 1
+SUITES = ("translation", "lepor", "seo", "generator", "http")
+PACKAGES = ("deepeval", "nltk", "hlepor", "numpy", "flask", "apiflask", "lxml", "requests")
+
+SIZES = (100, 1000)
+QUICK_SIZES = (20,)
+SENTENCE_LENGTHS = {"short": (5, 12), "long": (30, 60)}
+DOCUMENT_WORDS = (1000, 5000)
+LEPOR_TOLERANCE = 1e-9
+
+SENTENCES = {
+    "english": [
+        "The committee approved the new budget after a long debate.",
+        "Please restart the application before installing the update.",
+        "Our office will be closed on Monday for the public holiday.",
+        "The train to the airport leaves every fifteen minutes.",
+        "She translated the contract into three languages last week.",
+        "Customers can return unused items within thirty days of purchase.",
+        "The weather is expected to improve by the end of the week.",
+        "All passwords must contain at least twelve characters.",
+    ],
+    "spanish": [
+        "El comité aprobó el nuevo presupuesto después de un largo debate.",
+        "Reinicie la aplicación antes de instalar la actualización.",
+        "Nuestra oficina estará cerrada el lunes por el día festivo.",
+        "El tren al aeropuerto sale cada quince minutos.",
+        "Ella tradujo el contrato a tres idiomas la semana pasada.",
+        "Los clientes pueden devolver artículos sin usar dentro de los treinta días posteriores a la compra.",
+        "Se espera que el tiempo mejore a finales de la semana.",
+        "Todas las contraseñas deben tener al menos doce caracteres.",
+    ],
+    "german": [
+        "Der Ausschuss hat den neuen Haushalt nach einer langen Debatte genehmigt.",
+        "Bitte starten Sie die Anwendung neu, bevor Sie das Update installieren.",
+        "Unser Büro bleibt am Montag wegen des Feiertags geschlossen.",
+        "Der Zug zum Flughafen fährt alle fünfzehn Minuten.",
+        "Sie hat den Vertrag letzte Woche in drei Sprachen übersetzt.",
+        "Kunden können unbenutzte Artikel innerhalb von dreißig Tagen nach dem Kauf zurückgeben.",
+        "Das Wetter soll sich bis zum Ende der Woche bessern.",
+        "Alle Passwörter müssen mindestens zwölf Zeichen enthalten.",
+    ],
+    "french": [
+        "Le comité a approuvé le nouveau budget après un long débat.",
+        "Veuillez redémarrer l'application avant d'installer la mise à jour.",
+        "Notre bureau sera fermé lundi pour le jour férié.",
+        "Le train pour l'aéroport part toutes les quinze minutes.",
+        "Elle a traduit le contrat en trois langues la semaine dernière.",
+        "Les clients peuvent retourner les articles inutilisés dans les trente jours suivant l'achat.",
+        "Le temps devrait s'améliorer d'ici la fin de la semaine.",
+        "Tous les mots de passe doivent contenir au moins douze caractères.",
+    ],
+}
+
+KEYWORD = "coffee"
+RELATED_KEYWORDS = "espresso, roast, beans"
+PAGE_SIZES = {"small": 5, "medium": 50, "large": 500}
+
+
+###############################################################################################################
+# Corpora
+###############################################################################################################
+def perturb(tokens: list[str], rng: random.Random, vocabulary: list[str], rate: float = 0.2) -> list[str]:
+    """
+    Introduces typical translation errors into a reference: substituted, dropped and swapped words.
+    """
+    output = []
+    for token in tokens:
+        roll = rng.random()
+        if roll < rate / 2:
+            output.append(rng.choice(vocabulary))
+        elif roll < rate * 3 / 4:
+            continue
+        else:
+            output.append(token)
+    if len(output) > 2 and rng.random() < rate:
+        i = rng.randrange(len(output) - 1)
+        output[i], output[i + 1] = output[i + 1], output[i]
+    return output
+
+
+def synthetic_corpus(size: int, length: tuple[int, int], seed: int) -> list[tuple[str, str]]:
+    """
+    Generates (generated, reference) pairs of pseudo-words with sentence lengths in the given range.
+    """
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ten", "dra", "su", "ve", "pon", "ri", "sha", "ul", "be"]
+    vocabulary = sorted({"".join(rng.choices(syllables, k=rng.randint(1, 4))) for _ in range(5000)})
+    pairs = []
+    for _ in range(size):
+        reference = rng.choices(vocabulary, k=rng.randint(*length))
+        pairs.append((" ".join(perturb(reference, rng, vocabulary)), " ".join(reference)))
+    return pairs
+
+
+def multilingual_corpus(language: str, size: int, seed: int) -> list[tuple[str, str]]:
+    """
+    Generates (generated, reference) pairs from real sentences of a language, one to three sentences each.
+    """
+    rng = random.Random(seed)
+    sentences = SENTENCES[language]
+    vocabulary = sorted({word for sentence in sentences for word in sentence.split()})
+    pairs = []
+    for _ in range(size):
+        reference = " ".join(rng.sample(sentences, rng.randint(1, 3))).split()
+        pairs.append((" ".join(perturb(reference, rng, vocabulary)), " ".join(reference)))
+    return pairs
+
+
+def corpora(sizes: tuple[int, ...], seed: int):
+    """
+    Yields the benchmark corpora as (parameters, pairs).
+    """
+    for size in sizes:
+        for length, bounds in SENTENCE_LENGTHS.items():
+            yield {"Corpus": "synthetic", "Length": length, "Language": "english", "Size": size}, \
+                synthetic_corpus(size, bounds, seed)
+        for language in SENTENCES:
+            yield {"Corpus": "multilingual", "Language": language, "Size": size}, \
+                multilingual_corpus(language, size, seed)
+
+
+def long_document(words: int, seed: int) -> tuple[list[str], list[str]]:
+    """
+    Generates a (generated, reference) pair of lowercase tokens of real English sentences, about the given length.
+    """
+    rng = random.Random(seed)
+    sentences = [sentence.lower().split() for sentence in SENTENCES["english"]]
+    vocabulary = sorted({word for sentence in sentences for word in sentence})
+    reference = []
+    while len(reference) < words:
+        reference += rng.choice(sentences)
+    return perturb(reference, rng, vocabulary), reference
+
+
+def html_page(paragraphs: int, seed: int) -> str:
+    """
+    Generates an HTML page about the benchmark keyword with the given number of paragraphs.
+    """
+    rng = random.Random(seed)
+    words = " ".join(SENTENCES["english"]).lower().replace(".", "").split() + KEYWORD.split() + ["espresso", "roast"]
+    body = []
+    for i in range(paragraphs):
+        if i % 5 == 0:
+            body.append(f"<h2>{KEYWORD.title()} guide part {i // 5 + 1}</h2>")
+        body.append(f"<p>{' '.join(rng.choices(words, k=60))} <a href='/page-{i}'>more</a></p>")
+        if i % 10 == 0:
+            body.append(f"<img src='/images/{KEYWORD}-{i}.jpg' alt='{KEYWORD} {i}'>")
+    return (f"<html><head><title>The {KEYWORD} guide</title>"
+            f"<meta name='description' content='Everything about {KEYWORD}, from beans to espresso.'></head>"
+            f"<body><h1>{KEYWORD.title()}</h1>{''.join(body)}</body></html>")
+
+
+###############################################################################################################
+# Local stubs
+###############################################################################################################
+def start_seo_stub() -> ThreadingHTTPServer:
+    """
+    Starts a stub of the SEO Review Tools API answering every analysis with the same realistic result.
+    """
+    import seo_analyzer
+
+    data = seo_analyzer.analyze(html_page(PAGE_SIZES["medium"], 0), KEYWORD, RELATED_KEYWORDS)
+    return start_stub(lambda body: {"status": "ok", "data": data})
+
+
+def start_llm_stub(latency: float, capacity: int = 0) -> ThreadingHTTPServer:
+    """
+    Starts a mock Azure OpenAI chat completions endpoint answering with JSON that fits every DeepEval schema
+    used by the generator metrics. With a capacity, calls beyond that many in flight are throttled with 429 and
+    a Retry-After like a deployment over its rate limit.
+    """
+    content = json.dumps({
+        "statements": ["The answer names the capital.", "The answer gives its population."],
+        "truths": ["Paris is the capital of France."],
+        "claims": ["Paris is the capital of France.", "Paris has two million inhabitants."],
+        "verdicts": [{"verdict": "yes", "reason": "Supported."}, {"verdict": "yes", "reason": "Supported."}],
+        "reason": "The output is relevant and supported by the context."
+    })
+
+    in_flight = [0]
+    lock = threading.Lock()
+
+    def reply(body: bytes) -> dict | tuple:
+        with lock:
+            if capacity and in_flight[0] >= capacity:
+                return 429, {"error": {"code": "429", "message": "Rate limit exceeded."}}, {"retry-after-ms": "100"}
+            in_flight[0] += 1
+        try:
+            time.sleep(latency)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+        return {
+            "id": "benchmark", "object": "chat.completion", "created": 0, "model": "benchmark",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(body) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(body) + len(content)) // 4}
+        }
+
+    return start_stub(reply)
+
+
+def llm_env(server: ThreadingHTTPServer, deployment: str = "benchmark") -> dict:
+    """
+    Gets the request environment pointing the model registry at the mock LLM.
+    """
+    return {
+        "Cute__OpenAiEndpoint": f"http://127.0.0.1:{server.server_port}",
+        "Cute__OpenAiDeploymentName": deployment,
+        "Cute__OpenAiApiKey": "benchmark",
+    }
+
+
+###############################################################################################################
+# Measurement
+###############################################################################################################
+class Results:
+    """
+    Collects benchmark results in the output format.
+    """
+
+    def __init__(self):
+        self.items = []
+
+    def add(self, suite: str, name: str, parameters: dict, latencies: list[float], elapsed: float, items: int,
+            statuses: dict = None):
+        """
+        Adds the timings of a benchmark.
+
+        Args:
+            suite (str): The suite of the benchmark.
+            name (str): The benchmark name.
+            parameters (dict): The parameters distinguishing the benchmark from others with the same name.
+            latencies (list[float]): Seconds taken by each timed operation.
+            elapsed (float): Wall clock seconds of all operations.
+            items (int): Items processed by all operations, for the throughput.
+            statuses (dict): Number of HTTP responses per status code.
+        """
+        result = {
+            "Suite": suite,
+            "Name": name,
+            "Parameters": parameters,
+            "Count": len(latencies),
+            "Items": items,
+            "Seconds": round(elapsed, 6),
+            "Throughput": round(items / elapsed, 3) if elapsed > 0 else None,
+            "Latency": latency_summary(latencies)
+        }
+        if statuses is not None:
+            result["Statuses"] = statuses
+            failed = sum(count for status, count in statuses.items() if not status.startswith("2"))
+            if failed:
+                result["Error"] = f"{failed} of {len(latencies)} responses had an error status"
+        self.items.append(result)
+        print(f"{suite:12} {name:32} {json.dumps(parameters, sort_keys=True):70} "
+              f"{result['Throughput']} items/s {result.get('Error', '')}", file=sys.stderr)
+
+    def agreement(self, suite: str, name: str, parameters: dict, differences: list[float], tolerance: float):
+        """
+        Adds the differences between two implementations of a score, with an error beyond the tolerance.
+        """
+        result = {
+            "Suite": suite,
+            "Name": name,
+            "Parameters": parameters,
+            "Count": len(differences),
+            "Max Difference": max(differences, default=0.0)
+        }
+        if result["Max Difference"] > tolerance:
+            result["Error"] = f"Scores differ by up to {result['Max Difference']:.3g}"
+        self.items.append(result)
+        print(f"{suite:12} {name:32} {json.dumps(parameters, sort_keys=True):70} "
+              f"max difference {result['Max Difference']:.3g} {result.get('Error', '')}", file=sys.stderr)
+
+    def fail(self, suite: str, name: str, parameters: dict, error: Exception):
+        """
+        Records a benchmark that could not run.
+        """
+        # Collapse multi-line messages such as NLTK's missing resource banners
+        message = f"{type(error).__name__}: {' '.join(str(error).replace('*', ' ').split())}"[:300]
+        self.items.append({"Suite": suite, "Name": name, "Parameters": parameters, "Error": message})
+        print(f"{suite:12} {name:32} {json.dumps(parameters, sort_keys=True):70} failed: {message}", file=sys.stderr)
+
+    def run(self, suite: str, name: str, parameters: dict, operations: list, repeat: int = 1, items_per_operation: int = 1):
+        """
+        Runs and times operations one after another, after running the first one once as a warm-up.
+
+        Args:
+            suite (str): The suite of the benchmark.
+            name (str): The benchmark name.
+            parameters (dict): The parameters of the benchmark.
+            operations (list): Functions without arguments, each timed separately.
+            repeat (int): How many times the operations are run.
+            items_per_operation (int): Items processed by each operation.
+        """
+        try:
+            if operations:
+                operations[0]()
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for operation in operations:
+                    begin = time.perf_counter()
+                    operation()
+                    latencies.append(time.perf_counter() - begin)
+            elapsed = time.perf_counter() - started
+        except Exception as e:
+            self.fail(suite, name, parameters, e)
+            return
+        self.add(suite, name, parameters, latencies, elapsed, len(latencies) * items_per_operation)
+
+
+def latency_summary(latencies: list[float]) -> dict:
+    """
+    Summarizes latencies in seconds: mean, percentiles and maximum.
+    """
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 6)
+
+    return {
+        "Mean": round(sum(ordered) / len(ordered), 6),
+        "P50": percentile(50),
+        "P90": percentile(90),
+        "P99": percentile(99),
+        "Max": round(ordered[-1], 6)
+    }
+
+
+###############################################################################################################
+# Suites
+###############################################################################################################
+def bench_translation(results: Results, settings: argparse.Namespace):
+    """
+    Times each translation metric class on every corpus, one test case at a time, and the batch scoring path
+    used by the batch endpoint on the whole corpus at once.
+    """
+    from deepeval.test_case import LLMTestCase
+
+    import eval_translation
+    import translation_scoring
+
+    classes = {
+        "GLEU": eval_translation.GleuMetric,
+        "METEOR": eval_translation.MeteorMetric,
+        "LEPOR": eval_translation.LeporMetric,
+    }
+
+    for parameters, pairs in corpora(settings.sizes, settings.seed):
+        cases = [LLMTestCase(input="", actual_output=generated, expected_output=reference)
+                 for generated, reference in pairs]
+
+        for name, metric_class in classes.items():
+            metric = metric_class(0.5)
+            results.run("translation", f"{metric_class.__name__}.measure", parameters,
+                        [lambda case=case: metric.measure(case) for case in cases], settings.repeat)
+
+            results.run("translation", f"score_pairs[{name.lower()}]", parameters,
+                        [lambda: translation_scoring.score_pairs(name.lower(), 0.5, "simple", parameters["Language"], pairs)],
+                        settings.repeat, len(pairs))
+
+
+def bench_lepor(results: Results, settings: argparse.Namespace):
+    """
+    Times the indexed hLEPOR engine and the hlepor package on long documents, and compares their scores on every
+    corpus pair.
+    """
+    import lepor_engine
+    from hlepor import single_hlepor_score
+
+    def package_score(reference: list[str], hypothesis: list[str]) -> float:
+        return float(single_hlepor_score(" ".join(reference), " ".join(hypothesis),
+                                         preprocess=str, separate_punctuation=False))
+
+    for words in DOCUMENT_WORDS:
+        generated, reference = long_document(words, settings.seed)
+        parameters = {"Words": words}
+        results.run("lepor", "lepor_engine.sentence_hlepor", parameters,
+                    [lambda: lepor_engine.sentence_hlepor(reference, generated)], settings.repeat)
+        results.run("lepor", "hlepor.single_hlepor_score", parameters,
+                    [lambda: package_score(reference, generated)], settings.repeat)
+
+    for parameters, pairs in corpora(settings.sizes, settings.seed):
+        # hlepor rejects empty sentences
+        tokenized = [(reference.lower().split(), generated.lower().split()) for generated, reference in pairs
+                     if generated.strip() and reference.strip()]
+        references, hypotheses = [pair[0] for pair in tokenized], [pair[1] for pair in tokenized]
+
+        results.run("lepor", "lepor_engine.batch_hlepor", parameters,
+                    [lambda: lepor_engine.batch_hlepor(references, hypotheses)], settings.repeat, len(tokenized))
+
+        try:
+            scores = lepor_engine.batch_hlepor(references, hypotheses)
+            differences = [abs(float(score) - package_score(reference, hypothesis))
+                           for score, reference, hypothesis in zip(scores, references, hypotheses)]
+        except Exception as e:
+            results.fail("lepor", "agreement", parameters, e)
+            continue
+        results.agreement("lepor", "agreement", parameters, differences, LEPOR_TOLERANCE)
+
+
+def bench_seo(results: Results, settings: argparse.Namespace):
+    """
+    Times the SEO metric on pages of several sizes with the stubbed API and the local analyzer, and a batch audit.
+    """
+    from eval_seo import EvalSeo, EvalSeoBatch
+
+    count = 5 if settings.quick else 20
+    for size, paragraphs in PAGE_SIZES.items():
+        pages = [html_page(paragraphs, seed) for seed in range(count)]
+        for backend in ("api", "local"):
+            parameters = {"Backend": backend, "Page": size, "Bytes": len(pages[0])}
+            results.run("seo", "EvalSeo.measure", parameters,
+                        [lambda page=page: EvalSeo(page, KEYWORD, RELATED_KEYWORDS, 0.5, backend).measure()
+                         for page in pages], settings.repeat)
+
+    pages = [{"seo-input-method": html_page(PAGE_SIZES["medium"], seed)} for seed in range(count * 5)]
+    for backend in ("api", "local"):
+        results.run("seo", "EvalSeoBatch.evaluate", {"Backend": backend, "Pages": len(pages)},
+                    [lambda: EvalSeoBatch(pages, KEYWORD, RELATED_KEYWORDS, 0.5, backend=backend).evaluate()],
+                    settings.repeat, len(pages))
+
+
+def bench_generator(results: Results, settings: argparse.Namespace, env: dict):
+    """
+    Times the generator metrics against the mock LLM, one evaluation at a time and many concurrently.
+    """
+    import async_runner
+    import model_registry
+    from eval_generation import EvalGeneration
+
+    model = model_registry.get_model(env)
+    count = 5 if settings.quick else 20
+    facts = "Paris is the capital of France.; Paris has about two million inhabitants."
+
+    def generator(model=model):
+        return EvalGeneration(model, 0.5, "What is the capital of France?",
+                              "Paris is the capital of France and has two million inhabitants.",
+                              "The capital of France is Paris.", facts)
+
+    parameters = {"LLM Latency": settings.llm_latency}
+    for measure in ("answer", "faithfulness"):
+        results.run("generator", f"EvalGeneration.a_measure[{measure}]", parameters,
+                    [lambda: async_runner.run(generator().a_measure(measure))] * count, settings.repeat)
+    results.run("generator", "EvalGeneration.a_evaluate", parameters,
+                [lambda: async_runner.run(generator().a_evaluate())] * count, settings.repeat)
+
+    async def concurrently(model=model):
+        await asyncio.gather(*(generator(model).a_evaluate() for _ in range(count)))
+
+    results.run("generator", "EvalGeneration.a_evaluate[concurrent]", dict(parameters, Concurrency=count),
+                [lambda: async_runner.run(concurrently())], settings.repeat, count)
+
+    # The same load against a deployment that throttles, to time the governor's adaptation and retries
+    throttling_stub = start_llm_stub(settings.llm_latency, settings.llm_capacity)
+    try:
+        throttled = model_registry.get_model(llm_env(throttling_stub, "benchmark-throttled"))
+        results.run("generator", "EvalGeneration.a_evaluate[throttled]",
+                    dict(parameters, Concurrency=count, **{"LLM Capacity": settings.llm_capacity}),
+                    [lambda: async_runner.run(concurrently(throttled))], settings.repeat, count)
+        if "Error" not in results.items[-1]:
+            results.items[-1]["LLM"] = throttled.governor.stats()
+    finally:
+        throttling_stub.shutdown()
+
+
+def http_routes(env: dict, batch_size: int) -> list[tuple[str, str, str, dict | None]]:
+    """
+    Gets the requests sent to each route as (name, method, path, JSON body).
+    """
+    pair = multilingual_corpus("english", 1, 0)[0]
+    items = [{"generated-content": generated, "reference-content": reference}
+             for generated, reference in multilingual_corpus("english", batch_size, 1)]
+    translation = {"llm-model": "benchmark", "threshold": 0.5, "prompt-field": "", "cache": "bypass",
+                   "generated-content": pair[0], "reference-content": pair[1]}
+    generation = {"llm-model": "benchmark", "threshold": 0.5, "cache": "bypass",
+                  "prompt-field": "What is the capital of France?",
+                  "generated-content": "Paris is the capital of France.",
+                  "reference-content": "The capital of France is Paris.",
+                  "facts": "Paris is the capital of France."}
+    seo = {"threshold": 0.5, "cache": "bypass", "keyword": KEYWORD, "related-keywords": RELATED_KEYWORDS,
+           "seo-input-method": html_page(PAGE_SIZES["medium"], 0)}
+    pages = [{"seo-input-method": html_page(PAGE_SIZES["small"], seed)} for seed in range(batch_size // 10)]
+
+    routes = [
+        ("index", "GET", "/", None),
+        ("health_check", "GET", "/healthz", None),
+        ("server_stats", "GET", "/stats", None),
+        ("prometheus_metrics", "GET", "/metrics", None),
+    ]
+    routes += [(f"translator[{measure}]", "POST", f"/api/translator/{measure}", {"options": translation})
+               for measure in ("gleu", "meteor", "lepor", "all")]
+    routes += [
+        ("translator_batch[gleu]", "POST", "/api/translator/batch/gleu",
+         {"options": {"threshold": 0.5, "items": items}}),
+        ("translator_corpus", "POST", "/api/translator/corpus",
+         {"options": {"threshold": 0.5, "bootstrap": 100, "items": items}}),
+    ]
+    routes += [(f"seo[{backend}]", "POST", "/api/seo", {"options": dict(seo, **{"seo-backend": backend})})
+               for backend in ("api", "local")]
+    routes += [("seo_batch[local]", "POST", "/api/seo/batch",
+                {"options": dict(seo, **{"seo-backend": "local", "items": pages})})]
+    routes += [(f"generator[{measure}]", "POST", f"/api/generator/{measure}", {"options": generation, "env": env})
+               for measure in ("answer", "faithfulness", "all")]
+    return routes
+
+
+def bench_http(results: Results, settings: argparse.Namespace, env: dict):
+    """
+    Serves the app over HTTP on a free local port and measures the latency percentiles and throughput of every
+    route under concurrent load.
+    """
+    import requests
+    from werkzeug.serving import make_server
+
+    import app
+
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    sessions = threading.local()
+    count = 20 if settings.quick else settings.requests
+
+    def send(method: str, path: str, body: dict | None) -> tuple[float, int]:
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        begin = time.perf_counter()
+        response = sessions.session.request(method, base + path, json=body, timeout=600)
+        return time.perf_counter() - begin, response.status_code
+
+    try:
+        for name, method, path, body in http_routes(env, 20 if settings.quick else 100):
+            parameters = {"Method": method, "Path": path, "Concurrency": settings.concurrency}
+            try:
+                send(method, path, body)
+                started = time.perf_counter()
+                with ThreadPoolExecutor(settings.concurrency) as executor:
+                    responses = list(executor.map(lambda _: send(method, path, body), range(count)))
+                elapsed = time.perf_counter() - started
+            except Exception as e:
+                results.fail("http", name, parameters, e)
+                continue
+            statuses = {}
+            for _, status in responses:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            results.add("http", name, parameters, [latency for latency, _ in responses], elapsed, len(responses),
+                        statuses)
+    finally:
+        server.shutdown()
+
+
+###############################################################################################################
+# Report
+###############################################################################################################
+def environment(settings: argparse.Namespace) -> dict:
+    """
+    Describes the machine, software and settings of the run.
+    """
+    packages = {}
+    for package in PACKAGES:
+        try:
+            packages[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            packages[package] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=10,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    import worker_pool
+
+    return {
+        "Format Version": FORMAT_VERSION,
+        "Started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "Commit": commit,
+        "Python": platform.python_version(),
+        "Platform": platform.platform(),
+        "CPUs": os.cpu_count(),
+        "Eval Workers": worker_pool.worker_count(),
+        "Packages": packages,
+        "Settings": {
+            "Suites": settings.suite,
+            "Sizes": list(settings.sizes),
+            "Repeat": settings.repeat,
+            "Seed": settings.seed,
+            "Requests": settings.requests,
+            "Concurrency": settings.concurrency,
+            "LLM Latency": settings.llm_latency,
+        }
+    }
+
+
+def compare(baseline_path: str, current_path: str, tolerance: float) -> int:
+    """
+    Compares the throughput of two runs benchmark by benchmark and prints the changes.
+
+    Args:
+        baseline_path (str): The results of the earlier run.
+        current_path (str): The results of the later run.
+        tolerance (float): The relative throughput drop reported as a regression.
+
+    Returns:
+        int: 1 if any benchmark regressed, else 0.
+    """
+    def load(path: str) -> dict:
+        with open(path, encoding='utf-8') as file:
+            report = json.load(file)
+        return {(result["Suite"], result["Name"], json.dumps(result["Parameters"], sort_keys=True)): result
+                for result in report["Results"]}
+
+    baseline, current = load(baseline_path), load(current_path)
+    regressions = 0
+    for key, result in current.items():
+        before = baseline.get(key)
+        if before is None or "Error" in before or "Error" in result or not before.get("Throughput"):
+            continue
+        change = result["Throughput"] / before["Throughput"] - 1
+        regressed = change < -tolerance
+        regressions += regressed
+        print(f"{'REGRESSION' if regressed else 'ok':10} {change:+8.1%}  {key[0]:12} {key[1]:32} {key[2]}")
+    print(f"{regressions} regression(s) beyond {tolerance:.0%} in {len(current)} benchmarks")
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks the Cute Python Server.")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="Suite to run (repeatable, default: all).")
+    parser.add_argument("--quick", action="store_true", help="Small corpora and few requests, for a smoke run.")
+    parser.add_argument("--sizes", type=int, nargs="+", help=f"Corpus sizes (default: {' '.join(map(str, SIZES))}).")
+    parser.add_argument("--repeat", type=int, default=1, help="Times each benchmark is repeated (default: 1).")
+    parser.add_argument("--seed", type=int, default=7, help="Seed of the generated corpora (default: 7).")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per HTTP route (default: 200).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent HTTP clients (default: 8).")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds the mock LLM takes to answer (default: 0.05).")
+    parser.add_argument("--llm-capacity", type=int, default=4, help="Calls the throttling mock LLM serves at once (default: 4).")
+    parser.add_argument("--output", help="File the JSON results are written to (default: standard output).")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Compare two result files instead of running.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Throughput drop reported as a regression (default: 0.1).")
+    settings = parser.parse_args()
+
+    if settings.compare:
+        return compare(*settings.compare, settings.tolerance)
+
+    settings.suite = settings.suite or list(SUITES)
+    settings.sizes = tuple(settings.sizes or (QUICK_SIZES if settings.quick else SIZES))
+
+    seo_stub = start_seo_stub()
+    llm_stub = start_llm_stub(settings.llm_latency)
+    os.environ['SEO_REVIEW_TOOLS_API_URL'] = f"http://127.0.0.1:{seo_stub.server_port}"
+    os.environ['SEO_REVIEW_TOOLS_API_KEY'] = "benchmark"
+    os.environ.setdefault('CUTE_CACHE_BACKEND', "none")
+    env = llm_env(llm_stub)
+
+    results = Results()
+    report = {"Environment": environment(settings), "Results": results.items}
+    try:
+        for suite in settings.suite:
+            match suite:
+                case "translation":
+                    bench_translation(results, settings)
+                case "lepor":
+                    bench_lepor(results, settings)
+                case "seo":
+                    bench_seo(results, settings)
+                case "generator":
+                    bench_generator(results, settings, env)
+                case "http":
+                    bench_http(results, settings, env)
+    finally:
+        import worker_pool
+        worker_pool.shutdown()
+        seo_stub.shutdown()
+        llm_stub.shutdown()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if settings.output:
+        with open(settings.output, 'w', encoding='utf-8') as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
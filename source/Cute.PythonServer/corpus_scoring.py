@@ -0,0 +1,270 @@
+"""
+Corpus-level GLEU and BLEU with bootstrap confidence intervals.
+
+Averaging sentence scores does not give the corpus score of GLEU or BLEU; both are ratios of n-gram counts summed
+over the whole corpus. Each segment is therefore reduced to a row of sufficient statistics (clipped matches and
+n-gram counts per order, and the lengths), rows are accumulated as the segments stream through the worker pool,
+and the corpus scores are computed from their column sums. The texts themselves are never kept.
+
+Confidence intervals come from a bootstrap over segments: every resample is a vector of segment weights (how often
+each segment was drawn), so the statistics of a whole block of resamples are one matrix product of the weights
+with the segment rows. Scores equal nltk.translate.gleu_score.corpus_gleu and nltk.translate.bleu_score.corpus_bleu
+(single reference, uniform weights, no smoothing).
+"""
+
+import sys
+
+from typing import Iterable
+
+import numpy as np
+
+import worker_pool
+from ngram_engine import ngram_statistics
+from preprocess import Preprocessor
+
+MAX_LEN = 4
+
+# Columns of a segment row
+MATCHES = slice(0, MAX_LEN)                     # Clipped n-gram matches per order
+PRECISION_TOTALS = slice(MAX_LEN, 2 * MAX_LEN)  # Hypothesis n-gram counts per order, at least 1 (as NLTK)
+HYP_LENGTH = 2 * MAX_LEN
+REF_LENGTH = 2 * MAX_LEN + 1
+GLEU_TOTAL = 2 * MAX_LEN + 2                    # Larger of the hypothesis and reference n-gram counts
+COLUMNS = 2 * MAX_LEN + 3
+
+RESAMPLE_BLOCK = 4_000_000                      # Segment weights generated at once while bootstrapping
+CHUNK_SIZE = 1024                               # Segments per worker task; rows are small, so tasks can be large
+
+
+class EvalTranslationCorpus:
+    """
+    Class for scoring a whole corpus of generated/reference pairs at the corpus level.
+    """
+
+    def __init__(self, th: float, items: Iterable[dict], tokenizer: str = "simple", language: str = "english"):
+        """
+        Initializes an instance of EvalTranslationCorpus.
+
+        Args:
+            th (float): The threshold score for the corpus scores.
+            items (Iterable[dict]): The pairs to score, each with "generated-content" and "reference-content".
+                Items are read lazily, once.
+            tokenizer (str): The tokenizer ("simple", "word" or "nltk").
+            language (str): The language of the translations, used by language-aware tokenizers.
+        """
+        self.threshold = th
+        self.items = items
+        self.tokenizer = tokenizer
+        self.language = language
+
+    def evaluate(self, samples: int = 1000, confidence: float = 0.95, seed: int = None) -> dict:
+        """
+        Computes the statistics of every pair in the worker pool and scores the corpus.
+
+        Args:
+            samples (int): The number of bootstrap resamples, 0 to skip the confidence intervals.
+            confidence (float): The confidence level of the intervals.
+            seed (int): The seed of the resampling, for reproducible intervals.
+
+        Returns:
+            dict: The corpus GLEU and BLEU scores with their confidence intervals.
+        """
+        if not 0 < confidence < 1:
+            raise ValueError(f"Invalid confidence '{confidence}'")
+
+        statistics = CorpusStatistics()
+        rows = worker_pool.map_chunked(segment_statistics, self.items, self.tokenizer, self.language,
+                                       prepare=lambda item: (item['generated-content'], item['reference-content']),
+                                       size=CHUNK_SIZE)
+        for _, row in rows:
+            statistics.add(row)
+
+        result = statistics.scores(samples, confidence, seed)
+        for name in ("GLEU", "BLEU"):
+            result[name] = {"Result": result[name]["Score"] >= self.threshold, **result[name]}
+        return result
+
+
+def segment_statistics(tokenizer: str, language: str, pairs: list[tuple[str, str]]) -> np.ndarray:
+    """
+    Computes the sufficient statistics of generated/reference pairs. This is the unit of work dispatched to
+    the worker pool.
+
+    Args:
+        tokenizer (str): The tokenizer ("simple", "word" or "nltk").
+        language (str): The language of the texts.
+        pairs (list[tuple[str, str]]): The (generated, reference) pairs.
+
+    Returns:
+        np.ndarray: One row of statistics per pair.
+    """
+    preprocessor = Preprocessor(tokenizer, language, max_pairs=len(pairs))
+    tokenized = [preprocessor.pair(actual_output, expected_output) for actual_output, expected_output in pairs]
+    matches, hyp_totals, ref_totals = ngram_statistics([pair.hypothesis.ids for pair in tokenized],
+                                                       [pair.reference.ids for pair in tokenized], MAX_LEN)
+
+    rows = np.empty((len(pairs), COLUMNS), dtype=np.int64)
+    rows[:, MATCHES] = matches
+    rows[:, PRECISION_TOTALS] = np.maximum(hyp_totals, 1)
+    rows[:, HYP_LENGTH] = [len(pair.hypothesis.ids) for pair in tokenized]
+    rows[:, REF_LENGTH] = [len(pair.reference.ids) for pair in tokenized]
+    rows[:, GLEU_TOTAL] = np.maximum(hyp_totals.sum(axis=1), ref_totals.sum(axis=1))
+    return rows
+
+
+def corpus_gleu(totals: np.ndarray) -> np.ndarray:
+    """
+    Calculates corpus GLEU from summed segment statistics.
+
+    Args:
+        totals (np.ndarray): Summed statistics, one row per corpus (or resample).
+
+    Returns:
+        np.ndarray: The GLEU score of each row.
+    """
+    matches = totals[..., MATCHES].sum(axis=-1)
+    n_all = totals[..., GLEU_TOTAL]
+    return np.divide(matches, n_all, out=np.zeros(matches.shape), where=n_all > 0)
+
+
+def corpus_bleu(totals: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calculates corpus BLEU from summed segment statistics.
+
+    Args:
+        totals (np.ndarray): Summed statistics, one row per corpus (or resample).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The BLEU score, the n-gram precisions and the brevity
+            penalty of each row.
+    """
+    matches = totals[..., MATCHES].astype(np.float64)
+    counts = totals[..., PRECISION_TOTALS].astype(np.float64)
+    precisions = np.divide(matches, counts, out=np.zeros(matches.shape), where=counts > 0)
+
+    hyp_length = totals[..., HYP_LENGTH].astype(np.float64)
+    ref_length = totals[..., REF_LENGTH].astype(np.float64)
+    with np.errstate(divide='ignore', over='ignore'):
+        penalty = np.where(hyp_length > ref_length, 1.0,
+                           np.where(hyp_length > 0, np.exp(1 - ref_length / np.maximum(hyp_length, 1)), 0.0))
+        # Orders without matches count as the smallest float, like NLTK without smoothing
+        log_precision = np.log(np.where(matches > 0, precisions, sys.float_info.min)).mean(axis=-1)
+    bleu = np.where(matches[..., 0] > 0, penalty * np.exp(log_precision), 0.0)
+    return bleu, precisions, penalty
+
+
+class CorpusStatistics:
+    """
+    Accumulates segment statistics and scores the corpus, with bootstrap confidence intervals.
+    """
+
+    FLUSH_ROWS = 8192
+
+    def __init__(self):
+        self.blocks = []
+        self.pending = []
+
+    def add(self, row: np.ndarray):
+        """
+        Adds the statistics of one segment.
+
+        Args:
+            row (np.ndarray): The segment row, see segment_statistics.
+        """
+        self.pending.append(row)
+        if len(self.pending) >= self.FLUSH_ROWS:
+            self._flush()
+
+    @property
+    def count(self) -> int:
+        return sum(len(block) for block in self.blocks) + len(self.pending)
+
+    def rows(self) -> np.ndarray:
+        """
+        Gets the statistics of all segments added so far.
+
+        Returns:
+            np.ndarray: One row per segment.
+        """
+        self._flush()
+        if not self.blocks:
+            return np.zeros((0, COLUMNS), dtype=np.int64)
+        if len(self.blocks) > 1:
+            self.blocks = [np.concatenate(self.blocks)]
+        return self.blocks[0]
+
+    def scores(self, samples: int = 1000, confidence: float = 0.95, seed: int = None) -> dict:
+        """
+        Scores the corpus.
+
+        Args:
+            samples (int): The number of bootstrap resamples, 0 to skip the confidence intervals.
+            confidence (float): The confidence level of the intervals.
+            seed (int): The seed of the resampling, for reproducible intervals.
+
+        Returns:
+            dict: The corpus GLEU and BLEU scores with their confidence intervals.
+        """
+        rows = self.rows()
+        totals = rows.sum(axis=0)
+        gleu = float(corpus_gleu(totals))
+        bleu, precisions, penalty = corpus_bleu(totals)
+
+        result = {
+            "Count": len(rows),
+            "GLEU": {"Score": round(gleu, 4)},
+            "BLEU": {
+                "Score": round(float(bleu), 4),
+                "Precisions": [round(float(p), 4) for p in precisions],
+                "Brevity Penalty": round(float(penalty), 4)
+            }
+        }
+
+        if samples > 0 and len(rows) > 1:
+            intervals = self.bootstrap(rows, samples, confidence, seed)
+            for name, (lower, upper) in intervals.items():
+                result[name]["Lower"] = round(lower, 4)
+                result[name]["Upper"] = round(upper, 4)
+            result["Bootstrap"] = {"Samples": samples, "Confidence": confidence}
+
+        return result
+
+    @staticmethod
+    def bootstrap(rows: np.ndarray, samples: int, confidence: float, seed: int = None) -> dict:
+        """
+        Computes percentile bootstrap confidence intervals of corpus GLEU and BLEU.
+
+        Args:
+            rows (np.ndarray): The segment statistics.
+            samples (int): The number of resamples.
+            confidence (float): The confidence level.
+            seed (int): The seed of the resampling.
+
+        Returns:
+            dict: The (lower, upper) bounds of each metric.
+        """
+        generator = np.random.default_rng(seed)
+        segments = len(rows)
+        values = rows.astype(np.float64)
+        block = max(1, RESAMPLE_BLOCK // segments)
+        gleu, bleu = [], []
+
+        for start in range(0, samples, block):
+            size = min(block, samples - start)
+            # Draw segments with replacement and count the draws of each segment in each resample
+            draws = generator.integers(0, segments, size=(size, segments)) + (np.arange(size) * segments)[:, None]
+            weights = np.bincount(draws.ravel(), minlength=size * segments).reshape(size, segments)
+            totals = weights @ values
+            gleu.append(corpus_gleu(totals))
+            bleu.append(corpus_bleu(totals)[0])
+
+        tail = (1 - confidence) / 2 * 100
+        return {
+            name: tuple(float(bound) for bound in np.percentile(np.concatenate(scores), [tail, 100 - tail]))
+            for name, scores in (("GLEU", gleu), ("BLEU", bleu))
+        }
+
+    def _flush(self):
+        if self.pending:
+            self.blocks.append(np.array(self.pending, dtype=np.int64))
+            self.pending = []
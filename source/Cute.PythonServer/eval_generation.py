@@ -1,19 +1,37 @@
+import asyncio
 import json
+
+from contextlib import contextmanager
+
+import numpy as np
+
 from deepeval.metrics import ContextualPrecisionMetric, ContextualRecallMetric, ContextualRelevancyMetric, AnswerRelevancyMetric, FaithfulnessMetric
 from deepeval.test_case import LLMTestCase
+from deepeval.models import DeepEvalBaseLLM
 from deepeval import evaluate
 
+import async_runner
+import extraction_cache
+import llm_governor
+import telemetry
+from async_runner import llm_slot
+from score_summary import ScoreSummary
+
+METRIC_LABELS = {"answer": "answer_relevancy", "faithfulness": "faithfulness"}
+METRIC_NAMES = {"answer": "Answer Relevancy", "faithfulness": "Faithfulness"}
+
 class EvalGeneration:
     """
     Class for evaluating a prompt's effectiveness in generating high-quality output from an LLM model.
     """
 
-    def __init__(self, llm_model: str, th: float, input: str, actual_output: str, expected_output: str, retrieval_context: str):
+    def __init__(self, llm_model: str | DeepEvalBaseLLM, th: float, input: str, actual_output: str, expected_output: str, retrieval_context: str):
         """
         Initializes an instance of the EvalRAG class.
 
         Args:
-            llm_model (str): The language model used for evaluation.
+            llm_model (str | DeepEvalBaseLLM): The language model used for evaluation, either a model name
+                or a model client from the model registry.
             th (float): The threshold value for evaluation metrics.
             input (str): The input text for the test case.
             actual_output (str): The actual output generated by the model.
@@ -23,7 +41,7 @@ class EvalGeneration:
         retrieval_context = retrieval_context.split("; ")
         self.test_case = LLMTestCase(input=input, actual_output=actual_output, expected_output=expected_output, retrieval_context=retrieval_context)
         self.answer_relevancy = AnswerRelevancyMetric(threshold=th, model=llm_model, include_reason=True)
-        self.faithfulness = FaithfulnessMetric(threshold=th, model=llm_model, include_reason=True)
+        self.faithfulness = CachedFaithfulnessMetric(threshold=th, model=llm_model, include_reason=True)
 
     def evaluate(self):
         """
@@ -52,7 +70,8 @@ class EvalGeneration:
         """
         match metric:
             case "answer":
-                self.answer_relevancy.measure(self.test_case)
+                with measuring(metric):
+                    self.answer_relevancy.measure(self.test_case)
                 result = {
                     "Result": self.answer_relevancy.success,
                     "Score": self.answer_relevancy.score,
@@ -61,10 +80,248 @@ class EvalGeneration:
                 return result
 
             case "faithfulness":
-                self.faithfulness.measure(self.test_case)
+                with measuring(metric):
+                    self.faithfulness.measure(self.test_case)
                 result = {
                     "Result": self.faithfulness.success,
                     "Score": self.faithfulness.score,
                     "Reason": self.faithfulness.reason
                 }
                 return result
+
+    async def a_evaluate(self) -> dict:
+        """
+        Evaluates the test case with answer relevancy and faithfulness concurrently.
+
+        Returns:
+            dict: The result, score and reason of each metric.
+        """
+        answer, faithfulness = await asyncio.gather(self.a_measure("answer"), self.a_measure("faithfulness"))
+        return {
+            "Answer Relevancy": answer,
+            "Faithfulness": faithfulness
+        }
+
+    async def a_measure(self, metric: str) -> dict:
+        """
+        Asynchronously measures a specific evaluation metric for the test case, holding a global LLM
+        concurrency slot while the metric's LLM calls are in flight.
+
+        Args:
+            metric (str): The metric to measure. Possible values: "answer", "faithfulness".
+
+        Returns:
+            dict: The result, score and reason of the metric.
+        """
+        match metric:
+            case "answer":
+                llm_metric = self.answer_relevancy
+            case "faithfulness":
+                llm_metric = self.faithfulness
+
+        async with llm_slot():
+            with measuring(metric):
+                await llm_metric.a_measure(self.test_case)
+
+        return {
+            "Result": llm_metric.success,
+            "Score": llm_metric.score,
+            "Reason": llm_metric.reason
+        }
+
+
+class EvalGenerationBatch:
+    """
+    Class for evaluating many generated outputs in one request. The test cases of all records are built up front
+    and measured concurrently on the shared event loop, so a batch is bounded by the LLM concurrency and rate limits
+    rather than by one request per record.
+    """
+
+    PERCENTILES = (10, 25, 50, 75, 90)
+
+    def __init__(self, llm_model: str | DeepEvalBaseLLM, th: float, items: list[dict], measure: str = "all",
+                 concurrency: int = 16, timeout: float = None):
+        """
+        Initializes an instance of EvalGenerationBatch.
+
+        Args:
+            llm_model (str | DeepEvalBaseLLM): The language model used for evaluation, either a model name
+                or a model client from the model registry.
+            th (float): The threshold value for evaluation metrics.
+            items (list[dict]): The records to evaluate, each with "prompt-field", "generated-content",
+                "reference-content", "facts" and optionally "id".
+            measure (str): The metric to measure ("all", "answer" or "faithfulness").
+            concurrency (int): The maximum number of records measured at once.
+            timeout (float): Seconds after which a record's evaluation is cancelled. Defaults to CUTE_LLM_TIMEOUT.
+        """
+        if measure not in ("all", *METRIC_NAMES):
+            raise ValueError(f"Invalid generator option '{measure}'")
+        if concurrency < 1:
+            raise ValueError(f"Invalid concurrency '{concurrency}'")
+
+        self.llm_model = llm_model
+        self.threshold = th
+        self.items = items
+        self.measure = measure
+        self.concurrency = concurrency
+        self.timeout = async_runner.default_timeout() if timeout is None else timeout
+
+    def evaluate(self, lookup=None, store=None) -> dict:
+        """
+        Evaluates every record and summarizes the results. A record that fails to be evaluated is reported
+        with its error and left out of the summary scores.
+
+        Args:
+            lookup: Function returning the stored result of a record, or None to evaluate it.
+            store: Function storing the result of an evaluated record.
+
+        Returns:
+            dict: The per-record results and the aggregate summary.
+        """
+        outcomes = [lookup(item) if lookup else None for item in self.items]
+        pending = [index for index, outcome in enumerate(outcomes) if outcome is None]
+
+        generators = [self.test_case(self.items[index]) for index in pending]
+        usage = llm_governor.Usage()
+        measured = asyncio.run_coroutine_threadsafe(self.a_measure_all(generators, usage), async_runner.get_loop()).result()
+
+        for index, outcome in zip(pending, measured):
+            outcomes[index] = outcome
+            if store and not isinstance(outcome, BaseException):
+                store(self.items[index], outcome)
+
+        results = []
+        for index, (item, outcome) in enumerate(zip(self.items, outcomes)):
+            result = {"Index": index, "Id": item.get('id')}
+            match outcome:
+                case TimeoutError():
+                    result["Error"] = "Evaluation timed out"
+                case BaseException():
+                    result["Error"] = str(outcome) or type(outcome).__name__
+                case _ if self.measure == "all":
+                    result.update(outcome)
+                case _:
+                    outcome = dict(outcome)
+                    record_usage = outcome.pop("Usage", None)
+                    result[METRIC_NAMES[self.measure]] = outcome
+                    if record_usage is not None:
+                        result["Usage"] = record_usage
+            results.append(result)
+
+        summary = self.summarize(results)
+        summary["Usage"] = usage.to_dict()
+        return {
+            "Items": results,
+            "Summary": summary
+        }
+
+    def test_case(self, item: dict) -> EvalGeneration:
+        return EvalGeneration(self.llm_model, self.threshold, item['prompt-field'], item['generated-content'],
+                              item['reference-content'], item['facts'])
+
+    async def a_measure_all(self, generators: list[EvalGeneration], usage: llm_governor.Usage) -> list[dict | BaseException]:
+        """
+        Measures the test cases concurrently, at most `concurrency` at a time.
+
+        Args:
+            generators (list[EvalGeneration]): The test cases with their metrics.
+            usage (llm_governor.Usage): The usage the LLM calls of all test cases are added to.
+
+        Returns:
+            list[dict | BaseException]: The result of each test case in the format of the single record endpoint,
+                or the error it raised.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def measure(generator: EvalGeneration) -> dict:
+            async with semaphore:
+                match self.measure:
+                    case "all":
+                        evaluation = generator.a_evaluate()
+                    case _:
+                        evaluation = generator.a_measure(self.measure)
+                # Records that fail still count towards the batch's usage
+                record_usage = llm_governor.Usage()
+                try:
+                    result, _ = await asyncio.wait_for(llm_governor.metered(evaluation, record_usage), self.timeout)
+                finally:
+                    usage.add(record_usage)
+                return {**result, "Usage": record_usage.to_dict()}
+
+        return await asyncio.gather(*(measure(generator) for generator in generators), return_exceptions=True)
+
+    def summarize(self, results: list[dict]) -> dict:
+        """
+        Summarizes the scores of the evaluated records.
+
+        Args:
+            results (list[dict]): The per-record results.
+
+        Returns:
+            dict: Record counts, the share of records passing every metric, and the score statistics and
+                percentiles of each metric.
+        """
+        scored = [result for result in results if "Error" not in result]
+        names = list(METRIC_NAMES.values()) if self.measure == "all" else [METRIC_NAMES[self.measure]]
+
+        metrics = {}
+        for name in names:
+            summary = ScoreSummary()
+            scores = []
+            for result in scored:
+                if result[name]["Score"] is not None:
+                    summary.add(result[name]["Score"], result[name]["Result"])
+                    scores.append(result[name]["Score"])
+            metrics[name] = summary.to_dict()
+            metrics[name]["Percentiles"] = {
+                f"P{percentile}": round(float(value), 4)
+                for percentile, value in zip(self.PERCENTILES, np.percentile(scores, self.PERCENTILES))
+            } if scores else None
+
+        passed = sum(1 for result in scored if all(result[name]["Result"] for name in names))
+        return {
+            "Count": len(results),
+            "Failed": len(results) - len(scored),
+            "Pass Rate": round(passed / len(scored), 4) if scored else None,
+            "Metrics": metrics
+        }
+
+
+class CachedFaithfulnessMetric(FaithfulnessMetric):
+    """
+    Faithfulness metric that reuses the truths extracted from a retrieval context and the claims extracted from
+    an actual output, see extraction_cache. Only the verdicts and the reason are asked from the LLM every time.
+    """
+
+    def _get_prompt(self, method: str, **kwargs) -> str:
+        # DeepEval resolves its prompt templates by the name of the metric class
+        kwargs.setdefault('template_class', FaithfulnessMetric.__name__)
+        return super()._get_prompt(method, **kwargs)
+
+    # DeepEval versions differ in the arguments after the text (e.g. whether the test case is multimodal), so
+    # they are passed through and made part of the key
+
+    async def _a_generate_truths(self, retrieval_context: list[str], *args, **kwargs) -> list[str]:
+        key = extraction_cache.extraction_key("truths", self.evaluation_model, retrieval_context,
+                                              limit=self.truths_extraction_limit, arguments=repr(args))
+        return await extraction_cache.extracted(
+            "truths", key, lambda: super(CachedFaithfulnessMetric, self)._a_generate_truths(retrieval_context, *args, **kwargs))
+
+    async def _a_generate_claims(self, actual_output: str, *args, **kwargs) -> list[str]:
+        key = extraction_cache.extraction_key("claims", self.evaluation_model, actual_output, arguments=repr(args))
+        return await extraction_cache.extracted(
+            "claims", key, lambda: super(CachedFaithfulnessMetric, self)._a_generate_claims(actual_output, *args, **kwargs))
+
+
+@contextmanager
+def measuring(metric: str):
+    """
+    Records the duration of a metric measurement, and counts it as an error if it raises.
+    """
+    label = METRIC_LABELS[metric]
+    try:
+        with telemetry.METRIC_SECONDS.labels(label).time():
+            yield
+    except Exception:
+        telemetry.METRIC_ERRORS.labels(label).inc()
+        raise
@@ -0,0 +1,223 @@
+"""
+Tiered evaluation of generated content: cheap local gates before the LLM metrics.
+
+Every record sent to the generator endpoints pays for the LLM calls of answer relevancy and faithfulness, even an
+obvious failure. The pipeline decides what it can locally first, tier by tier:
+
+    Length    Empty output, fewer than min-words words, or a length (in characters) more than max-length-ratio
+              times longer or shorter than the reference content.
+    Language  Output identifiably written in another language than expected, see language_id.
+    Lexical   The mean of the lexical scores (GLEU by default) of the output against the reference content: below
+              reject-below fails the record, at or above accept-above passes it.
+    LLM       Records in between (the uncertainty band), and records without reference content, are measured with
+              the LLM metrics in one generator batch.
+
+Each record reports the tier that decided it and the checks it went through, so the LLM spend saved is the share
+of records decided before the LLM tier.
+"""
+
+import language_id
+import llm_governor
+import telemetry
+import worker_pool
+from eval_generation import METRIC_NAMES, EvalGenerationBatch
+from translation_scoring import metric_names, score_pairs
+
+TIERS = ("Length", "Language", "Lexical", "LLM")
+
+
+class EvalPipeline:
+    """
+    Class for evaluating generated content through local gates, escalating only uncertain records to the LLM.
+    """
+
+    def __init__(self, llm_model, th: float, items: list[dict], measure: str = "all", lexical: str = "gleu",
+                 reject_below: float = 0.1, accept_above: float = 0.9, min_words: int = 1,
+                 max_length_ratio: float = 4.0, language: str = "english", detect_language: bool = True,
+                 tokenizer: str = "simple", concurrency: int = 16, timeout: float = None):
+        """
+        Initializes an instance of EvalPipeline.
+
+        Args:
+            llm_model (str | DeepEvalBaseLLM): The language model of the LLM tier, either a model name or a model
+                client from the model registry.
+            th (float): The threshold value for the LLM metrics.
+            items (list[dict]): The records to evaluate, each with "prompt-field", "generated-content",
+                "reference-content", "facts" and optionally "id".
+            measure (str): The LLM metric escalated records are measured with ("all", "answer" or "faithfulness").
+            lexical (str): The lexical metric of the lexical tier ("gleu", "meteor", "lepor" or "all").
+            reject_below (float): Lexical score below which a record fails.
+            accept_above (float): Lexical score from which a record passes; above 1 escalates every record
+                that is not rejected.
+            min_words (int): The fewest words the generated content may have.
+            max_length_ratio (float): How many times longer or shorter than the reference content the generated
+                content may be; 0 disables the check.
+            language (str): The language the generated content is expected in, also used by the tokenizer.
+            detect_language (bool): Whether to reject generated content identified as another language.
+            tokenizer (str): The tokenizer of the lexical metrics ("simple", "word" or "nltk").
+            concurrency (int): The maximum number of records measured by the LLM at once.
+            timeout (float): Seconds after which an escalated record's evaluation is cancelled.
+        """
+        if measure not in ("all", *METRIC_NAMES):
+            raise ValueError(f"Invalid pipeline option '{measure}'")
+        try:
+            metric_names(lexical)
+        except ValueError:
+            raise ValueError(f"Invalid lexical metric '{lexical}'") from None
+        if not 0 <= reject_below <= accept_above:
+            raise ValueError(f"Invalid uncertainty band [{reject_below}, {accept_above})")
+        if concurrency < 1:
+            raise ValueError(f"Invalid concurrency '{concurrency}'")
+        # A string such as "false" would otherwise turn the check on
+        if not isinstance(detect_language, bool):
+            raise ValueError(f"Invalid detect-language option '{detect_language}'")
+
+        self.llm_model = llm_model
+        self.threshold = th
+        self.items = items
+        self.measure = measure
+        self.lexical = lexical
+        self.reject_below = reject_below
+        self.accept_above = accept_above
+        self.min_words = min_words
+        self.max_length_ratio = max_length_ratio
+        self.language = language
+        self.detect_language = detect_language
+        self.tokenizer = tokenizer
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def evaluate(self, lookup=None, store=None) -> dict:
+        """
+        Runs every record through the tiers and summarizes the decisions.
+
+        Args:
+            lookup: Function returning the stored LLM result of a record, or None to measure it.
+            store: Function storing the LLM result of a measured record.
+
+        Returns:
+            dict: The per-record results, each with the tier that decided it, and the aggregate summary.
+        """
+        results = [{"Index": index, "Id": item.get('id'), "Checks": {}} for index, item in enumerate(self.items)]
+        gated = []
+        escalated = {}
+
+        for index, (item, result) in enumerate(zip(self.items, results)):
+            reason = self.check_length(item, result["Checks"])
+            if reason:
+                decide(result, "Length", False, reason)
+            elif reason := self.check_language(item, result["Checks"]):
+                decide(result, "Language", False, reason)
+            elif item['reference-content'].strip():
+                gated.append(index)
+            else:
+                escalated[index] = "There is no reference content to score the generated content against."
+
+        scored = worker_pool.map_chunked(score_pairs, gated, self.lexical, self.threshold, self.tokenizer,
+                                         self.language, prepare=lambda index: (self.items[index]['generated-content'],
+                                                                               self.items[index]['reference-content']))
+        for index, scores in scored:
+            checks = results[index]["Checks"]
+            checks["Lexical"] = {name: score["Score"] for name, score in scores.items()}
+            score = round(sum(checks["Lexical"].values()) / len(scores), 4)
+            if score < self.reject_below:
+                decide(results[index], "Lexical", False, f"The lexical score {score} is below {self.reject_below}.")
+            elif score >= self.accept_above:
+                decide(results[index], "Lexical", True, f"The lexical score {score} is at least {self.accept_above}.")
+            else:
+                escalated[index] = (f"The lexical score {score} is within the uncertainty band "
+                                    f"[{self.reject_below}, {self.accept_above}).")
+
+        llm_summary = None
+        if escalated:
+            batch = EvalGenerationBatch(self.llm_model, self.threshold, [self.items[index] for index in escalated],
+                                        self.measure, self.concurrency, self.timeout)
+            evaluation = batch.evaluate(lookup, store)
+            names = list(METRIC_NAMES.values()) if self.measure == "all" else [METRIC_NAMES[self.measure]]
+            for (index, reason), outcome in zip(escalated.items(), evaluation["Items"]):
+                outcome = {key: value for key, value in outcome.items() if key not in ("Index", "Id")}
+                passed = None if "Error" in outcome else all(outcome[name]["Result"] for name in names)
+                decide(results[index], "LLM", passed, reason)
+                results[index].update(outcome)
+            llm_summary = evaluation["Summary"]
+
+        return {
+            "Items": results,
+            "Summary": self.summarize(results, llm_summary)
+        }
+
+    def check_length(self, item: dict, checks: dict) -> str | None:
+        """
+        Checks the length of the generated content against the minimum and against the reference content.
+
+        Returns:
+            str | None: The reason the record fails, or None if it passes the check.
+        """
+        generated, reference = item['generated-content'], item['reference-content']
+        words = len(generated.split())
+        characters = len("".join(generated.split()))
+        reference_characters = len("".join(reference.split()))
+        checks["Length"] = {"Words": words, "Characters": characters, "Reference Characters": reference_characters}
+
+        if not words:
+            return "The generated content is empty."
+        if words < self.min_words:
+            return f"The generated content has {words} words, fewer than {self.min_words}."
+        if self.max_length_ratio and reference_characters and \
+                max(characters, reference_characters) > self.max_length_ratio * min(characters, reference_characters):
+            return (f"The generated content has {characters} characters against {reference_characters} in the "
+                    f"reference content, beyond a ratio of {self.max_length_ratio}.")
+        return None
+
+    def check_language(self, item: dict, checks: dict) -> str | None:
+        """
+        Checks that the generated content is not identifiably written in another language than expected.
+
+        Returns:
+            str | None: The reason the record fails, or None if it passes the check.
+        """
+        if not self.detect_language:
+            return None
+        detected, script, ruled_out = language_id.mismatch(item['generated-content'], self.language)
+        checks["Language"] = {"Detected": detected, "Script": script}
+        if ruled_out:
+            return f"The generated content is written in {detected or script + ' script'}, not {self.language}."
+        return None
+
+    def summarize(self, results: list[dict], llm_summary: dict | None) -> dict:
+        """
+        Summarizes the decisions of the tiers.
+
+        Args:
+            results (list[dict]): The per-record results.
+            llm_summary (dict | None): The summary of the generator batch of the escalated records.
+
+        Returns:
+            dict: The record counts, the pass rate, the records decided by each tier, the share escalated to the
+                LLM, the LLM usage and the summary of the LLM metrics.
+        """
+        tiers = dict.fromkeys(TIERS, 0)
+        for result in results:
+            tiers[result["Tier"]] += 1
+        for tier, count in tiers.items():
+            if count:
+                telemetry.PIPELINE_DECISIONS.labels(tier.lower()).inc(count)
+
+        decided = [result for result in results if result["Result"] is not None]
+        passed = sum(1 for result in decided if result["Result"])
+        return {
+            "Count": len(results),
+            "Failed": len(results) - len(decided),
+            "Pass Rate": round(passed / len(decided), 4) if decided else None,
+            "Tiers": tiers,
+            "Escalation Rate": round(tiers["LLM"] / len(results), 4) if results else None,
+            "Usage": llm_summary["Usage"] if llm_summary else llm_governor.Usage().to_dict(),
+            "LLM": {key: value for key, value in llm_summary.items() if key != "Usage"} if llm_summary else None
+        }
+
+
+def decide(result: dict, tier: str, passed: bool | None, reason: str):
+    """
+    Records the tier that decided a record, its outcome and the reason.
+    """
+    result.update({"Tier": tier, "Result": passed, "Reason": reason})
@@ -1,17 +1,28 @@
 import os
-import requests
 import json
 
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+
+import html_document
+import http_client
+import seo_analyzer
+import settings
+import telemetry
+from score_summary import ScoreSummary
+
 
 from deepeval.test_case import LLMTestCase
 from deepeval.metrics import BaseMetric
 
 
+SEO_BACKENDS = ("api", "local")
+
+
 class EvalSeo:
-    def __init__(self, input: str, keyword: str, related_keywords: str, th: float):
-        self.test_case = LLMTestCase(actual_output=input)
-        self.content_analysis_metric = ContentAnalysisMetric(tresh_score=th, keyword=keyword, related_keywords=related_keywords)
+    def __init__(self, input: str, keyword: str, related_keywords: str, th: float, backend: str = None):
+        self.test_case = LLMTestCase(input=keyword or "", actual_output=input)
+        self.content_analysis_metric = ContentAnalysisMetric(tresh_score=th, keyword=keyword, related_keywords=related_keywords,
+                                                             backend=backend)
 
     def measure(self):
         self.content_analysis_metric.measure(self.test_case)
@@ -56,6 +67,131 @@ class EvalSeo:
         return result
 
 
+class EvalSeoBatch:
+    """
+    Audits many pages at once, analyzing them concurrently and summarizing the scores across the site.
+    """
+
+    DISTRIBUTION_BUCKETS = 5
+
+    def __init__(self, items: list[dict], keyword: str, related_keywords: str, th: float, concurrency: int = None, worst: int = 5,
+                 backend: str = None):
+        """
+        Initializes an instance of EvalSeoBatch.
+
+        Args:
+            items (list[dict]): The pages to audit, each with "seo-input-method" (a URL or HTML document) and
+                optionally "id", "keyword" and "related-keywords".
+            keyword (str): The keyword of pages that do not set their own.
+            related_keywords (str): The related keywords of pages that do not set their own.
+            th (float): The threshold score for the overall SEO score.
+            concurrency (int): The maximum number of pages analyzed at once, capped by CUTE_SEO_CONCURRENCY.
+            worst (int): The number of lowest scoring pages listed in the summary.
+            backend (str): The analysis backend, see SEO_BACKENDS.
+        """
+        self.items = items
+        self.keyword = keyword
+        self.related_keywords = related_keywords
+        self.threshold = th
+        self.concurrency = min(concurrency or max_concurrency(), max_concurrency())
+        self.worst = worst
+        self.backend = backend
+
+    def evaluate(self, measure_page=None) -> dict:
+        """
+        Analyzes every page and summarizes the results. A page that fails to be analyzed is reported
+        with its error and left out of the summary scores.
+
+        Args:
+            measure_page: Function returning the result of one page from its item, keyword and related
+                keywords. Defaults to EvalSeo.measure.
+
+        Returns:
+            dict: The per-page results and the site-level summary.
+        """
+        measure_page = measure_page or self.measure_page
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(self.items)))) as executor:
+            futures = [executor.submit(measure_page, item, item.get('keyword', self.keyword),
+                                       item.get('related-keywords', self.related_keywords))
+                       for item in self.items]
+
+        results = []
+        for index, (item, future) in enumerate(zip(self.items, futures)):
+            result = {"Index": index, "Id": item.get('id'), "Page": page_name(item['seo-input-method'])}
+            try:
+                result.update(future.result())
+            except Exception as e:
+                result["Error"] = str(e)
+            results.append(result)
+
+        return {
+            "Items": results,
+            "Summary": self.summarize(results)
+        }
+
+    def measure_page(self, item: dict, keyword: str, related_keywords: str) -> dict:
+        return EvalSeo(item['seo-input-method'], keyword, related_keywords, self.threshold, self.backend).measure()
+
+    def summarize(self, results: list[dict]) -> dict:
+        """
+        Summarizes the overall SEO scores of the audited pages.
+
+        Args:
+            results (list[dict]): The per-page results.
+
+        Returns:
+            dict: Page counts, score statistics, the score distribution and the worst pages.
+        """
+        scored = [result for result in results if "Error" not in result]
+
+        summary = ScoreSummary()
+        distribution = [0] * self.DISTRIBUTION_BUCKETS
+        for result in scored:
+            score = result["Overall SEO Score"]
+            summary.add(score, result["Result"])
+            distribution[min(int(score * self.DISTRIBUTION_BUCKETS), self.DISTRIBUTION_BUCKETS - 1)] += 1
+
+        worst = sorted(scored, key=lambda result: result["Overall SEO Score"])[:self.worst]
+        width = 1 / self.DISTRIBUTION_BUCKETS
+
+        return {
+            "Count": len(results),
+            "Failed": len(results) - len(scored),
+            "Overall SEO Score": summary.to_dict(),
+            "Distribution": {f"{i * width:.1f}-{(i + 1) * width:.1f}": count for i, count in enumerate(distribution)},
+            "Worst Pages": [{"Index": result["Index"], "Id": result["Id"], "Page": result["Page"],
+                             "Overall SEO Score": result["Overall SEO Score"]} for result in worst]
+        }
+
+
+def default_backend() -> str:
+    """
+    Gets the analysis backend used when a request does not choose one.
+
+    Returns:
+        str: The backend (CUTE_SEO_BACKEND, default: "api").
+    """
+    return os.environ.get('CUTE_SEO_BACKEND', 'api')
+
+
+def max_concurrency() -> int:
+    """
+    Gets the configured maximum number of pages analyzed at once by a batch audit.
+
+    Returns:
+        int: The concurrency cap (CUTE_SEO_CONCURRENCY, default: 8).
+    """
+    return max(1, settings.int_setting('CUTE_SEO_CONCURRENCY', 8))
+
+
+def page_name(input: str) -> str | None:
+    """
+    Gets the name a page is listed under in the summary: its URL, or None for HTML content.
+    """
+    return input if input.startswith("http") else None
+
+
 #############################################################################################################
 # Custom Metrics
 # The following custom metric is implemented as subclasses of the BaseMetric class from the DeepEval library.
@@ -64,13 +200,16 @@ class ContentAnalysisMetric(BaseMetric):
     """ContentOptmizationMetric:
     This class measures the overall SEO content score from SEO Review Tools API (see https://api.seoreviewtools.com/documentation/seo-content-analysis-api/).
     It receives the input method (either "url" or "content") and an API key as parameters to access the content
-    analysis API."""
+    analysis API. With the "local" backend the content is analyzed in process by seo_analyzer instead."""
 
     # This metric by default checks if the latency is greater than 10 seconds
-    def __init__(self, tresh_score: float, keyword: str=None, related_keywords: str=None):
+    def __init__(self, tresh_score: float, keyword: str=None, related_keywords: str=None, backend: str=None):
         self.threshold = tresh_score
         self.keyword = keyword
         self.related_keywords = related_keywords
+        self.backend = backend or default_backend()
+        if self.backend not in SEO_BACKENDS:
+            raise ValueError(f"Invalid SEO backend '{self.backend}'")
 
     def measure(self, test_case: LLMTestCase):
         # Set self.success and self.score in the "measure" method
@@ -82,25 +221,25 @@ class ContentAnalysisMetric(BaseMetric):
 
         # Title Tag analysis
         self.title_tag_score = float(seo_analysis_result['Title Tag']['SEO Score'] / seo_analysis_result['Title Tag']['Max SEO score available'])
-        self.title_tag_feedback = "\n".join(
+        self.title_tag_feedback = "\n".join([
             seo_analysis_result['Title Tag']['Feedback details']['Status']['text'],
             seo_analysis_result['Title Tag']['Feedback details']['Length']['text'],
             seo_analysis_result['Title Tag']['Feedback details']['Focus keyword']['text'],
-            seo_analysis_result['Title Tag']['Feedback details']['Focus keywords position']['text'])
+            seo_analysis_result['Title Tag']['Feedback details']['Focus keywords position']['text']])
 
         # Meta Description analysis
         self.meta_description_score = float(seo_analysis_result['Meta description']['SEO Score'] / seo_analysis_result['Meta description']['Max SEO score available'])
-        self.meta_description_feedback = "\n".join(
+        self.meta_description_feedback = "\n".join([
             seo_analysis_result['Meta description']['Feedback details']['Status']['text'],
             seo_analysis_result['Meta description']['Feedback details']['Length']['text'],
             seo_analysis_result['Meta description']['Feedback details']['Focus keyword']['text'],
-            seo_analysis_result['Meta description']['Feedback details']['Focus keywords position']['text'])
+            seo_analysis_result['Meta description']['Feedback details']['Focus keywords position']['text']])
         
         # Page Headings analysis
         self.page_headings_score = float(seo_analysis_result['Page headings']['SEO Score'] / seo_analysis_result['Page headings']['Max SEO score available'])
-        self.page_headings_feedback = "\n".join(
+        self.page_headings_feedback = "\n".join([
             seo_analysis_result['Page headings']['Feedback details']['Status']['text'],
-            seo_analysis_result['Page headings']['Feedback details']['Focus keyword']['text'])
+            seo_analysis_result['Page headings']['Feedback details']['Focus keyword']['text']])
 
         # Content Length analysis
         self.content_length_score = float(seo_analysis_result['Content length']['SEO Score'] / seo_analysis_result['Content length']['Max SEO score available'])
@@ -112,10 +251,10 @@ class ContentAnalysisMetric(BaseMetric):
 
         # Image analysis
         self.image_score = float(seo_analysis_result['Image analysis']['SEO Score'] / seo_analysis_result['Image analysis']['Max SEO score available'])
-        self.image_feedback = "\n".join(
+        self.image_feedback = "\n".join([
             seo_analysis_result['Image analysis']['Feedback details']['Status']['text'],
             seo_analysis_result['Image analysis']['Feedback details']['Image name contains keyword']['text'],
-            seo_analysis_result['Image analysis']['Feedback details']['Image ALT tag contains keyword']['text'])
+            seo_analysis_result['Image analysis']['Feedback details']['Image ALT tag contains keyword']['text']])
         
         # Keyword Usage analysis
         self.keyword_usage_score = float(seo_analysis_result['Keyword usage']['SEO Score'] / seo_analysis_result['Keyword usage']['Max SEO score available'])
@@ -140,54 +279,53 @@ class ContentAnalysisMetric(BaseMetric):
         return "SEO"
     
 
-    # Get SEO score from API
+    # Get SEO score from API, or from the local analyzer, recording the analysis time per backend
     def analyze_seo(self, input: str, keyword: str, related_keywords: str):
 
+        label = f"seo_{self.backend}"
+        try:
+            with telemetry.METRIC_SECONDS.labels(label).time():
+                return self.analyze_seo_with_backend(input, keyword, related_keywords)
+        except Exception:
+            telemetry.METRIC_ERRORS.labels(label).inc()
+            raise
+
+    def analyze_seo_with_backend(self, input: str, keyword: str, related_keywords: str):
+
+        if self.backend == "local":
+            return self.analyze_seo_locally(input, keyword, related_keywords)
+
         api_key = os.getenv('SEO_REVIEW_TOOLS_API_KEY')
+        api_url = os.getenv('SEO_REVIEW_TOOLS_API_URL', 'https://api.seoreviewtools.com').rstrip('/')
+        limiter = http_client.get_limiter('seo', 'CUTE_SEO_RATE_LIMIT', 'CUTE_SEO_RATE_BURST')
 
         # URL input
         if input.startswith("http"):
-            tool_request_url = "https://api.seoreviewtools.com/seo-content-analysis-4-0/?keyword={}&relatedkeywords={}&url={}&key={}".format(
-                requests.utils.quote(keyword),
-                requests.utils.quote(related_keywords),
-                requests.utils.quote(input),
-                api_key)
-            seo_response = requests.request("GET", tool_request_url).json()
+            params = {'keyword': keyword, 'relatedkeywords': related_keywords, 'url': input, 'key': api_key}
+            seo_response = http_client.request("GET", f"{api_url}/seo-content-analysis-4-0/", limiter, service="seo-api", params=params).json()
             return seo_response['data']
         # Content input
         else:
-            title_tag = str(self.extract_html_content(input, 'title')).replace('<title>', '').replace('</title>', '') # Title tag
-            meta_description = str(self.find_self_closing_tags(input, "meta", "description")[0].attrs['description'])   # Meta description
-            body_content = self.extract_html_content(input, 'body') # Content to check
-            body_content = ' '.join(body_content.split())   # Remove tabs and spaces
+            document = html_document.parse(input)
             data = {
                 'content_input': {
-                    'title_tag': title_tag,
-                    'meta_description': meta_description,
-                    'body_content': body_content.strip()
+                    'title_tag': document.title or '',
+                    'meta_description': document.meta_description or '',
+                    'body_content': html_document.normalize(document.body_html)   # Remove tabs and spaces
                 }
             }
             keyword_input = keyword # Keyword to check
             related_keywords = related_keywords # Related keywords (optional)
-        
-            # URL generation with proper encoding
-            tool_request_url = "https://api.seoreviewtools.com/v5/seo-content-optimization/?content=1&keyword={}&relatedkeywords={}&key={}".format(
-                requests.utils.quote(keyword_input),
-                requests.utils.quote(related_keywords),
-                api_key
-            )
-            seo_response = requests.post(tool_request_url, json=data).json()
+
+            # Query parameters are encoded by the session
+            params = {'content': 1, 'keyword': keyword_input, 'relatedkeywords': related_keywords, 'key': api_key}
+            seo_response = http_client.request("POST", f"{api_url}/v5/seo-content-optimization/", limiter, service="seo-api", params=params, json=data).json()
             return seo_response['data']
     
-    # Function to extract content within a specific HTML tag
-    def extract_html_content(html_content, tag):
-        start_index = html_content.find(f"<{tag}")
-        end_index = html_content.find(f"</{tag}>") + len(f"</{tag}>")
-        extracted_content = html_content[start_index:end_index] # Extract the substring within the tag
-        return extracted_content
-    
-    # Function to find all self-closing tags with a specific attribute
-    def find_self_closing_tags(html_content, tag, attribute):
-        soup = BeautifulSoup(html_content, 'html.parser')
-        matching_tags = soup.find_all(tag, attrs={attribute: True})
-        return matching_tags
+    # Get SEO score from the local analyzer, fetching the page first for URL input
+    def analyze_seo_locally(self, input: str, keyword: str, related_keywords: str):
+
+        if input.startswith("http"):
+            html = http_client.request("GET", input, service="page-fetch").text
+            return seo_analyzer.analyze(html, keyword, related_keywords, url=input)
+        return seo_analyzer.analyze(input, keyword, related_keywords)
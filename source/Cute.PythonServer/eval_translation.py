@@ -1,19 +1,22 @@
-
-from nltk.translate.gleu_score import sentence_gleu
-from nltk.translate.meteor_score import single_meteor_score
-from hlepor import single_hlepor_score
+import asyncio
 
 from deepeval import evaluate
 from deepeval.test_case import LLMTestCase
 from deepeval.metrics import BaseMetric
 
+import translation_scoring
+import worker_pool
+from preprocess import Preprocessor
+from translation_scoring import score_pairs
+
 
 class EvalTranslation:
     """
     Class for evaluating translation metrics using DeepEval library.
     """
 
-    def __init__(self, llm_model: str, th: float, input: str, actual_output: str, expected_output: str) :
+    def __init__(self, llm_model: str, th: float, input: str, actual_output: str, expected_output: str,
+                 tokenizer: str = "simple", language: str = "english") :
         """
         Initializes an instance of EvalTranslation.
 
@@ -23,11 +26,18 @@ class EvalTranslation:
             input (str): The input text for translation.
             actual_output (str): The actual translated output.
             expected_output (str): The expected translated output.
+            tokenizer (str): The tokenizer shared by all metrics ("simple", "word" or "nltk").
+            language (str): The language of the translation, used by language-aware tokenizers.
         """
+        self.llm_model = llm_model
+        self.threshold = th
+        self.tokenizer = tokenizer
+        self.language = language
         self.test_case = LLMTestCase(input=input, actual_output=actual_output, expected_output=expected_output)
-        self.gleu = GleuMetric(tresh_score=th, model=llm_model)
-        self.meteor = MeteorMetric(tresh_score=th, model=llm_model)
-        self.lepor = LeporMetric(tresh_score=th, model=llm_model)
+        preprocessor = Preprocessor(tokenizer, language)
+        self.gleu = GleuMetric(tresh_score=th, model=llm_model, preprocessor=preprocessor)
+        self.meteor = MeteorMetric(tresh_score=th, model=llm_model, preprocessor=preprocessor)
+        self.lepor = LeporMetric(tresh_score=th, model=llm_model, preprocessor=preprocessor)
 
     def evaluate(self) -> str:
         """
@@ -36,6 +46,14 @@ class EvalTranslation:
         Returns:
             str: The evaluation results in JSON format.
         """
+        # Score all three metrics in one worker task so the pair is tokenized once; the metrics then report
+        # these results when deepeval measures them.
+        pairs = [(self.test_case.actual_output, self.test_case.expected_output)]
+        scores = worker_pool.submit(score_pairs, "all", self.threshold,
+                                    self.tokenizer, self.language, pairs).result()[0]
+        for m in (self.gleu, self.meteor, self.lepor):
+            m.precomputed = scores[m.__name__]
+
         test_results = evaluate(test_cases=[self.test_case], 
                                 metrics=[self.gleu, self.meteor, self.lepor],
                                 print_results=False)
@@ -51,32 +69,45 @@ class EvalTranslation:
         Returns:
             str: The measurement results in JSON format.
         """
-        if metric == "gleu":
-            self.gleu.measure(self.test_case)
-            result = {
-                "Result": self.gleu.success,
-                "Score": self.gleu.score,
-                "Reason": self.gleu.reason
-            }
-            return result
-            
-        elif metric == "meteor":
-            self.meteor.measure(self.test_case)
-            result = {
-                "Result": self.meteor.success,
-                "Score": self.meteor.score,
-                "Reason": self.meteor.reason
-            }
-            return result
-                        
-        elif metric == "lepor":
-            self.lepor.measure(self.test_case)
-            result = {
-                "Result": bool(self.lepor.success),
-                "Score": self.lepor.score,
-                "Reason": self.lepor.reason
-            }
-            return result
+        match metric:
+            case "gleu" | "meteor" | "lepor":
+                return translation_scoring.score_pair(metric, self.threshold, self.tokenizer, self.language,
+                                                      self.test_case.actual_output, self.test_case.expected_output)
+
+
+async def measure_in_pool(metric: BaseMetric, test_case: LLMTestCase) -> float:
+    """
+    Measures a metric for a test case in the worker pool without blocking the event loop,
+    and records the outcome on the metric object. A result already computed for the metric
+    (see EvalTranslation.evaluate) is used instead of scoring again.
+
+    Args:
+        metric (BaseMetric): The metric to measure.
+        test_case (LLMTestCase): The test case to evaluate.
+
+    Returns:
+        float: The metric score.
+    """
+    name = metric.__name__
+    result = getattr(metric, 'precomputed', None)
+    if result is None:
+        pairs = [(test_case.actual_output, test_case.expected_output)]
+        preprocessor = metric.preprocessor
+        future = worker_pool.submit(score_pairs, name.lower(), metric.threshold,
+                                    preprocessor.tokenizer, preprocessor.language, pairs)
+        result = (await asyncio.wrap_future(future))[0][name]
+    metric.precomputed = None
+    record_result(metric, result)
+    return metric.score
+
+
+def record_result(metric: BaseMetric, result: dict):
+    """
+    Records a result in the response format (see translation_scoring.score_result) on a metric object.
+    """
+    metric.success = result["Result"]
+    metric.score = result["Score"]
+    metric.reason = result["Reason"]
 
 
 ###############################################################################################################
@@ -94,16 +125,18 @@ class MeteorMetric(BaseMetric):
     in that BLEU seeks correlation at the corpus level. The METEOR metric ranges from 0 to 1, where 1 indicates a perfect match.
     """
 
-    def __init__(self, tresh_score: float=0.5, model: str=None):
+    def __init__(self, tresh_score: float=0.5, model: str=None, preprocessor: Preprocessor=None):
         """
         Initialize the MeteorMetric object.
 
         Args:
             tresh_score (float): The threshold score for success. Default is 0.5.
             model (str): The model used for evaluation. Default is None.
+            preprocessor (Preprocessor): The tokenizer shared with the other metrics. Default is a new "simple" preprocessor.
         """
         self.threshold = tresh_score
         self.model = model
+        self.preprocessor = preprocessor or Preprocessor()
 
     def measure(self, test_case: LLMTestCase):
         """
@@ -115,18 +148,11 @@ class MeteorMetric(BaseMetric):
         Returns:
             float: The METEOR score for the test case.
         """
-        actual_output = test_case.actual_output.replace('.', '').split(' ')
-        expected_output = test_case.expected_output.replace('.', '').split(' ')
-
-        meteor_score = round(single_meteor_score(expected_output, actual_output), 2)
-        self.success = meteor_score >= self.threshold 
-        if self.success:
-            self.score = meteor_score
-            self.reason = f"The METEOR score is { self.score } because the generated translation is a close or exact match to the reference translation."
-        else:
-            self.score = meteor_score
-            self.reason = f"The METEOR score is { self.score } because the generated translation chose the wrong words, eaving things out, or scrambling the sentence order. Even if the words are mostly correct, if the translation sounds awkward or misses the key idea, it won't score well."
-            
+        pair = self.preprocessor.pair(test_case.actual_output, test_case.expected_output)
+
+        record_result(self, translation_scoring.score_result(
+            "METEOR", translation_scoring.meteor_score(pair), self.threshold))
+
         return self.score
 
     async def a_measure(self, test_case: LLMTestCase):
@@ -139,7 +165,7 @@ class MeteorMetric(BaseMetric):
         Returns:
             float: The METEOR score for the test case.
         """
-        return self.measure(test_case)
+        return await measure_in_pool(self, test_case)
     
     def is_successful(self):
         """
@@ -175,16 +201,18 @@ class GleuMetric(BaseMetric):
     reward objective.
     """
 
-    def __init__(self, tresh_score: float=0.5, model: str=None):
+    def __init__(self, tresh_score: float=0.5, model: str=None, preprocessor: Preprocessor=None):
         """
         Initialize the GleuMetric object.
 
         Args:
             tresh_score (float): The threshold score for success. Default is 0.5.
             model (str): The model name. Default is None.
+            preprocessor (Preprocessor): The tokenizer shared with the other metrics. Default is a new "simple" preprocessor.
         """
         self.threshold = tresh_score
         self.model = model
+        self.preprocessor = preprocessor or Preprocessor()
 
     def measure(self, test_case: LLMTestCase):
         """
@@ -196,17 +224,10 @@ class GleuMetric(BaseMetric):
         Returns:
             float: The GLEU score for the test case.
         """
-        expected_output = test_case.expected_output.replace('.', '').split(' ')
-        actual_output = test_case.actual_output.replace('.', '').split(' ')
+        pair = self.preprocessor.pair(test_case.actual_output, test_case.expected_output)
 
-        gleu_score = round(sentence_gleu([expected_output], actual_output), 2)
-        self.success = gleu_score >= self.threshold 
-        if self.success:
-            self.score = gleu_score
-            self.reason = f"The GLEU score is { self.score } because the generated translation is a close or exact match to the reference translation."
-        else:
-            self.score = gleu_score
-            self.reason = f"The GLEU score is { self.score } because the are significant differences between the generated translation and the reference translation, such as incorrect word choices, poor grammar, or missing key information."
+        record_result(self, translation_scoring.score_result(
+            "GLEU", translation_scoring.gleu_score(pair), self.threshold))
 
         return self.score
 
@@ -220,7 +241,7 @@ class GleuMetric(BaseMetric):
         Returns:
             float: The GLEU score for the test case.
         """
-        return self.measure(test_case)
+        return await measure_in_pool(self, test_case)
     
     def is_successful(self):
         """
@@ -252,16 +273,18 @@ class LeporMetric(BaseMetric):
     The LEPOR metric ranges from 0 to 1, where 1 indicates a perfect match between the reference and hypothesis.
     """
 
-    def __init__(self, tresh_score: float=0.5, model: str=None):
+    def __init__(self, tresh_score: float=0.5, model: str=None, preprocessor: Preprocessor=None):
         """
         Initialize the LeporMetric object.
 
         Args:
             tresh_score (float): The threshold score for success. Default is 0.5.
             model (str): The model used for evaluation. Default is None.
+            preprocessor (Preprocessor): The tokenizer shared with the other metrics. Default is a new "simple" preprocessor.
         """
         self.threshold = tresh_score
         self.model = model
+        self.preprocessor = preprocessor or Preprocessor()
 
     def measure(self, test_case: LLMTestCase):
         """
@@ -273,14 +296,10 @@ class LeporMetric(BaseMetric):
         Returns:
             float: The LEPOR score, ranging from 0 to 1.
         """
-        lepor_score = round(single_hlepor_score(reference=test_case.expected_output, hypothesis=test_case.actual_output), 2)
-        self.success = lepor_score >= self.threshold 
-        if self.success:
-            self.score = lepor_score
-            self.reason = f"The LEPOR score is { self.score } because the generated translation is a close or exact match to the reference translation."
-        else:
-            self.score = lepor_score
-            self.reason = f"The LEPOR score is { self.score } because the generated translation has poor lexical similarity, inadequate precision, and recall, as well as significant differences in word order compared to the reference translation."
+        pair = self.preprocessor.pair(test_case.actual_output, test_case.expected_output)
+
+        record_result(self, translation_scoring.score_result(
+            "LEPOR", translation_scoring.lepor_score(pair), self.threshold))
 
         return self.score
 
@@ -294,7 +313,7 @@ class LeporMetric(BaseMetric):
         Returns:
             float: The LEPOR score, ranging from 0 to 1.
         """
-        return self.measure(test_case)
+        return await measure_in_pool(self, test_case)
     
     def is_successful(self):
         """
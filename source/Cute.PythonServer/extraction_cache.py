@@ -0,0 +1,179 @@
+"""
+Cache of the truths and claims extracted by the faithfulness metric.
+
+Faithfulness makes three kinds of LLM calls: it extracts the truths of the retrieval context, extracts the claims
+of the actual output, then judges every claim against the truths. Entries of a content type are usually generated
+from the same fact sheet, so the truth extraction is repeated for every entry; and re-evaluating an unchanged
+output with new facts repeats the claim extraction. Extracted truths are therefore cached per retrieval context
+and claims per actual output (each normalized and hashed together with the model), so repeated contexts only cost
+the verdict call. Concurrent evaluations of the same text wait for one extraction instead of each making it.
+
+Entries are kept in an in-process LRU cache in front of a local SQLite database, so they survive restarts and are
+shared by the gunicorn worker processes. The cache is configured with environment variables:
+
+    CUTE_EXTRACTION_CACHE_PATH  Database file (default: cute_extractions.sqlite3 next to this module); "none" keeps
+                                entries in memory only.
+    CUTE_EXTRACTION_CACHE_SIZE  Entries kept in memory (default: 10000).
+    CUTE_EXTRACTION_CACHE_TTL   Seconds an entry stays valid (default: 604800).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+import settings
+from result_cache import MemoryCache, SqliteCache
+
+KINDS = ("truths", "claims")
+
+_memory = None
+_store = None
+_lock = threading.Lock()
+_pending = {}
+_stats = {kind: {"Hits": 0, "Misses": 0} for kind in KINDS}
+
+
+def normalize(text: str | list[str]) -> str:
+    """
+    Normalizes a text (or the items of a retrieval context) so whitespace differences share an entry.
+
+    Args:
+        text (str | list[str]): The text, or the items of a retrieval context.
+
+    Returns:
+        str: The items with runs of whitespace collapsed, one per line.
+    """
+    items = [text] if isinstance(text, str) else text
+    return "\n".join(" ".join(item.split()) for item in items)
+
+
+def extraction_key(kind: str, model: str, text: str | list[str], **parameters) -> str:
+    """
+    Computes the cache key of an extraction.
+
+    Args:
+        kind (str): "truths" or "claims".
+        model (str): The name of the model making the extraction.
+        text (str | list[str]): The text the extraction is made from.
+        **parameters: Every other setting that affects the extraction.
+
+    Returns:
+        str: The SHA-256 hex digest of the kind, model, normalized text and parameters.
+    """
+    canonical = json.dumps([kind, model, normalize(text), parameters], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+async def extracted(kind: str, key: str, extract) -> list[str]:
+    """
+    Gets an extraction from the cache, or makes and stores it. Concurrent callers on the same event loop (the
+    shared loop of async_runner) with the same key wait for the first one's extraction.
+
+    Args:
+        kind (str): "truths" or "claims".
+        key (str): The cache key, see extraction_key.
+        extract: Coroutine function making the extraction.
+
+    Returns:
+        list[str]: The extracted truths or claims.
+    """
+    value = _get(key)
+    if value is not None:
+        _count(kind, "Hits")
+        return value
+
+    loop = asyncio.get_running_loop()
+    pending = _pending.get((loop, key))
+    if pending is not None:
+        try:
+            value = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            # The first caller timed out, so extract again
+            return await extracted(kind, key, extract)
+        _count(kind, "Hits")
+        return list(value)
+
+    _count(kind, "Misses")
+    future = loop.create_future()
+    _pending[(loop, key)] = future
+    try:
+        value = list(await extract())
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Waiters get the error; mark it retrieved so an extraction nobody waited for is not logged
+        future.exception()
+        raise
+    else:
+        future.set_result(value)
+        _set(key, value)
+        return value
+    finally:
+        del _pending[(loop, key)]
+
+
+def stats() -> dict:
+    """
+    Gets the hit rates of the extraction cache.
+
+    Returns:
+        dict: The number of entries, and the hits, misses and hit rate of truths and claims.
+    """
+    if _memory is None:
+        entries = 0
+    else:
+        entries = len(_store) if _store is not None else len(_memory)
+    result = {"Entries": entries}
+    with _lock:
+        counted = {kind: dict(counts) for kind, counts in _stats.items()}
+    for kind, counts in counted.items():
+        total = counts["Hits"] + counts["Misses"]
+        result[kind.capitalize()] = {**counts, "Hit Rate": round(counts["Hits"] / total, 4) if total else None}
+    return result
+
+
+def _get(key: str) -> list[str] | None:
+    memory, store = _backends()
+    value = memory.get(key)
+    if value is None and store is not None:
+        value = store.get(key)
+        if value is not None:
+            memory.set(key, value, _ttl())
+    return json.loads(value) if value is not None else None
+
+
+def _set(key: str, value: list[str]):
+    memory, store = _backends()
+    serialized = json.dumps(value, ensure_ascii=False)
+    memory.set(key, serialized, _ttl())
+    if store is not None:
+        store.set(key, serialized, _ttl())
+
+
+def _count(kind: str, name: str):
+    # Extractions can run on several event loops, each on a thread of its own
+    with _lock:
+        _stats[kind][name] += 1
+
+
+def _backends() -> tuple[MemoryCache, SqliteCache | None]:
+    global _memory, _store
+
+    if _memory is None:
+        with _lock:
+            if _memory is None:
+                path = os.environ.get('CUTE_EXTRACTION_CACHE_PATH', os.path.join(
+                    os.path.dirname(os.path.abspath(__file__)), 'cute_extractions.sqlite3'))
+                _store = SqliteCache(path) if path.lower() != 'none' else None
+                _memory = MemoryCache(settings.int_setting('CUTE_EXTRACTION_CACHE_SIZE', 10000))
+    return _memory, _store
+
+
+def _ttl() -> float:
+    return float(settings.int_setting('CUTE_EXTRACTION_CACHE_TTL', 604800))
@@ -0,0 +1,38 @@
+"""
+Gunicorn settings for running the Cute Python Server in production:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Each preforked worker serves requests on a pool of threads; translation scoring runs in the worker's own
+metric process pool (see worker_pool.py) and LLM calls wait on its event loop (see async_runner.py).
+"""
+
+import multiprocessing
+import os
+
+import settings
+
+bind = f"{os.environ.get('SERVER_HOST', '0.0.0.0')}:{settings.int_setting('SERVER_PORT', 5555)}"
+
+# Request handling mostly waits on the metric process pool or on LLM calls, so a few workers with
+# many threads saturate the container without multiplying the per-worker memory footprint.
+workers = settings.int_setting('WEB_CONCURRENCY', 2)
+worker_class = 'gthread'
+threads = settings.int_setting('GUNICORN_THREADS', 16)
+
+keepalive = settings.int_setting('GUNICORN_KEEPALIVE', 5)
+timeout = settings.int_setting('GUNICORN_TIMEOUT', 180)
+graceful_timeout = settings.int_setting('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+# Share the CPUs between the metric process pools of all workers unless configured explicitly.
+os.environ.setdefault('CUTE_EVAL_WORKERS', str(max(1, multiprocessing.cpu_count() // workers)))
+
+
+def worker_exit(server, worker):
+    import job_queue
+    import worker_pool
+    job_queue.shutdown()
+    worker_pool.shutdown()
@@ -0,0 +1,195 @@
+"""
+Single-pass HTML parsing for the SEO metrics.
+
+A page is parsed once into an HtmlDocument holding everything the SEO checks use: the title, meta description,
+headings, visible body text, links, images and the body markup. lxml is used when it is installed; otherwise the
+document is parsed with the standard library's streaming HTMLParser.
+"""
+
+import re
+
+from html.parser import HTMLParser
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
+HEADINGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+SKIPPED = ('script', 'style', 'noscript', 'template')
+
+_SPACE = re.compile(r"\s+")
+
+
+class HtmlDocument:
+    """
+    The parts of an HTML page used by the SEO checks.
+    """
+
+    __slots__ = ("title", "meta_description", "headings", "text", "links", "images", "body_html")
+
+    def __init__(self):
+        self.title: str | None = None                   # Title text, whitespace normalized
+        self.meta_description: str | None = None        # Content of the description meta tag
+        self.headings: list[tuple[str, str]] = []       # (tag, text) of the headings in document order
+        self.text: str = ""                             # Visible text outside the title, scripts and styles
+        self.links: list[str] = []                      # Link targets
+        self.images: list[tuple[str, str]] = []         # (src, alt) of the images
+        self.body_html: str = ""                        # Markup of the body element, or the whole document
+
+
+def parse(html: str, parser: str = None) -> HtmlDocument:
+    """
+    Parses an HTML page.
+
+    Args:
+        html (str): The HTML of the page or a fragment of it.
+        parser (str): "lxml" or "html.parser". Defaults to lxml when it is installed.
+
+    Returns:
+        HtmlDocument: The parsed page.
+    """
+    parser = parser or ("lxml" if lxml is not None else "html.parser")
+
+    if not html or not html.strip():
+        return HtmlDocument()
+
+    match parser:
+        case "lxml":
+            return _parse_lxml(html)
+        case "html.parser":
+            return _parse_stdlib(html)
+        case _:
+            raise ValueError(f"Invalid HTML parser '{parser}'")
+
+
+def normalize(text: str) -> str:
+    """
+    Collapses runs of whitespace into single spaces and strips the text.
+    """
+    return _SPACE.sub(' ', text).strip()
+
+
+def _parse_lxml(html: str) -> HtmlDocument:
+    document = HtmlDocument()
+    root = lxml.html.document_fromstring(html)
+
+    for element in root.iter('title', 'meta', *HEADINGS, 'a', 'img'):
+        match element.tag:
+            case 'title':
+                if document.title is None:
+                    document.title = normalize(element.text_content())
+            case 'meta':
+                if document.meta_description is None:
+                    document.meta_description = _meta_description(element.attrib)
+            case 'a':
+                href = element.get('href')
+                if href:
+                    document.links.append(href)
+            case 'img':
+                document.images.append((element.get('src') or '', element.get('alt') or ''))
+            case _:
+                document.headings.append((element.tag, normalize(element.text_content())))
+
+    body = root.find('body')
+    if body is not None:
+        document.body_html = lxml.html.tostring(body, encoding='unicode')
+        lxml.etree.strip_elements(body, *SKIPPED, with_tail=False)
+        document.text = ' '.join(body.itertext())
+    else:
+        document.body_html = html
+
+    return document
+
+
+def _parse_stdlib(html: str) -> HtmlDocument:
+    parser = _DocumentParser(html)
+    parser.feed(html)
+    parser.close()
+    return parser.document
+
+
+def _meta_description(attributes) -> str | None:
+    # Standard <meta name="description" content="...">, or the description attribute used by older content
+    if (attributes.get('name') or '').lower() == 'description':
+        return attributes.get('content') or ''
+    if 'description' in attributes:
+        return attributes.get('description') or ''
+    return None
+
+
+class _DocumentParser(HTMLParser):
+    """
+    Streaming parser filling an HtmlDocument in one pass over the markup.
+    """
+
+    def __init__(self, html: str):
+        super().__init__(convert_charrefs=True)
+        self.html = html
+        self.document = HtmlDocument()
+        self.text = []
+        self.line_starts = None
+        self.body_start = None
+        self.body_end = None
+        self._title = None
+        self._heading = None
+        self._skipping = 0
+
+    def handle_starttag(self, tag: str, attrs: list):
+        match tag:
+            case 'title' if self.document.title is None:
+                self._title = []
+            case 'meta':
+                if self.document.meta_description is None:
+                    self.document.meta_description = _meta_description(dict(attrs))
+            case 'h1' | 'h2' | 'h3' | 'h4' | 'h5' | 'h6':
+                self._heading = (tag, [])
+            case 'a':
+                href = dict(attrs).get('href')
+                if href:
+                    self.document.links.append(href)
+            case 'img':
+                attributes = dict(attrs)
+                self.document.images.append((attributes.get('src') or '', attributes.get('alt') or ''))
+            case 'body' if self.body_start is None:
+                self.body_start = self._offset()
+            case _ if tag in SKIPPED:
+                self._skipping += 1
+
+    def handle_endtag(self, tag: str):
+        if tag == 'title' and self._title is not None:
+            self.document.title = normalize(''.join(self._title))
+            self._title = None
+        elif self._heading is not None and tag == self._heading[0]:
+            self.document.headings.append((tag, normalize(''.join(self._heading[1]))))
+            self._heading = None
+        elif tag == 'body' and self.body_start is not None:
+            self.body_end = self.html.find('>', self._offset()) + 1
+        elif tag in SKIPPED and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data: str):
+        if self._skipping:
+            return
+        if self._title is not None:
+            self._title.append(data)
+            return
+        if self._heading is not None:
+            self._heading[1].append(data)
+        self.text.append(data)
+
+    def close(self):
+        super().close()
+        self.document.text = ' '.join(self.text)
+        if self.body_start is None:
+            self.document.body_html = self.html
+        else:
+            self.document.body_html = self.html[self.body_start:self.body_end or len(self.html)]
+
+    def _offset(self) -> int:
+        # Converts the parser's (line, column) position into an offset in the markup
+        if self.line_starts is None:
+            self.line_starts = [0] + [match.end() for match in re.finditer('\n', self.html)]
+        line, column = self.getpos()
+        return self.line_starts[line - 1] + column
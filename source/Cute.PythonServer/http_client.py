@@ -0,0 +1,187 @@
+"""
+Shared HTTP session for the external APIs called by the metrics.
+
+Every call goes through one pooled requests.Session, so connections are kept alive and reused. Calls have connect
+and read timeouts and are retried with jittered exponential backoff on connection errors, 429 (honoring
+Retry-After) and 5xx responses. No retry waits longer than MAX_BACKOFF seconds: a Retry-After beyond it is answered
+with the error, so a throttled API does not park a request thread. A token bucket spaces calls out so batch runs
+stay under the API quota; every attempt, including each retry, takes a token.
+
+    CUTE_HTTP_POOL_SIZE        Connections kept per host (default: 32).
+    CUTE_HTTP_CONNECT_TIMEOUT  Seconds to wait for a connection (default: 5).
+    CUTE_HTTP_READ_TIMEOUT     Seconds to wait for a response (default: 60).
+    CUTE_HTTP_RETRIES          Retries of a failed call (default: 3).
+    CUTE_HTTP_BACKOFF          Backoff factor of the retries in seconds (default: 0.5).
+    CUTE_SEO_RATE_LIMIT        Calls per second to the SEO Review Tools API (default: 0, unlimited).
+    CUTE_SEO_RATE_BURST        Calls that may be made at once before the rate limit applies (default: 1).
+"""
+
+import random
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+
+import requests
+
+import settings
+import telemetry
+
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_BACKOFF = 30.0
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket allowing `rate` calls per second with bursts of up to `burst` calls.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token, waiting until one is available.
+        """
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_session = None
+_session_lock = threading.Lock()
+_limiters = {}
+
+
+def get_session() -> requests.Session:
+    """
+    Gets the shared session, creating it on first use.
+
+    Returns:
+        requests.Session: The session with pooled adapters mounted. Retries are made by request, so that every
+            attempt passes the rate limiter.
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = settings.int_setting('CUTE_HTTP_POOL_SIZE', 32)
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def get_limiter(name: str, rate_setting: str, burst_setting: str) -> RateLimiter:
+    """
+    Gets the rate limiter of an API, creating it on first use.
+
+    Args:
+        name (str): The name of the API.
+        rate_setting (str): The environment variable with the calls per second.
+        burst_setting (str): The environment variable with the burst size.
+
+    Returns:
+        RateLimiter: The rate limiter.
+    """
+    with _session_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = RateLimiter(settings.float_setting(rate_setting, 0), settings.int_setting(burst_setting, 1))
+            _limiters[name] = limiter
+        return limiter
+
+
+def request(method: str, url: str, limiter: RateLimiter = None, service: str = "other", **kwargs) -> requests.Response:
+    """
+    Sends a request with the shared session, retrying connection errors and retryable statuses.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The URL.
+        limiter (RateLimiter): The rate limiter of the API, if any.
+        service (str): The name the call's latency is recorded under.
+        **kwargs: Further arguments of requests.Session.request.
+
+    Returns:
+        requests.Response: The response.
+
+    Raises:
+        requests.HTTPError: The API still responded with an error status after the retries.
+        requests.RequestException: The API could not be reached.
+    """
+    kwargs.setdefault('timeout', timeouts())
+    retries = max(0, settings.int_setting('CUTE_HTTP_RETRIES', 3))
+    backoff = settings.float_setting('CUTE_HTTP_BACKOFF', 0.5)
+    started = time.perf_counter()
+    status = None
+    try:
+        for attempt in range(retries + 1):
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                response = get_session().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+                time.sleep(_backoff(attempt, backoff))
+                continue
+            status = response.status_code
+            retry_after = _retry_after(response)
+            if status not in RETRY_STATUSES or attempt == retries or retry_after > MAX_BACKOFF:
+                break
+            response.close()
+            time.sleep(max(retry_after, _backoff(attempt, backoff)))
+    finally:
+        telemetry.OUTBOUND_SECONDS.labels(service, telemetry.outcome(status)).observe(time.perf_counter() - started)
+    response.raise_for_status()
+    return response
+
+
+def timeouts() -> tuple[float, float]:
+    """
+    Gets the configured connect and read timeouts.
+
+    Returns:
+        tuple[float, float]: The connect and read timeouts in seconds.
+    """
+    return settings.float_setting('CUTE_HTTP_CONNECT_TIMEOUT', 5), settings.float_setting('CUTE_HTTP_READ_TIMEOUT', 60)
+
+
+def _backoff(attempt: int, backoff: float) -> float:
+    # The first retry is immediate, then the delay doubles, with up to `backoff` seconds of jitter
+    delay = backoff * 2 ** (attempt - 1) if attempt else 0.0
+    return min(MAX_BACKOFF, delay + random.uniform(0, backoff))
+
+
+def _retry_after(response: requests.Response) -> float:
+    # Retry-After holds seconds or an HTTP date
+    value = response.headers.get('Retry-After')
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,496 @@
+"""
+Persistent job queue for long-running evaluations.
+
+A job is an evaluation request submitted to the job API instead of its endpoint: it is stored in a local SQLite
+database and answered with a job ID at once, then run by a scheduler thread, so the HTTP request no longer waits
+for the LLM or SEO API. Jobs run in priority order (higher first, then oldest first), with a bounded number of
+queued jobs, a number of scheduler threads per server process and optionally a limit per endpoint family. Batch
+jobs store their results as they complete, so they can be polled while they run, and running jobs stop at the
+next item when cancelled.
+
+The database is the only shared state, so all gunicorn worker processes serve the same jobs and any of them can
+run a job. Running jobs send heartbeats; a job whose process stopped (for example on a restart) is queued again.
+API keys in a job's `env` are never written to the database: they stay in the memory of the process the job was
+submitted to, which is the only one that runs the job. If that process is gone before the job starts, the job
+fails and must be resubmitted. The queue is configured with environment variables:
+
+    CUTE_JOB_PATH        Database file (default: cute_jobs.sqlite3 next to this module).
+    CUTE_JOB_WORKERS     Jobs run at once by each server process (default: 4).
+    CUTE_JOB_QUEUE_SIZE  Queued jobs accepted before submissions are refused with 429 (default: 1000).
+    CUTE_JOB_LIMITS      Jobs of a family run at once by each server process, e.g. "generator=2,seo=2"
+                         (default: no limit beyond CUTE_JOB_WORKERS).
+    CUTE_JOB_RETENTION   Seconds finished jobs and their results are kept (default: 86400).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import settings
+
+JOB_STATUSES = ("queued", "running", "completed", "failed", "cancelled")
+SECRET_SETTINGS = ("Cute__OpenAiApiKey",)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+class QueueFull(Exception):
+    """
+    Raised when a job is submitted while the queue holds the maximum number of queued jobs.
+    """
+
+
+class JobCancelled(Exception):
+    """
+    Raised by a job runner that stopped because the job was cancelled.
+    """
+
+
+class Job:
+    """
+    A job being run, as seen by the job runner.
+    """
+
+    CHECK_INTERVAL = 0.5
+
+    def __init__(self, queue: "JobQueue", job_id: str, endpoint: str, payload: dict):
+        self.queue = queue
+        self.id = job_id
+        self.endpoint = endpoint
+        self.payload = payload
+        self.pending = []
+        self.completed = 0
+        self.flushed = time.monotonic()
+        self.checked = 0.0
+        self.cancel_requested = False
+
+    def add_result(self, result: dict):
+        """
+        Records the result of one item of a batch job. Results are written to the database in groups.
+        """
+        self.pending.append(result)
+        if len(self.pending) >= 100 or time.monotonic() - self.flushed >= 1:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.queue.store_results(self.id, self.completed, self.pending)
+            self.completed += len(self.pending)
+            self.pending = []
+        self.flushed = time.monotonic()
+
+    def cancelled(self) -> bool:
+        """
+        Checks whether the job was cancelled, reading the database at most every CHECK_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if not self.cancel_requested and now - self.checked >= self.CHECK_INTERVAL:
+            self.checked = now
+            self.cancel_requested = self.queue.cancel_requested(self.id)
+        return self.cancel_requested
+
+
+class JobQueue:
+    """
+    Job queue stored in SQLite, with scheduler threads running the jobs.
+    """
+
+    POLL_INTERVAL = 1.0
+    HEARTBEAT_INTERVAL = 5.0
+    STALE_AFTER = 30.0
+
+    def __init__(self, path: str, runner, workers: int = 4, max_queued: int = 1000, limits: dict = None,
+                 retention: float = 86400):
+        """
+        Initializes a job queue and starts its scheduler threads.
+
+        Args:
+            path (str): The database file.
+            runner: Function running a Job and returning its result; it raises JobCancelled when it stops
+                because the job was cancelled, and any other exception fails the job.
+            workers (int): Jobs run at once by this process.
+            max_queued (int): Queued jobs accepted before submissions are refused.
+            limits (dict): Jobs of a family run at once by this process.
+            retention (float): Seconds finished jobs are kept.
+        """
+        self.runner = runner
+        self.workers = workers
+        self.max_queued = max_queued
+        self.limits = limits or {}
+        self.retention = retention
+        self.instance = uuid.uuid4().hex
+        self.secrets = {}
+        self.running = {}
+        # Every use of the connection holds the lock, so the threads never interleave statements
+        self.lock = threading.RLock()
+        self.wakeup = threading.Condition(self.lock)
+        self.stopped = threading.Event()
+        self.stopping = False
+
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, endpoint TEXT NOT NULL, family TEXT NOT NULL, priority INTEGER NOT NULL,
+                payload TEXT NOT NULL, status TEXT NOT NULL, submitted REAL NOT NULL, started REAL, finished REAL,
+                owner TEXT, pinned TEXT, heartbeat REAL, cancel INTEGER NOT NULL DEFAULT 0,
+                completed INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT);
+            CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, submitted);
+            CREATE TABLE IF NOT EXISTS job_results (job TEXT NOT NULL, position INTEGER NOT NULL, result TEXT NOT NULL,
+                PRIMARY KEY (job, position));
+            CREATE TABLE IF NOT EXISTS job_instances (id TEXT PRIMARY KEY, heartbeat REAL NOT NULL);
+        """)
+        self._execute("INSERT INTO job_instances (id, heartbeat) VALUES (?, ?)", (self.instance, time.time()))
+
+        self.threads = [threading.Thread(target=self._heartbeat, name="cute-jobs-heartbeat", daemon=True)]
+        self.threads += [threading.Thread(target=self._work, name=f"cute-jobs-{i}", daemon=True) for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, endpoint: str, family: str, payload: dict, priority: int = 0) -> dict:
+        """
+        Queues a job.
+
+        Args:
+            endpoint (str): The API path the job runs, relative to /api.
+            family (str): The endpoint family, for the per-family limits.
+            payload (dict): The request body of the endpoint.
+            priority (int): Jobs with higher priority run first.
+
+        Returns:
+            dict: The job status.
+
+        Raises:
+            QueueFull: The queue holds the maximum number of queued jobs.
+        """
+        job_id = uuid.uuid4().hex
+        stored, secrets = _split_secrets(payload)
+        with self.lock:
+            if self._execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'")[0][0] >= self.max_queued:
+                raise QueueFull(f"The job queue is full ({self.max_queued} queued jobs)")
+            if secrets:
+                self.secrets[job_id] = secrets
+            self._execute("INSERT INTO jobs (id, endpoint, family, priority, payload, status, submitted, pinned) "
+                          "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                          (job_id, endpoint, family, int(priority), json.dumps(stored), time.time(),
+                           self.instance if secrets else None))
+            self.wakeup.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str, offset: int = 0) -> dict | None:
+        """
+        Gets the status of a job, with its result or the batch results stored so far.
+
+        Args:
+            job_id (str): The job ID.
+            offset (int): The first batch result to return, to fetch only results not seen yet.
+
+        Returns:
+            dict | None: The job status, or None if there is no such job.
+        """
+        rows = self._execute("SELECT id, endpoint, priority, status, submitted, started, finished, completed, "
+                             "result, error, cancel FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        status = _status(row)
+        if row[3] == "queued":
+            status["Position"] = self._execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND (priority > ? OR (priority = ? AND submitted < ?))",
+                (row[2], row[2], row[4]))[0][0] + 1
+        results = self._execute("SELECT result FROM job_results WHERE job = ? AND position >= ? ORDER BY position",
+                                (job_id, offset))
+        if results:
+            status["Results"] = {"Offset": offset, "Items": [json.loads(result) for result, in results]}
+        if row[8] is not None:
+            status["Result"] = json.loads(row[8])
+        return status
+
+    def recent(self, status: str = None, limit: int = 100) -> list[dict]:
+        """
+        Lists the most recent jobs, without their results.
+
+        Args:
+            status (str): Only list jobs with this status.
+            limit (int): The maximum number of jobs.
+
+        Returns:
+            list[dict]: The status of each job, newest first.
+        """
+        if status is not None and status not in JOB_STATUSES:
+            raise ValueError(f"Invalid job status '{status}'")
+        rows = self._execute("SELECT id, endpoint, priority, status, submitted, started, finished, completed, "
+                             "NULL, error, cancel FROM jobs WHERE ? IS NULL OR status = ? "
+                             "ORDER BY submitted DESC LIMIT ?", (status, status, limit))
+        return [_status(row) for row in rows]
+
+    def cancel(self, job_id: str) -> dict | None:
+        """
+        Cancels a job. A queued job is cancelled at once; a running job stops at its next item, or once its
+        current evaluation returns, and its result is discarded.
+
+        Args:
+            job_id (str): The job ID.
+
+        Returns:
+            dict | None: The job status, or None if there is no such job.
+        """
+        with self.lock:
+            self._execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                          (time.time(), job_id))
+            self._execute("UPDATE jobs SET cancel = 1 WHERE id = ? AND status = 'running'", (job_id,))
+            if self._execute("SELECT status FROM jobs WHERE id = ?", (job_id,)) == [("cancelled",)]:
+                self.secrets.pop(job_id, None)
+        return self.get(job_id)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        rows = self._execute("SELECT cancel FROM jobs WHERE id = ?", (job_id,))
+        return bool(rows and rows[0][0])
+
+    def store_results(self, job_id: str, position: int, results: list[dict]):
+        with self.lock:
+            self.connection.executemany("INSERT OR REPLACE INTO job_results (job, position, result) VALUES (?, ?, ?)",
+                                        [(job_id, position + i, json.dumps(result)) for i, result in enumerate(results)])
+            self.connection.execute("UPDATE jobs SET completed = ? WHERE id = ?", (position + len(results), job_id))
+
+    def stats(self) -> dict:
+        """
+        Gets the number of jobs per status and the jobs running in this process.
+        """
+        counts = dict(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {
+            "Jobs": {status.title(): counts.get(status, 0) for status in JOB_STATUSES},
+            "Running Here": len(self.running),
+            "Workers": self.workers,
+            "Queue Size": self.max_queued
+        }
+
+    def stop(self):
+        """
+        Stops taking jobs. Queued jobs stay in the database; jobs still running here are abandoned and queued
+        again once their heartbeats stop.
+        """
+        with self.lock:
+            self.stopping = True
+            self.wakeup.notify_all()
+        self.stopped.set()
+        self.threads[0].join()
+        self._execute("DELETE FROM job_instances WHERE id = ?", (self.instance,))
+
+    def _work(self):
+        while True:
+            with self.lock:
+                claimed = None
+                while not self.stopping and claimed is None:
+                    claimed = self._claim()
+                    if claimed is None:
+                        self.wakeup.wait(self.POLL_INTERVAL)
+                if self.stopping:
+                    return
+            self._run(*claimed)
+
+    def _claim(self) -> tuple | None:
+        # Called with the lock held: takes the first queued job this process may run
+        busy = {}
+        for family in self.running.values():
+            busy[family] = busy.get(family, 0) + 1
+        full = [family for family, limit in self.limits.items() if busy.get(family, 0) >= limit]
+        alive = time.time() - self.STALE_AFTER
+
+        # Failing an orphaned job or losing a job to another process moves on to the next queued job
+        while True:
+            rows = self._execute(
+                "SELECT id, endpoint, family, payload, pinned FROM jobs WHERE status = 'queued' "
+                f"AND family NOT IN ({','.join('?' * len(full))}) "
+                "AND (pinned IS NULL OR pinned = ? OR pinned NOT IN (SELECT id FROM job_instances WHERE heartbeat >= ?)) "
+                "ORDER BY priority DESC, submitted LIMIT 1", (*full, self.instance, alive))
+            if not rows:
+                return None
+
+            job_id, endpoint, family, payload, pinned = rows[0]
+            if pinned is not None and pinned != self.instance:
+                # The process holding the job's API key has stopped
+                self._execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? "
+                              "WHERE id = ? AND status = 'queued'",
+                              (time.time(), "The job's credentials were lost when the server restarted; resubmit it", job_id))
+                continue
+
+            claimed = self._update("UPDATE jobs SET status = 'running', started = ?, owner = ?, heartbeat = ? "
+                                   "WHERE id = ? AND status = 'queued'",
+                                   (time.time(), self.instance, time.time(), job_id))
+            if claimed:
+                break
+
+        self.running[job_id] = family
+        payload = _merge_secrets(json.loads(payload), self.secrets.pop(job_id, None))
+        return job_id, endpoint, payload
+
+    def _run(self, job_id: str, endpoint: str, payload: dict):
+        job = Job(self, job_id, endpoint, payload)
+        result, error, status = None, None, "completed"
+        try:
+            result = self.runner(job)
+            if job.cancelled():
+                raise JobCancelled()
+        except JobCancelled:
+            status, result = "cancelled", None
+        except Exception as e:
+            status, error = "failed", str(e) or type(e).__name__
+        try:
+            job.flush()
+        finally:
+            with self.lock:
+                self.running.pop(job_id, None)
+                # A job queued again after missing its heartbeats belongs to no one and is not finished here
+                self._execute("UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE id = ? AND owner = ?",
+                              (status, time.time(), json.dumps(result) if result is not None else None, error,
+                               job_id, self.instance))
+
+    def _heartbeat(self):
+        purged = 0.0
+        while not self.stopped.is_set():
+            with self.lock:
+                now = time.time()
+                self._execute("UPDATE job_instances SET heartbeat = ? WHERE id = ?", (now, self.instance))
+                if self.running:
+                    self._execute(f"UPDATE jobs SET heartbeat = ? WHERE id IN ({','.join('?' * len(self.running))})",
+                                  (now, *self.running))
+                # Jobs of processes that stopped sending heartbeats are queued again, from their first item
+                stale = "SELECT id FROM jobs WHERE status = 'running' AND heartbeat < ?"
+                self._execute(f"DELETE FROM job_results WHERE job IN ({stale})", (now - self.STALE_AFTER,))
+                if self._update("UPDATE jobs SET status = 'queued', owner = NULL, started = NULL, completed = 0 "
+                                f"WHERE id IN ({stale})", (now - self.STALE_AFTER,)):
+                    self.wakeup.notify_all()
+                if now - purged >= 3600:
+                    purged = now
+                    self._purge(now)
+            self.stopped.wait(self.HEARTBEAT_INTERVAL)
+
+    def _purge(self, now: float):
+        self._execute("DELETE FROM job_results WHERE job IN (SELECT id FROM jobs WHERE finished < ?)",
+                      (now - self.retention,))
+        self._execute("DELETE FROM jobs WHERE finished < ?", (now - self.retention,))
+        self._execute("DELETE FROM job_instances WHERE heartbeat < ?", (now - self.retention,))
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def _update(self, sql: str, parameters: tuple = ()) -> int:
+        with self.lock:
+            return self.connection.execute(sql, parameters).rowcount
+
+
+def get_queue(runner) -> JobQueue:
+    """
+    Gets the job queue of this process, creating it and starting its scheduler on first use.
+
+    Args:
+        runner: Function running a Job, see JobQueue.
+
+    Returns:
+        JobQueue: The queue.
+    """
+    global _queue
+
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(database_path(), runner,
+                                  max(1, settings.int_setting('CUTE_JOB_WORKERS', 4)),
+                                  max(1, settings.int_setting('CUTE_JOB_QUEUE_SIZE', 1000)),
+                                  _limits(os.environ.get('CUTE_JOB_LIMITS', '')),
+                                  float(settings.int_setting('CUTE_JOB_RETENTION', 86400)))
+    return _queue
+
+
+def resume(runner):
+    """
+    Starts the scheduler at server startup if jobs were ever submitted, so queued jobs continue after a restart.
+
+    Args:
+        runner: Function running a Job, see JobQueue.
+    """
+    if os.path.exists(database_path()):
+        get_queue(runner)
+
+
+def started() -> JobQueue | None:
+    """
+    Gets the job queue of this process if it was started.
+    """
+    return _queue
+
+
+def database_path() -> str:
+    """
+    Gets the configured database file.
+    """
+    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cute_jobs.sqlite3')
+    return os.environ.get('CUTE_JOB_PATH', default_path)
+
+
+def shutdown():
+    """
+    Stops the scheduler of this process, if it was started.
+    """
+    global _queue
+
+    with _queue_lock:
+        if _queue is not None:
+            _queue.stop()
+            _queue = None
+
+
+def _status(row: tuple) -> dict:
+    job_id, endpoint, priority, status, submitted, started, finished, completed, _, error, cancel = row
+    result = {
+        "Id": job_id,
+        "Endpoint": endpoint,
+        "Priority": priority,
+        "Status": status,
+        "Submitted": _timestamp(submitted),
+        "Started": _timestamp(started),
+        "Finished": _timestamp(finished),
+        "Completed Items": completed,
+    }
+    if cancel and status == "running":
+        result["Cancelling"] = True
+    if error is not None:
+        result["Error"] = error
+    return result
+
+
+def _timestamp(value: float | None) -> str | None:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(value)) if value is not None else None
+
+
+def _split_secrets(payload: dict) -> tuple[dict, dict]:
+    env = payload.get('env') or {}
+    secrets = {name: env[name] for name in SECRET_SETTINGS if name in env}
+    if not secrets:
+        return payload, {}
+    return dict(payload, env={name: value for name, value in env.items() if name not in secrets}), secrets
+
+
+def _merge_secrets(payload: dict, secrets: dict | None) -> dict:
+    if not secrets:
+        return payload
+    return dict(payload, env=dict(payload.get('env') or {}, **secrets))
+
+
+def _limits(setting: str) -> dict:
+    limits = {}
+    for part in setting.split(','):
+        if '=' in part:
+            family, limit = part.split('=', 1)
+            try:
+                limits[family.strip()] = max(1, int(limit))
+            except ValueError:
+                # Like a malformed numeric setting, a malformed limit leaves the default: no limit for the family
+                continue
+    return limits
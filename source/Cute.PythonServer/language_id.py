@@ -0,0 +1,147 @@
+"""
+Lightweight language identification for the evaluation pipeline's language gate.
+
+A text is identified by its dominant writing system, and a text in Latin script by the share of its words that are
+among the most common function words of each language. No corpus or model is downloaded and a page is identified in
+about a millisecond, but only the languages of STOPWORDS and SCRIPTS are told apart. A text that is too short
+or too ambiguous to identify is reported as undetermined rather than guessed, so it is never rejected for its
+language.
+"""
+
+import re
+import unicodedata
+
+# The most frequent function words of each language written in Latin script, using NLTK's language names
+STOPWORDS = {
+    "english": frozenset("the and of to is in that it was for on are with as this be at by from have not or but "
+                         "they which you were their has had will would an what there can all been".split()),
+    "spanish": frozenset("el la los las del que y en un una es por con para no se su al lo como más pero sus le ya "
+                         "o fue este ha muy también porque esta entre cuando".split()),
+    "french": frozenset("le la les des du et est un une que qui dans pour pas sur au ce il elle avec ne se plus par "
+                        "mais nous vous sont ou son aux leur été être".split()),
+    "german": frozenset("der die das und ist nicht ein eine zu den von mit sich des auf für im dem auch es an als "
+                        "wie wird bei sind oder aus werden nach noch".split()),
+    "italian": frozenset("il di che è e la per un una non sono del della con gli le si da al ma come anche più nel "
+                         "dei delle ha questo alla ci".split()),
+    "portuguese": frozenset("o a os as do da dos das que e em um uma é não para com por se mais no na ao como mas "
+                            "foi ele ela são também seu sua".split()),
+    "dutch": frozenset("de het een en van is dat niet op te in zijn voor met die ook als er maar om aan bij hij "
+                       "was door naar dan wordt nog".split()),
+    "swedish": frozenset("och att det som en på är av för med till den har inte om ett de var jag men så han kan "
+                         "från eller vi när också".split()),
+}
+
+# Languages written in scripts other than Latin, by the scripts their texts are dominated by
+SCRIPTS = {
+    "russian": {"Cyrillic"},
+    "ukrainian": {"Cyrillic"},
+    "bulgarian": {"Cyrillic"},
+    "greek": {"Greek"},
+    "arabic": {"Arabic"},
+    "persian": {"Arabic"},
+    "hebrew": {"Hebrew"},
+    "hindi": {"Devanagari"},
+    "thai": {"Thai"},
+    "korean": {"Hangul"},
+    "chinese": {"Han"},
+    # Japanese mixes kana with kanji, and a short text may be written in kanji only
+    "japanese": {"Kana", "Han"},
+}
+
+_UNICODE_SCRIPTS = {"LATIN": "Latin", "CYRILLIC": "Cyrillic", "GREEK": "Greek", "ARABIC": "Arabic",
+                    "HEBREW": "Hebrew", "DEVANAGARI": "Devanagari", "THAI": "Thai", "HANGUL": "Hangul",
+                    "CJK": "Han", "HIRAGANA": "Kana", "KATAKANA": "Kana"}
+
+_WORD = re.compile(r"\w+")
+
+# Letters and words looked at; the beginning of a long text is representative of all of it
+SAMPLE_LETTERS = 2000
+SAMPLE_WORDS = 500
+# Function words a Latin text needs, and how many times more than the runner-up, to be identified
+MIN_STOPWORDS = 3
+MIN_MARGIN = 1.5
+
+
+def script(text: str) -> str | None:
+    """
+    Gets the writing system most letters of a text are written in.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str | None: The script ("Latin", "Cyrillic", "Han", ...), or None if the text has no letters or no
+            script has a majority.
+    """
+    counts = {}
+    letters = 0
+    for character in text:
+        if not character.isalpha():
+            continue
+        name = _UNICODE_SCRIPTS.get(unicodedata.name(character, "").split(" ", 1)[0])
+        counts[name] = counts.get(name, 0) + 1
+        letters += 1
+        if letters == SAMPLE_LETTERS:
+            break
+    if not letters:
+        return None
+    dominant, count = max(counts.items(), key=lambda item: item[1])
+    return dominant if count * 2 > letters else None
+
+
+def identify(text: str) -> tuple[str | None, str | None]:
+    """
+    Identifies the language of a text.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        tuple[str | None, str | None]: The language (an NLTK language name, or None if it cannot be determined)
+            and the dominant script of the text.
+    """
+    dominant = script(text)
+    if dominant != "Latin":
+        languages = [language for language, scripts in SCRIPTS.items() if dominant in scripts]
+        # A script used by a single language identifies it
+        return (languages[0] if len(languages) == 1 else None), dominant
+
+    hits = dict.fromkeys(STOPWORDS, 0)
+    for index, match in enumerate(_WORD.finditer(text.lower())):
+        if index == SAMPLE_WORDS:
+            break
+        word = match.group()
+        for language, words in STOPWORDS.items():
+            if word in words:
+                hits[language] += 1
+
+    ranked = sorted(hits.items(), key=lambda item: item[1], reverse=True)
+    (best, best_hits), (_, second_hits) = ranked[0], ranked[1]
+    if best_hits >= MIN_STOPWORDS and best_hits >= second_hits * MIN_MARGIN:
+        return best, dominant
+    return None, dominant
+
+
+def mismatch(text: str, expected: str) -> tuple[str | None, str | None, bool]:
+    """
+    Checks whether a text is identifiably written in another language than expected.
+
+    Args:
+        text (str): The text.
+        expected (str): The NLTK name of the expected language.
+
+    Returns:
+        tuple[str | None, str | None, bool]: The identified language and script, and whether they rule out the
+            expected language. Languages that are not known here are only ruled out by their script.
+    """
+    language, dominant = identify(text)
+    expected = expected.lower()
+    if expected in STOPWORDS:
+        scripts = {"Latin"}
+    else:
+        scripts = SCRIPTS.get(expected)
+    if scripts is None or dominant is None:
+        return language, dominant, False
+    if dominant not in scripts:
+        return language, dominant, True
+    return language, dominant, language is not None and language != expected and expected in STOPWORDS
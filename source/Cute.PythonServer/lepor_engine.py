@@ -0,0 +1,154 @@
+"""
+Indexed hLEPOR engine.
+
+hLEPOR is the weighted harmonic mean of an enhanced length penalty, the harmonic mean of precision and recall and an
+n-gram position difference penalty (NPD). The hlepor package finds the positions of every matched word by scanning
+both sentences once per distinct word, and compares the context of every reference occurrence of a repeated word
+with every hypothesis occurrence by slicing lists and building NumPy arrays, so its cost grows with the square of the
+document length. Here the positions of all words come from one pass over each sentence, and the context windows (the
+n words before and after an occurrence) of the reference occurrences of a repeated word are indexed as bitsets per
+context word. Matching a hypothesis occurrence ORs the bitsets of its own context words and picks the nearest
+remaining candidate with integer bit operations, so a 5000-word document is scored in tens of milliseconds rather
+than seconds.
+
+The alignment is the hlepor package's, including its choice of reference occurrence: when several reference
+occurrences share a context word with a hypothesis occurrence, the package takes the index of the nearest one among
+those candidates and removes the reference occurrence at that index. Scores equal hlepor.single_hlepor_score on
+token lists without whitespace, up to floating point summation order.
+"""
+
+from bisect import bisect_left
+from collections import Counter
+
+import numpy as np
+
+
+def position_difference(reference: list[str], hypothesis: list[str], n: int = 2) -> float:
+    """
+    Computes the summed n-gram position difference of the words matched between a reference and a hypothesis.
+
+    Args:
+        reference (list[str]): The reference tokens.
+        hypothesis (list[str]): The hypothesis tokens.
+        n (int): The number of context words compared before and after a repeated word.
+
+    Returns:
+        float: The sum of the differences of the relative positions of the matched words.
+    """
+    ref_positions = _positions(reference)
+    hyp_positions = _positions(hypothesis)
+    ref_length = len(reference)
+    hyp_length = len(hypothesis)
+
+    difference = 0.0
+    for word, refs in ref_positions.items():
+        hyps = hyp_positions.get(word)
+        if hyps is None:
+            continue
+
+        if len(refs) == 1 == len(hyps):
+            difference += abs((hyps[0] + 1) / hyp_length - (refs[0] + 1) / ref_length)
+            continue
+
+        # Bitsets over the occurrences of the word in the reference: the remaining occurrences, and for every
+        # context word the occurrences it appears around
+        alive = (1 << len(refs)) - 1
+        remaining = list(range(len(refs)))
+        masks = {}
+        for index, ref in enumerate(refs):
+            for context_word in _context(reference, ref, n):
+                masks[context_word] = masks.get(context_word, 0) | (1 << index)
+
+        for hyp in hyps:
+            if not alive:
+                break
+            matches = 0
+            for context_word in _context(hypothesis, hyp, n):
+                matches |= masks.get(context_word, 0)
+            pool = matches & alive or alive
+
+            # The nearest occurrence in the pool is the last one before the hypothesis position or the first after
+            split = bisect_left(refs, hyp)
+            below = pool & ((1 << split) - 1)
+            above = pool >> split
+            nearest = below.bit_length() - 1
+            if above:
+                after = split + (above & -above).bit_length() - 1
+                if nearest < 0 or refs[after] - hyp < hyp - refs[nearest]:
+                    nearest = after
+
+            # Its rank among the pool selects the reference occurrence, as in hlepor
+            index = remaining.pop((pool & ((1 << nearest) - 1)).bit_count())
+            alive &= ~(1 << index)
+            difference += abs((hyp + 1) / hyp_length - (refs[index] + 1) / ref_length)
+
+    return difference
+
+
+def batch_hlepor(references: list[list[str]], hypotheses: list[list[str]], alpha: float = 9.0, beta: float = 1.0,
+                 n: int = 2, weight_elp: float = 2.0, weight_pos: float = 1.0, weight_pr: float = 7.0) -> np.ndarray:
+    """
+    Computes the sentence-level hLEPOR scores of a batch of tokenized pairs.
+
+    Args:
+        references (list[list[str]]): The reference tokens of each pair.
+        hypotheses (list[list[str]]): The hypothesis tokens of each pair.
+        alpha (float): The weight of recall.
+        beta (float): The weight of precision.
+        n (int): The number of context words compared before and after a repeated word.
+        weight_elp (float): The weight of the enhanced length penalty.
+        weight_pos (float): The weight of the n-gram position difference penalty.
+        weight_pr (float): The weight of the harmonic mean of precision and recall.
+
+    Returns:
+        np.ndarray: The hLEPOR score of each pair; 0 for pairs with an empty side.
+    """
+    pairs = len(references)
+    ref_lengths = np.fromiter((len(r) for r in references), dtype=np.float64, count=pairs)
+    hyp_lengths = np.fromiter((len(h) for h in hypotheses), dtype=np.float64, count=pairs)
+    aligned = np.zeros(pairs)
+    differences = np.zeros(pairs)
+
+    for i, (reference, hypothesis) in enumerate(zip(references, hypotheses)):
+        if reference == hypothesis:
+            aligned[i] = len(reference)
+            continue
+        aligned[i] = sum((Counter(reference) & Counter(hypothesis)).values())
+        if aligned[i]:
+            differences[i] = position_difference(reference, hypothesis, n)
+
+    scores = np.zeros(pairs)
+    # Empty sides have no score, and without matches the harmonic mean of precision and recall is 0
+    valid = (ref_lengths > 0) & (hyp_lengths > 0) & (aligned > 0)
+    ref_lengths, hyp_lengths, aligned, differences = (values[valid] for values in
+                                                      (ref_lengths, hyp_lengths, aligned, differences))
+
+    length_penalty = np.exp(1 - np.maximum(ref_lengths, hyp_lengths) / np.minimum(ref_lengths, hyp_lengths))
+    position_penalty = np.exp(-differences / hyp_lengths)
+    precision = aligned / hyp_lengths
+    recall = aligned / ref_lengths
+    harmonic_pr = (beta + alpha) / (beta / precision + alpha / recall)
+
+    scores[valid] = (weight_elp + weight_pos + weight_pr) / (weight_elp / length_penalty
+                                                             + weight_pos / position_penalty
+                                                             + weight_pr / harmonic_pr)
+    return scores
+
+
+def sentence_hlepor(reference: list[str], hypothesis: list[str], **parameters) -> float:
+    """
+    Computes the hLEPOR score of a single tokenized pair, see batch_hlepor.
+    """
+    return float(batch_hlepor([reference], [hypothesis], **parameters)[0])
+
+
+def _positions(tokens: list[str]) -> dict[str, list[int]]:
+    positions = {}
+    for index, token in enumerate(tokens):
+        positions.setdefault(token, []).append(index)
+    return positions
+
+
+def _context(tokens: list[str], index: int, n: int) -> list[str]:
+    # The same slices as hlepor, whose window before the first n positions wraps to an empty slice
+    return tokens[index - n:index] + tokens[index + 1:index + n + 1]
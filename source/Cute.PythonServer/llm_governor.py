@@ -0,0 +1,433 @@
+"""
+Adaptive concurrency, token budget and retries of the outbound LLM calls, with token and cost accounting.
+
+Every call of a model deployment passes through the deployment's governor. The number of calls in flight is
+limited by an AIMD window: it starts small, doubles every round trip until the deployment first pushes back, then
+grows by one call per round trip and is halved on every throttled (429) or overloaded (503) answer. Latency counts
+as push back too: when the smoothed latency exceeds LATENCY_FACTOR times the lowest seen, the window shrinks before
+the deployment starts throttling. A token bucket holds the calls back to the deployment's tokens-per-minute quota,
+and a Retry-After answer pauses all calls of the deployment for that long. Throttled calls and transient failures
+are retried with exponential backoff and jitter.
+
+The tokens of each call are added to the usage of the evaluation it belongs to (see metered), which the generator
+endpoints return, and to the totals of the deployment reported by /stats and /metrics. The governors are
+configured with environment variables:
+
+    CUTE_LLM_MAX_CALLS          Upper bound of the calls in flight per deployment (default: 32).
+    CUTE_LLM_INITIAL_CALLS      Calls in flight per deployment before the window adapts (default: 4).
+    CUTE_LLM_TPM                Tokens per minute per deployment (default: 0, unlimited).
+    CUTE_LLM_RETRIES            Retries of a throttled or failed call (default: 5).
+    CUTE_LLM_BACKOFF            Initial backoff of the retries in seconds, doubled on every retry (default: 1).
+    CUTE_LLM_PROMPT_PRICE       Price of one million prompt tokens, for the cost estimates (default: 0).
+    CUTE_LLM_COMPLETION_PRICE   Price of one million completion tokens (default: 0).
+"""
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+
+from collections import deque
+
+import settings
+import telemetry
+
+LATENCY_FACTOR = 3.0
+LATENCY_SMOOTHING = 0.2
+MAX_BACKOFF = 30.0
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)
+
+_governors = {}
+_governors_lock = threading.Lock()
+_usage = contextvars.ContextVar('cute_llm_usage', default=None)
+
+
+class Usage:
+    """
+    Tokens and calls used by one evaluation.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, other: "Usage"):
+        self.calls += other.calls
+        self.retries += other.retries
+        self.throttled += other.throttled
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+
+    def to_dict(self) -> dict:
+        """
+        Returns the usage in the response format.
+
+        Returns:
+            dict: Calls, retries, throttled calls, tokens and the estimated cost.
+        """
+        return {
+            "Calls": self.calls,
+            "Retries": self.retries,
+            "Throttled": self.throttled,
+            "Prompt Tokens": self.prompt_tokens,
+            "Completion Tokens": self.completion_tokens,
+            "Total Tokens": self.prompt_tokens + self.completion_tokens,
+            "Cost": cost(self.prompt_tokens, self.completion_tokens)
+        }
+
+
+async def metered(coroutine, usage: Usage = None) -> tuple:
+    """
+    Runs a coroutine, adding the usage of every LLM call it makes (including in the tasks it starts) to a Usage.
+
+    Args:
+        coroutine: The evaluation to run.
+        usage (Usage): The usage to add to, a new one by default.
+
+    Returns:
+        tuple: The result of the coroutine and its Usage.
+    """
+    usage = usage if usage is not None else Usage()
+    _usage.set(usage)
+    return await coroutine, usage
+
+
+class TokenBudget:
+    """
+    Token bucket refilled at the tokens-per-minute quota. Calls reserve their estimated tokens up front and
+    settle the difference to their actual usage when they complete, so the level can go negative.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, tokens: int, now: float) -> float:
+        """
+        Reserves tokens if the bucket holds them.
+
+        Returns:
+            float: 0 when the tokens were reserved, otherwise the seconds until they will be available.
+        """
+        if not self.capacity:
+            return 0.0
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # A call larger than the whole quota waits for a full bucket instead of forever
+        needed = min(tokens, self.capacity)
+        if self.level < needed:
+            return (needed - self.level) / self.rate
+        self.level -= tokens
+        return 0.0
+
+    def settle(self, difference: int):
+        if self.capacity:
+            self.level -= difference
+
+
+class Governor:
+    """
+    Governs the calls of one model deployment, see the module documentation.
+    """
+
+    def __init__(self, name: str, maximum: int = 32, initial: int = 4, tokens_per_minute: int = 0,
+                 retries: int = 5, backoff: float = 1.0):
+        """
+        Initializes an instance of Governor.
+
+        Args:
+            name (str): The deployment name, used as the metrics label.
+            maximum (int): The upper bound of the calls in flight.
+            initial (int): The calls in flight before the window adapts.
+            tokens_per_minute (int): The token quota, 0 for none.
+            retries (int): The retries of a throttled or failed call.
+            backoff (float): The initial backoff of the retries in seconds.
+        """
+        self.name = name
+        self.maximum = max(1, maximum)
+        self.limit = float(min(max(1, initial), self.maximum))
+        self.slow_start = True
+        self.retries = retries
+        self.backoff = backoff
+        self.budget = TokenBudget(tokens_per_minute)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latency = None
+        self.lowest_latency = None
+        self.last_decrease = 0.0
+        self.completion_estimate = 256.0
+        self.waiters = deque()
+        self.lock = threading.Lock()
+        self.totals = Usage()
+        self.failures = 0
+        telemetry.LLM_CONCURRENCY_LIMIT.labels(name).set(self.limit)
+
+    async def a_call(self, request, prompt: str, classify):
+        """
+        Makes a call once the window and the token budget allow it, retrying throttled and transient failures.
+
+        Args:
+            request: Coroutine function making the call and returning the response.
+            prompt (str): The prompt, to estimate the tokens of the call.
+            classify: Function from an error raised by the call to its (status, retryable, retry after) tuple.
+
+        Returns:
+            The response of the call.
+        """
+        estimate = self._estimate(prompt)
+        for attempt in range(self.retries + 1):
+            while (wait := self._acquire(estimate, self._async_waiter)) != 0:
+                await (wait if isinstance(wait, asyncio.Future) else asyncio.sleep(wait))
+            started = time.perf_counter()
+            try:
+                response = await request()
+            except asyncio.CancelledError:
+                with self.lock:
+                    self._finish()
+                raise
+            except Exception as e:
+                delay = self._failed(e, attempt, classify)
+                await asyncio.sleep(delay)
+                continue
+            self._succeeded(response, estimate, time.perf_counter() - started)
+            return response
+
+    def call(self, request, prompt: str, classify):
+        """
+        Makes a call from a thread without an event loop, see a_call.
+        """
+        estimate = self._estimate(prompt)
+        for attempt in range(self.retries + 1):
+            while (wait := self._acquire(estimate, self._thread_waiter)) != 0:
+                wait.wait() if isinstance(wait, threading.Event) else time.sleep(wait)
+            started = time.perf_counter()
+            try:
+                response = request()
+            except Exception as e:
+                time.sleep(self._failed(e, attempt, classify))
+                continue
+            self._succeeded(response, estimate, time.perf_counter() - started)
+            return response
+
+    def stats(self) -> dict:
+        """
+        Gets the state and totals of the governor.
+
+        Returns:
+            dict: The window, calls in flight, smoothed latency, failures and the usage totals.
+        """
+        with self.lock:
+            return {
+                "Concurrency Limit": int(self.limit),
+                "In Flight": self.in_flight,
+                "Latency": round(self.latency, 4) if self.latency is not None else None,
+                "Failures": self.failures,
+                **self.totals.to_dict()
+            }
+
+    def _acquire(self, estimate: int, waiter):
+        """
+        Takes a slot of the window and reserves the estimated tokens.
+
+        Returns:
+            0 when the call may start, otherwise the seconds to sleep or a waiter (future or event) woken when
+            a slot is released.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.in_flight >= int(self.limit):
+                wake, handle = waiter()
+                self.waiters.append(wake)
+                return handle
+            wait = self.budget.reserve(estimate, now)
+            if wait:
+                return wait
+            self.in_flight += 1
+            return 0
+
+    # A waiter is a wake function, returning whether it reached a live waiter, and what the caller waits on
+
+    def _async_waiter(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake() -> bool:
+            if loop.is_closed() or future.done():
+                return False
+            loop.call_soon_threadsafe(self._resolve, future)
+            return True
+
+        return wake, future
+
+    def _thread_waiter(self):
+        event = threading.Event()
+
+        def wake() -> bool:
+            event.set()
+            return True
+
+        return wake, event
+
+    def _resolve(self, future: asyncio.Future):
+        if not future.done():
+            future.set_result(None)
+            return
+        # The waiter was cancelled after it was woken, so pass the slot on
+        with self.lock:
+            self._wake()
+
+    def _wake(self):
+        # Called with the lock held. Woken waiters retry to acquire, so waking one too many is harmless.
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self.waiters:
+            if self.waiters.popleft()():
+                free -= 1
+
+    def _finish(self):
+        # Called with the lock held
+        self.in_flight -= 1
+        self._wake()
+
+    def _succeeded(self, response, estimate: int, seconds: float):
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+
+        with self.lock:
+            self.latency = seconds if self.latency is None else \
+                self.latency + LATENCY_SMOOTHING * (seconds - self.latency)
+            self.lowest_latency = self.latency if self.lowest_latency is None else min(self.lowest_latency, self.latency)
+            if self.latency > LATENCY_FACTOR * self.lowest_latency:
+                self._decrease(0.8)
+            elif self.in_flight < int(self.limit):
+                # The window was not used up, so this call says nothing about a larger one
+                pass
+            elif self.slow_start:
+                self.limit = min(self.maximum, self.limit + 1)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            if completion_tokens:
+                self.completion_estimate += LATENCY_SMOOTHING * (completion_tokens - self.completion_estimate)
+            self.budget.settle(prompt_tokens + completion_tokens - estimate if usage else 0)
+            self.totals.calls += 1
+            self.totals.prompt_tokens += prompt_tokens
+            self.totals.completion_tokens += completion_tokens
+            self._finish()
+
+        current = _usage.get()
+        if current is not None:
+            current.calls += 1
+            current.prompt_tokens += prompt_tokens
+            current.completion_tokens += completion_tokens
+
+        telemetry.LLM_TOKENS.labels(self.name, "prompt").inc(prompt_tokens)
+        telemetry.LLM_TOKENS.labels(self.name, "completion").inc(completion_tokens)
+        telemetry.LLM_CONCURRENCY_LIMIT.labels(self.name).set(int(self.limit))
+
+    def _failed(self, error: Exception, attempt: int, classify) -> float:
+        """
+        Handles a failed call.
+
+        Returns:
+            float: The seconds to wait before retrying. Raises the error when it is not retried.
+        """
+        status, retryable, retry_after = classify(error)
+        throttled = status in THROTTLE_STATUSES
+        retry = retryable and attempt < self.retries
+
+        with self.lock:
+            if throttled:
+                self.totals.throttled += 1
+                self._decrease(0.5)
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            if retry:
+                self.totals.retries += 1
+            else:
+                self.failures += 1
+            self._finish()
+
+        current = _usage.get()
+        if current is not None:
+            current.throttled += 1 if throttled else 0
+            current.retries += 1 if retry else 0
+
+        if throttled:
+            telemetry.LLM_THROTTLED.labels(self.name).inc()
+        telemetry.LLM_CONCURRENCY_LIMIT.labels(self.name).set(int(self.limit))
+
+        if not retry:
+            raise error
+        telemetry.LLM_RETRIES.labels(self.name).inc()
+
+        delay = min(MAX_BACKOFF, self.backoff * 2 ** attempt)
+        return max(retry_after or 0.0, delay / 2 + random.uniform(0, delay / 2))
+
+    def _decrease(self, factor: float):
+        # Called with the lock held. Calls started before the last decrease report the old congestion, so the
+        # window shrinks at most once per round trip.
+        now = time.monotonic()
+        self.slow_start = False
+        if now - self.last_decrease >= (self.latency or 0.0):
+            self.limit = max(1.0, self.limit * factor)
+            self.last_decrease = now
+
+    def _estimate(self, prompt: str) -> int:
+        # About four characters per token, plus the typical completion
+        return len(prompt) // 4 + int(self.completion_estimate)
+
+
+def get_governor(key: tuple, name: str) -> Governor:
+    """
+    Gets the governor of a model deployment, creating it on first use.
+
+    Args:
+        key (tuple): The identity of the deployment, e.g. (endpoint, deployment).
+        name (str): The deployment name, used as the metrics label.
+
+    Returns:
+        Governor: The governor shared by all clients of the deployment.
+    """
+    with _governors_lock:
+        governor = _governors.get(key)
+        if governor is None:
+            governor = Governor(name,
+                                settings.int_setting('CUTE_LLM_MAX_CALLS', 32),
+                                settings.int_setting('CUTE_LLM_INITIAL_CALLS', 4),
+                                settings.int_setting('CUTE_LLM_TPM', 0),
+                                settings.int_setting('CUTE_LLM_RETRIES', 5),
+                                settings.float_setting('CUTE_LLM_BACKOFF', 1.0))
+            _governors[key] = governor
+        return governor
+
+
+def stats() -> dict:
+    """
+    Gets the state and usage totals of every deployment.
+
+    Returns:
+        dict: The stats of each deployment's governor, by deployment name.
+    """
+    with _governors_lock:
+        governors = list(_governors.values())
+    return {governor.name: governor.stats() for governor in governors}
+
+
+def cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimates the cost of tokens with the configured prices.
+
+    Returns:
+        float: The cost, in the currency of the prices.
+    """
+    return round((prompt_tokens * settings.float_setting('CUTE_LLM_PROMPT_PRICE', 0.0) +
+                  completion_tokens * settings.float_setting('CUTE_LLM_COMPLETION_PRICE', 0.0)) / 1_000_000, 6)
@@ -0,0 +1,172 @@
+"""
+In-process registry of the Azure OpenAI models used by the LLM-backed metrics.
+
+The Azure OpenAI settings arrive with each request in its `env` (Cute__OpenAiEndpoint, Cute__OpenAiDeploymentName,
+Cute__OpenAiApiKey and optionally Cute__OpenAiApiVersion). A model client is created once per
+(endpoint, deployment, key hash) and reused by every request with the same settings, so requests for different
+tenants each get their own client and no configuration is written to disk. The calls of every client of a
+deployment share one governor, which adapts their concurrency to the deployment's rate limits and retries them
+(see llm_governor).
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from collections import OrderedDict
+
+from deepeval.models import DeepEvalBaseLLM
+
+import llm_governor
+import telemetry
+
+DEFAULT_API_VERSION = '2024-07-01-preview'
+MAX_CLIENTS = 32
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+class AzureChatModel(DeepEvalBaseLLM):
+    """
+    DeepEval model calling an Azure OpenAI chat deployment, with JSON mode for structured outputs.
+    """
+
+    def __init__(self, endpoint: str, deployment: str, api_key: str, api_version: str = DEFAULT_API_VERSION):
+        """
+        Initializes an instance of AzureChatModel.
+
+        Args:
+            endpoint (str): The Azure OpenAI endpoint.
+            deployment (str): The chat model deployment name.
+            api_key (str): The Azure OpenAI API key.
+            api_version (str): The Azure OpenAI API version.
+        """
+        self.endpoint = endpoint
+        self.deployment = deployment
+        self.api_key = api_key
+        self.api_version = api_version
+        self.governor = llm_governor.get_governor((endpoint, deployment), deployment)
+        self.model = self.load_model()
+        self.async_model = self.load_model(async_mode=True)
+
+    def load_model(self, async_mode: bool = False):
+        from openai import AsyncAzureOpenAI, AzureOpenAI
+
+        client = AsyncAzureOpenAI if async_mode else AzureOpenAI
+        # The governor retries calls, so the client must not
+        return client(azure_endpoint=self.endpoint, azure_deployment=self.deployment,
+                      api_key=self.api_key, api_version=self.api_version, max_retries=0)
+
+    def generate(self, prompt: str, schema=None):
+        def request():
+            started = time.perf_counter()
+            try:
+                response = self.model.chat.completions.create(**self._request(prompt, schema))
+            except Exception as e:
+                self._record(started, e)
+                raise
+            self._record(started)
+            return response
+
+        return self._parse(self.governor.call(request, prompt, classify_error), schema)
+
+    async def a_generate(self, prompt: str, schema=None):
+        async def request():
+            started = time.perf_counter()
+            try:
+                response = await self.async_model.chat.completions.create(**self._request(prompt, schema))
+            except Exception as e:
+                self._record(started, e)
+                raise
+            self._record(started)
+            return response
+
+        return self._parse(await self.governor.a_call(request, prompt, classify_error), schema)
+
+    def get_model_name(self) -> str:
+        return self.deployment
+
+    def _request(self, prompt: str, schema) -> dict:
+        request = {
+            "model": self.deployment,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0,
+        }
+        if schema is not None:
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    def _record(self, started: float, error: Exception = None):
+        # The OpenAI client raises API errors with the response status, and connection errors without one
+        status = 200 if error is None else getattr(error, 'status_code', None)
+        telemetry.OUTBOUND_SECONDS.labels("llm", telemetry.outcome(status)).observe(time.perf_counter() - started)
+
+    def _parse(self, response, schema):
+        content = response.choices[0].message.content
+        if schema is None:
+            return content
+        return schema.model_validate(json.loads(content))
+
+
+def classify_error(error: Exception) -> tuple[int | None, bool, float | None]:
+    """
+    Classifies an error raised by the OpenAI client for the governor.
+
+    Args:
+        error (Exception): The error.
+
+    Returns:
+        tuple[int | None, bool, float | None]: The response status (None without a response), whether the
+            call may succeed when retried, and the seconds the response asked to wait before retrying.
+    """
+    from openai import APIConnectionError
+
+    status = getattr(error, 'status_code', None)
+    retryable = status in llm_governor.RETRY_STATUSES or isinstance(error, APIConnectionError)
+
+    retry_after = None
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        if 'retry-after-ms' in headers:
+            retry_after = float(headers['retry-after-ms']) / 1000
+        elif 'retry-after' in headers:
+            retry_after = float(headers['retry-after'])
+    except ValueError:
+        # Retry-After may also be an HTTP date, which the backoff covers
+        pass
+
+    return status, retryable, retry_after
+
+
+def get_model(env: dict) -> AzureChatModel | None:
+    """
+    Gets the model client for the Azure OpenAI settings of a request, creating it on first use.
+
+    Args:
+        env (dict): The request environment with the Cute__OpenAi* settings.
+
+    Returns:
+        AzureChatModel | None: The model client, or None when the settings are incomplete.
+    """
+    endpoint = env.get('Cute__OpenAiEndpoint')
+    deployment = env.get('Cute__OpenAiDeploymentName')
+    api_key = env.get('Cute__OpenAiApiKey')
+    api_version = env.get('Cute__OpenAiApiVersion', DEFAULT_API_VERSION)
+
+    if not (endpoint and deployment and api_key):
+        return None
+
+    key = (endpoint, deployment, api_version, hashlib.sha256(api_key.encode('utf-8')).hexdigest())
+
+    with _clients_lock:
+        model = _clients.get(key)
+        if model is None:
+            model = AzureChatModel(endpoint, deployment, api_key, api_version)
+            _clients[key] = model
+            if len(_clients) > MAX_CLIENTS:
+                _clients.popitem(last=False)
+        else:
+            _clients.move_to_end(key)
+        return model
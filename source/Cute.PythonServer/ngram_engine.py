@@ -0,0 +1,173 @@
+"""
+Vectorized n-gram engine for the GLEU metric.
+
+Tokens are encoded to integer IDs and the 1 to 4-gram overlaps of a whole batch of sentence pairs are computed
+with NumPy instead of building Python Counters for every pair. Higher order n-grams are encoded by densely
+re-numbering (previous n-gram ID, next token ID) pairs, so n-gram IDs are exact and never collide. Clipped
+match counts are found with a sorted-merge intersection of the (pair, n-gram) keys of hypotheses and references.
+Scores are identical to nltk.translate.gleu_score.
+"""
+
+import numpy as np
+
+
+class Vocabulary:
+    """
+    Maps tokens to dense integer IDs.
+    """
+
+    def __init__(self):
+        self.ids = {}
+
+    def encode(self, tokens: list[str]) -> np.ndarray:
+        """
+        Encodes a list of tokens, adding unseen tokens to the vocabulary.
+
+        Args:
+            tokens (list[str]): The tokens to encode.
+
+        Returns:
+            np.ndarray: The token IDs.
+        """
+        ids = self.ids
+        try:
+            return np.array([ids[token] for token in tokens], dtype=np.int64)
+        except KeyError:
+            for token in tokens:
+                if token not in ids:
+                    ids[token] = len(ids)
+            return np.array([ids[token] for token in tokens], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def ngram_statistics(hypotheses: list[np.ndarray], references: list[np.ndarray], max_len: int = 4):
+    """
+    Computes the clipped n-gram matches and n-gram totals of a batch of encoded sentence pairs.
+
+    Args:
+        hypotheses (list[np.ndarray]): The token IDs of each hypothesis.
+        references (list[np.ndarray]): The token IDs of each reference, encoded with the same vocabulary.
+        max_len (int): The highest n-gram order.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Arrays of shape (pairs, max_len) holding the clipped matches,
+            the hypothesis n-gram counts and the reference n-gram counts for each order.
+    """
+    pairs = len(hypotheses)
+    hyp_lengths = np.fromiter((len(h) for h in hypotheses), dtype=np.int64, count=pairs)
+    ref_lengths = np.fromiter((len(r) for r in references), dtype=np.int64, count=pairs)
+
+    orders = np.arange(1, max_len + 1)
+    hyp_totals = np.maximum(hyp_lengths[:, None] - orders + 1, 0)
+    ref_totals = np.maximum(ref_lengths[:, None] - orders + 1, 0)
+    matches = np.zeros((pairs, max_len), dtype=np.int64)
+
+    if pairs == 0:
+        return matches, hyp_totals, ref_totals
+
+    # One flat token stream: all hypotheses followed by all references, each token tagged with its segment.
+    # Hypothesis segments are numbered 0..pairs-1 and reference segments pairs..2*pairs-1.
+    tokens = np.concatenate(list(hypotheses) + list(references) + [np.zeros(0, dtype=np.int64)])
+    segments = np.repeat(np.arange(2 * pairs), np.concatenate([hyp_lengths, ref_lengths]))
+    hyp_size = int(hyp_lengths.sum())
+
+    codes = tokens
+    base = int(tokens.max()) + 1 if len(tokens) else 1
+
+    for n in range(1, max_len + 1):
+        count = len(tokens) - n + 1
+        if count <= 0:
+            break
+
+        if n > 1:
+            # Densely renumber (n-1-gram, next token) so the ID space stays bounded by the stream length.
+            keys = codes[:count] * base + tokens[n - 1:]
+            _, codes = np.unique(keys, return_inverse=True)
+            codes = codes.astype(np.int64)
+
+        valid = segments[:count] == segments[n - 1:]
+        width = int(codes.max()) + 1
+
+        positions = np.arange(count)
+        hyp_mask = valid & (positions < hyp_size)
+        ref_mask = valid & (positions >= hyp_size)
+
+        hyp_keys, hyp_counts = np.unique(segments[:count][hyp_mask] * width + codes[hyp_mask], return_counts=True)
+        ref_keys, ref_counts = np.unique((segments[:count][ref_mask] - pairs) * width + codes[ref_mask], return_counts=True)
+
+        common, hyp_index, ref_index = np.intersect1d(hyp_keys, ref_keys, assume_unique=True, return_indices=True)
+        clipped = np.minimum(hyp_counts[hyp_index], ref_counts[ref_index])
+        matches[:, n - 1] = np.bincount(common // width, weights=clipped, minlength=pairs).astype(np.int64)
+
+    return matches, hyp_totals, ref_totals
+
+
+def batch_gleu(hypotheses: list[list[str]], references: list[list[str]], max_len: int = 4) -> np.ndarray:
+    """
+    Calculates the sentence-level GLEU score of many tokenized sentence pairs at once.
+
+    Args:
+        hypotheses (list[list[str]]): The tokens of each hypothesis.
+        references (list[list[str]]): The tokens of the single reference for each hypothesis.
+        max_len (int): The highest n-gram order.
+
+    Returns:
+        np.ndarray: The GLEU score of each pair.
+    """
+    vocabulary = Vocabulary()
+    hyp_ids = [vocabulary.encode(h) for h in hypotheses]
+    ref_ids = [vocabulary.encode(r) for r in references]
+    return gleu_from_statistics(*ngram_statistics(hyp_ids, ref_ids, max_len))
+
+
+def gleu_from_statistics(matches: np.ndarray, hyp_totals: np.ndarray, ref_totals: np.ndarray) -> np.ndarray:
+    """
+    Calculates GLEU scores from per-order n-gram statistics.
+
+    GLEU is the minimum of n-gram precision and recall, which is the total matches divided by
+    the larger of the hypothesis and reference n-gram counts.
+
+    Args:
+        matches (np.ndarray): The clipped matches per pair and order.
+        hyp_totals (np.ndarray): The hypothesis n-gram counts per pair and order.
+        ref_totals (np.ndarray): The reference n-gram counts per pair and order.
+
+    Returns:
+        np.ndarray: The GLEU score of each pair.
+    """
+    n_match = matches.sum(axis=1)
+    n_all = np.maximum(hyp_totals.sum(axis=1), ref_totals.sum(axis=1))
+    return np.divide(n_match, n_all, out=np.zeros(len(n_match)), where=n_all > 0)
+
+
+def sentence_gleu(references: list[list[str]], hypothesis: list[str], min_len: int = 1, max_len: int = 4) -> float:
+    """
+    Drop-in replacement for nltk.translate.gleu_score.sentence_gleu.
+
+    Args:
+        references (list[list[str]]): The tokens of one or more references.
+        hypothesis (list[str]): The tokens of the hypothesis.
+        min_len (int): The lowest n-gram order.
+        max_len (int): The highest n-gram order.
+
+    Returns:
+        float: The GLEU score against the best matching reference.
+    """
+    if not references:
+        return 0.0
+
+    vocabulary = Vocabulary()
+    hyp_ids = vocabulary.encode(hypothesis)
+    ref_ids = [vocabulary.encode(r) for r in references]
+    matches, hyp_totals, ref_totals = ngram_statistics([hyp_ids] * len(ref_ids), ref_ids, max_len)
+
+    n_match = matches[:, min_len - 1:].sum(axis=1)
+    n_all = np.maximum(hyp_totals[:, min_len - 1:].sum(axis=1), ref_totals[:, min_len - 1:].sum(axis=1))
+    candidates = [(int(m), int(a)) for m, a in zip(n_match, n_all) if a > 0]
+    if not candidates:
+        return 0.0
+
+    n_match, n_all = max(candidates, key=lambda c: c[0] / c[1])
+    return n_match / n_all
@@ -2,3 +2,7 @@ import nltk
 
 nltk.download('wordnet')
 nltk.download('punkt_tab')
+
+# Precompute the memory-mapped WordNet synonym table shared by the METEOR workers
+import wordnet_cache
+wordnet_cache.build_synonym_table()
@@ -0,0 +1,224 @@
+"""
+Shared tokenization and preprocessing for the translation metrics.
+
+Each generated/reference pair is tokenized once into a TokenizedPair that all metrics read from: surface tokens
+and integer token IDs for GLEU, case-folded forms for METEOR and LEPOR, and stems for METEOR. Tokenizers are
+selected per request by name:
+
+    simple  Removes full stops and splits on single spaces (the original behaviour of the GLEU and METEOR metrics).
+    word    Unicode-aware word tokenizer that drops punctuation and splits CJK text into single characters.
+    nltk    NLTK's recommended word tokenizer for the request language (requires the punkt_tab corpus).
+
+LEPOR originally received the raw strings, which hLEPOR lowercases and splits with NLTK's word tokenizer, keeping
+punctuation as tokens of its own. With the simple tokenizer LEPOR still gets those tokens (see separated_tokenize),
+so its default scores are unchanged; with the word and nltk tokenizers it scores their case-folded tokens, which
+drop punctuation, so its scores differ from the default ones.
+"""
+
+import re
+
+from collections import OrderedDict
+
+import wordnet_cache
+
+from ngram_engine import Vocabulary
+
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f'
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD_PATTERN = re.compile(rf"[{_CJK}]|(?:(?![{_CJK}])[^\W_])+(?:['’\-](?:(?![{_CJK}])[^\W_])+)*")
+
+
+def simple_tokenize(text: str, language: str = "english") -> list[str]:
+    """Removes full stops and splits on single spaces."""
+    return text.replace('.', '').split(' ')
+
+
+def word_tokenize(text: str, language: str = "english") -> list[str]:
+    """Finds words (keeping inner apostrophes and hyphens) and single CJK characters, dropping punctuation."""
+    return _WORD_PATTERN.findall(text)
+
+
+def nltk_tokenize(text: str, language: str = "english") -> list[str]:
+    """Tokenizes with NLTK's word tokenizer for the language, dropping punctuation tokens."""
+    from nltk.tokenize import word_tokenize as tokenize
+    return [token for token in tokenize(text, language=language) if any(c.isalnum() for c in token)]
+
+
+def separated_tokenize(text: str, language: str = "english") -> list[str]:
+    """
+    Lowercases and tokenizes like NLTK's word tokenizer, keeping punctuation as separate tokens. This is what
+    hLEPOR does with raw strings. Without the punkt_tab corpus, sentences are split at sentence-ending punctuation
+    followed by whitespace instead.
+    """
+    from nltk.tokenize import NLTKWordTokenizer, sent_tokenize
+
+    text = text.lower().strip()
+    try:
+        sentences = sent_tokenize(text, language=language)
+    except LookupError:
+        sentences = _SENTENCE_END.split(text)
+    tokenizer = NLTKWordTokenizer()
+    return [token for sentence in sentences for token in tokenizer.tokenize(sentence)]
+
+
+TOKENIZERS = {
+    "simple": simple_tokenize,
+    "word": word_tokenize,
+    "nltk": nltk_tokenize,
+}
+
+
+class TokenizedText:
+    """
+    The tokenized form of one text, shared by all metrics.
+    """
+
+    __slots__ = ("tokens", "ids", "text", "language", "separate_punctuation", "_normalized", "_stems", "_separated")
+
+    def __init__(self, tokens: list[str], vocabulary: Vocabulary, text: str = None, language: str = "english",
+                 separate_punctuation: bool = False):
+        self.tokens = tokens
+        self.ids = vocabulary.encode(tokens)
+        self.text = text
+        self.language = language
+        self.separate_punctuation = separate_punctuation
+        self._normalized = None
+        self._stems = None
+        self._separated = None
+
+    @property
+    def normalized(self) -> list[str]:
+        """
+        Gets the casefolded tokens, computed on first use.
+
+        Returns:
+            list[str]: One normalized token per token.
+        """
+        if self._normalized is None:
+            self._normalized = [token.casefold() for token in self.tokens]
+        return self._normalized
+
+    @property
+    def lepor_tokens(self) -> list[str]:
+        """
+        Gets the tokens LEPOR scores: the text split with separated_tokenize for the simple tokenizer (whose
+        tokens keep commas attached to words), otherwise the normalized tokens. Computed on first use.
+
+        Returns:
+            list[str]: The LEPOR tokens.
+        """
+        if not self.separate_punctuation or self.text is None:
+            return self.normalized
+        if self._separated is None:
+            self._separated = separated_tokenize(self.text, self.language)
+        return self._separated
+
+    @property
+    def stems(self) -> list[str]:
+        """
+        Gets the Porter stems of the normalized tokens, computed on first use.
+
+        Returns:
+            list[str]: One stem per token.
+        """
+        if self._stems is None:
+            self._stems = [wordnet_cache.stem(token) for token in self.normalized]
+        return self._stems
+
+
+class TokenizedPair:
+    """
+    The tokenized generated (hypothesis) and reference texts of one test case.
+    """
+
+    __slots__ = ("hypothesis", "reference")
+
+    def __init__(self, hypothesis: TokenizedText, reference: TokenizedText):
+        self.hypothesis = hypothesis
+        self.reference = reference
+
+    def stemmer(self) -> "StemLookup":
+        """
+        Gets a stemmer that answers from the precomputed stems of this pair.
+
+        Returns:
+            StemLookup: A stemmer usable by nltk.translate.meteor_score.
+        """
+        return StemLookup(self)
+
+
+class StemLookup:
+    """
+    Stemmer that returns the precomputed stems of a pair's normalized tokens, falling back to the
+    cached Porter stemmer for any other word.
+    """
+
+    def __init__(self, pair: TokenizedPair):
+        self.stems = dict(zip(pair.hypothesis.normalized, pair.hypothesis.stems))
+        self.stems.update(zip(pair.reference.normalized, pair.reference.stems))
+
+    def stem(self, word: str) -> str:
+        stem = self.stems.get(word)
+        return stem if stem is not None else wordnet_cache.stem(word)
+
+
+class Preprocessor:
+    """
+    Tokenizes generated/reference pairs once and hands the same representation to every metric.
+
+    Recently tokenized pairs are remembered, so metrics measuring the same test case one after the other
+    share a single tokenization pass. Token IDs are only comparable between pairs of the same preprocessor.
+    """
+
+    def __init__(self, tokenizer: str = "simple", language: str = "english", max_pairs: int = 256):
+        """
+        Initializes an instance of Preprocessor.
+
+        Args:
+            tokenizer (str): The tokenizer name ("simple", "word" or "nltk").
+            language (str): The language of the texts, used by language-aware tokenizers.
+            max_pairs (int): The number of recently tokenized pairs to remember.
+        """
+        if tokenizer not in TOKENIZERS:
+            raise ValueError(f"Invalid tokenizer '{tokenizer}'")
+        self.tokenizer = tokenizer
+        self.language = language
+        self.vocabulary = Vocabulary()
+        self.max_pairs = max_pairs
+        self._pairs = OrderedDict()
+
+    def tokenize(self, text: str) -> TokenizedText:
+        """
+        Tokenizes a single text.
+
+        Args:
+            text (str): The text to tokenize.
+
+        Returns:
+            TokenizedText: The tokenized text.
+        """
+        return TokenizedText(TOKENIZERS[self.tokenizer](text, self.language), self.vocabulary, text, self.language,
+                             separate_punctuation=self.tokenizer == "simple")
+
+    def pair(self, actual_output: str, expected_output: str) -> TokenizedPair:
+        """
+        Gets the tokenized form of a generated/reference pair, tokenizing it only if it was not seen recently.
+
+        Args:
+            actual_output (str): The generated text.
+            expected_output (str): The reference text.
+
+        Returns:
+            TokenizedPair: The tokenized pair.
+        """
+        key = (actual_output, expected_output)
+        pair = self._pairs.get(key)
+        if pair is None:
+            pair = TokenizedPair(self.tokenize(actual_output), self.tokenize(expected_output))
+            self._pairs[key] = pair
+            if len(self._pairs) > self.max_pairs:
+                self._pairs.popitem(last=False)
+        else:
+            self._pairs.move_to_end(key)
+        return pair
+
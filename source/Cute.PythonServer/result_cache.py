@@ -0,0 +1,255 @@
+"""
+Result cache for evaluation responses.
+
+Responses are cached under a hash of (endpoint, measure, model, threshold, inputs), so re-running an evaluation
+over unchanged content returns the stored response instead of recomputing it (and, for the generator endpoint,
+paying for LLM calls again). The backend is configured with environment variables:
+
+    CUTE_CACHE_BACKEND  "memory" (LRU with TTL, the default), "sqlite" (survives restarts) or "none".
+    CUTE_CACHE_PATH     Database file of the sqlite backend (default: cute_cache.sqlite3 next to this module).
+    CUTE_CACHE_SIZE     Maximum number of entries kept by the memory backend (default: 10000).
+    CUTE_CACHE_TTL      Default time to live of an entry in seconds (default: 86400).
+
+A request can control caching with options['cache'] ("use" reads and writes the cache, "refresh" recomputes and
+overwrites the entry, "bypass" neither reads nor writes) and options['cache-ttl'] (seconds).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+
+import settings
+
+CACHE_MODES = ("use", "refresh", "bypass")
+
+
+class MemoryCache:
+    """
+    In-process LRU cache whose entries expire after their time to live.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SqliteCache:
+    """
+    Cache stored in a local SQLite database, so entries survive server restarts.
+    Expired entries are ignored on read and purged periodically on write.
+    """
+
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def get(self, key: str) -> str | None:
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM results WHERE key = ? AND expires >= ?",
+                                          (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO results (key, value, expires) VALUES (?, ?, ?)",
+                                    (key, value, time.time() + ttl))
+            self.writes += 1
+            if self.writes % self.PURGE_INTERVAL == 0:
+                self.connection.execute("DELETE FROM results WHERE expires < ?", (time.time(),))
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def cache_key(endpoint: str, measure: str, model: str, threshold: float, inputs: dict) -> str:
+    """
+    Computes the cache key of an evaluation.
+
+    Args:
+        endpoint (str): The API endpoint family ("generator", "translator" or "seo").
+        measure (str): The measure requested from the endpoint.
+        model (str): The LLM model used for evaluation.
+        threshold (float): The success threshold.
+        inputs (dict): Every other input that affects the result.
+
+    Returns:
+        str: The SHA-256 hex digest of the canonical JSON form of the arguments.
+    """
+    canonical = json.dumps([endpoint, measure, model, threshold, inputs], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def cache_control(options: dict) -> tuple[str, float]:
+    """
+    Reads the cache control options of a request.
+
+    Args:
+        options (dict): The request options.
+
+    Returns:
+        tuple[str, float]: The cache mode and the time to live of a new entry.
+    """
+    mode = options.get('cache', 'use')
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Invalid cache option '{mode}'")
+    ttl = float(options.get('cache-ttl', _default_ttl()))
+    return mode, ttl
+
+
+def cached(key: str, mode: str, ttl: float, compute) -> tuple[str, bool]:
+    """
+    Gets a serialized response from the cache, or computes and stores it.
+
+    Args:
+        key (str): The cache key, see cache_key.
+        mode (str): The cache mode, see cache_control.
+        ttl (float): The time to live of a new entry in seconds.
+        compute: Function returning the serialized response.
+
+    Returns:
+        tuple[str, bool]: The serialized response and whether it came from the cache.
+    """
+    if get_cache() is None or mode == "bypass":
+        return compute(), False
+
+    value = lookup(key, mode)
+    if value is not None:
+        return value, True
+
+    value = compute()
+    store(key, value, mode, ttl)
+    return value, False
+
+
+def lookup(key: str, mode: str = "use") -> str | None:
+    """
+    Gets a serialized response from the cache, for callers that compute their misses together.
+
+    Args:
+        key (str): The cache key, see cache_key.
+        mode (str): The cache mode, see cache_control; only "use" reads the cache.
+
+    Returns:
+        str | None: The serialized response, or None when it must be computed.
+    """
+    cache = get_cache()
+
+    if cache is None or mode == "bypass":
+        return None
+
+    if mode == "use":
+        value = cache.get(key)
+        if value is not None:
+            _count("Hits")
+            return value
+
+    _count("Misses")
+    return None
+
+
+def store(key: str, value: str, mode: str, ttl: float):
+    """
+    Stores a computed response in the cache, unless the cache mode is "bypass".
+
+    Args:
+        key (str): The cache key, see cache_key.
+        value (str): The serialized response.
+        mode (str): The cache mode, see cache_control.
+        ttl (float): The time to live of the entry in seconds.
+    """
+    cache = get_cache()
+    if cache is not None and mode != "bypass":
+        cache.set(key, value, ttl)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_stats = {"Hits": 0, "Misses": 0}
+
+
+def get_cache() -> MemoryCache | SqliteCache | None:
+    """
+    Gets the configured cache backend, creating it on first use.
+
+    Returns:
+        MemoryCache | SqliteCache | None: The backend, or None when caching is disabled.
+    """
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                match os.environ.get('CUTE_CACHE_BACKEND', 'memory'):
+                    case 'memory':
+                        _cache = MemoryCache(settings.int_setting('CUTE_CACHE_SIZE', 10000))
+                    case 'sqlite':
+                        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cute_cache.sqlite3')
+                        _cache = SqliteCache(os.environ.get('CUTE_CACHE_PATH', default_path))
+                    case _:
+                        _cache = False
+    return _cache if _cache is not False else None
+
+
+def stats() -> dict:
+    """
+    Gets the hit rate of the result cache.
+
+    Returns:
+        dict: The backend, number of entries, hits, misses and hit rate.
+    """
+    cache = get_cache()
+    with _cache_lock:
+        hits, misses = _stats["Hits"], _stats["Misses"]
+    total = hits + misses
+    return {
+        "Backend": type(cache).__name__ if cache is not None else None,
+        "Entries": len(cache) if cache is not None else 0,
+        "Hits": hits,
+        "Misses": misses,
+        "Hit Rate": round(hits / total, 4) if total else None
+    }
+
+
+def _count(name: str):
+    # Lookups run on many request threads at once, and += on a dict entry is not atomic
+    with _cache_lock:
+        _stats[name] += 1
+
+
+def _default_ttl() -> float:
+    return settings.float_setting('CUTE_CACHE_TTL', 86400.0)
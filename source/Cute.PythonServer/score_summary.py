@@ -0,0 +1,49 @@
+"""
+Aggregate score statistics of the batch endpoints.
+
+The translation, generator and SEO batches summarize each metric with ScoreSummary, in one response format.
+Importing it loads none of the metrics.
+"""
+
+
+class ScoreSummary:
+    """
+    Accumulates aggregate statistics for one metric across a batch without keeping the individual scores.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.passed = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, score: float, success: bool):
+        """
+        Adds a single score to the summary.
+
+        Args:
+            score (float): The metric score.
+            success (bool): Whether the score met the threshold.
+        """
+        score = float(score)
+        self.count += 1
+        self.passed += 1 if success else 0
+        self.total += score
+        self.minimum = score if self.minimum is None else min(self.minimum, score)
+        self.maximum = score if self.maximum is None else max(self.maximum, score)
+
+    def to_dict(self) -> dict:
+        """
+        Returns the summary in the response format.
+
+        Returns:
+            dict: Count, mean, min, max and pass rate of the scores.
+        """
+        return {
+            "Count": self.count,
+            "Mean": round(self.total / self.count, 4) if self.count else None,
+            "Min": self.minimum,
+            "Max": self.maximum,
+            "Pass Rate": round(self.passed / self.count, 4) if self.count else None
+        }
@@ -0,0 +1,194 @@
+"""
+Segment-level scoring of long translated fields.
+
+Rich text and long body fields are otherwise scored as one string, so editing one sentence re-scores the whole
+field, and METEOR and LEPOR get slower the longer the field. In segmented mode both texts are split into sentences,
+the generated sentences are aligned with the reference sentences, and each aligned segment is scored on its own.
+Segment scores are cached per segment and metric, so re-evaluating an edited field only scores the changed
+segments. The field score is the mean of the segment scores weighted by segment length, and each segment reports
+its impact: the score the field loses on it (its weight times 1 minus its score), so the impacts of a field add up
+to 1 minus the field score.
+
+Sentences are aligned by length with the Gale-Church dynamic program, which allows a sentence to be split or merged
+(1-2, 2-1 and 2-2 alignments) and added or left out (1-0 and 0-1 alignments, scored 0) by the translation.
+"""
+
+import math
+import re
+
+import worker_pool
+from translation_scoring import metric_names, score_pairs, score_result
+
+# Sentence ends followed by whitespace, ends of CJK sentences (which are not followed by spaces) and line breaks
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|(?<=[。！？])|\s*\n\s*")
+
+# Gale-Church alignment priors and the variance of the length difference per character
+ALIGNMENTS = {(1, 1): 0.89, (1, 0): 0.0099, (0, 1): 0.0099, (2, 1): 0.0445, (1, 2): 0.0445, (2, 2): 0.011}
+LENGTH_VARIANCE = 6.8
+
+
+class EvalTranslationSegments:
+    """
+    Class for scoring a long generated/reference pair segment by segment.
+    """
+
+    def __init__(self, th: float, actual_output: str, expected_output: str, tokenizer: str = "simple",
+                 language: str = "english", worst: int = 5):
+        """
+        Initializes an instance of EvalTranslationSegments.
+
+        Args:
+            th (float): The threshold score for the field scores.
+            actual_output (str): The generated translation.
+            expected_output (str): The reference translation.
+            tokenizer (str): The tokenizer ("simple", "word" or "nltk").
+            language (str): The language of the translations.
+            worst (int): The number of segments with the largest impact listed in the result.
+        """
+        self.threshold = th
+        self.tokenizer = tokenizer
+        self.language = language
+        self.worst = worst
+        self.segments = align(split_sentences(actual_output), split_sentences(expected_output))
+
+    def evaluate(self, metric: str = "all", lookup=None, store=None) -> dict:
+        """
+        Scores the segments (those not found with lookup in the worker pool) and aggregates the field scores.
+
+        Args:
+            metric (str): The metric to measure ("all", "gleu", "meteor", or "lepor").
+            lookup: Function returning the stored score of a metric (name, generated, reference), or None.
+            store: Function storing the score of a metric (name, generated, reference, score).
+
+        Returns:
+            dict: The field score of each metric, the segments with their scores and impact, and the segments
+                with the largest impact.
+        """
+        names = metric_names(metric)
+        scores = [{} for _ in self.segments]
+        pending = []
+
+        for index, (generated, reference) in enumerate(self.segments):
+            for name in names:
+                score = 0.0 if not (generated and reference) else lookup(name, generated, reference) if lookup else None
+                if score is None:
+                    pending.append(index)
+                    break
+                scores[index][name] = score
+
+        # Segments missing any of the metrics are scored with all of them, in one pass over their tokens
+        scored = worker_pool.map_chunked(score_pairs, pending, metric, self.threshold, self.tokenizer, self.language,
+                                         prepare=lambda index: self.segments[index])
+        for index, result in scored:
+            for name in names:
+                scores[index][name] = result[name]["Score"]
+                if store:
+                    store(name, *self.segments[index], result[name]["Score"])
+
+        return self.aggregate(names, scores, len(pending))
+
+    def aggregate(self, names: tuple[str, ...], scores: list[dict], computed: int) -> dict:
+        """
+        Aggregates segment scores into field scores and ranks the segments by their impact.
+
+        Args:
+            names (tuple[str, ...]): The metric names.
+            scores (list[dict]): The scores of each segment, keyed by metric name.
+            computed (int): The number of segments scored by this evaluation (the rest came from the cache).
+
+        Returns:
+            dict: The evaluation result, see evaluate.
+        """
+        weights = [max(len(generated), len(reference)) for generated, reference in self.segments]
+        total = sum(weights) or 1
+
+        result = {}
+        for name in names:
+            field = sum(weight * segment[name] for weight, segment in zip(weights, scores)) / total if self.segments else 0.0
+            result[name] = score_result(name, round(field, 2), self.threshold)
+
+        segments = []
+        for index, ((generated, reference), weight, segment) in enumerate(zip(self.segments, weights, scores)):
+            segments.append({
+                "Index": index,
+                "Generated": generated,
+                "Reference": reference,
+                "Scores": {name: segment[name] for name in names},
+                # The field score lost on this segment, averaged over the metrics; the impacts add up to 1 - field score
+                "Impact": round(sum(weight * (1 - segment[name]) for name in names) / (total * len(names)), 4)
+            })
+
+        worst = sorted((segment for segment in segments if segment["Impact"] > 0),
+                       key=lambda segment: segment["Impact"], reverse=True)[:self.worst]
+
+        result["Segments"] = segments
+        result["Weakest Segments"] = [segment["Index"] for segment in worst]
+        result["Segmentation"] = {"Segments": len(segments), "Scored": computed, "Cached": len(segments) - computed}
+        return result
+
+
+def split_sentences(text: str) -> list[str]:
+    """
+    Splits a text into sentences at sentence-ending punctuation and line breaks.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        list[str]: The non-empty sentences, stripped.
+    """
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text) if sentence and sentence.strip()]
+
+
+def align(hypothesis: list[str], reference: list[str]) -> list[tuple[str, str]]:
+    """
+    Aligns the sentences of a translation with the sentences of its reference by length (Gale-Church).
+
+    Args:
+        hypothesis (list[str]): The generated sentences.
+        reference (list[str]): The reference sentences.
+
+    Returns:
+        list[tuple[str, str]]: The aligned (generated, reference) segments in order. Sentences merged by an
+            alignment are joined with a space; a sentence without counterpart is paired with an empty string.
+    """
+    hyp_lengths = [len(sentence) for sentence in hypothesis]
+    ref_lengths = [len(sentence) for sentence in reference]
+    # Expected reference characters per generated character
+    ratio = (sum(ref_lengths) / sum(hyp_lengths)) if sum(hyp_lengths) and sum(ref_lengths) else 1.0
+
+    rows, columns = len(hypothesis), len(reference)
+    costs = [[math.inf] * (columns + 1) for _ in range(rows + 1)]
+    moves = [[None] * (columns + 1) for _ in range(rows + 1)]
+    costs[0][0] = 0.0
+
+    for i in range(rows + 1):
+        for j in range(columns + 1):
+            if costs[i][j] == math.inf:
+                continue
+            for (di, dj), prior in ALIGNMENTS.items():
+                if i + di > rows or j + dj > columns:
+                    continue
+                cost = costs[i][j] - math.log(prior) + _length_cost(sum(hyp_lengths[i:i + di]),
+                                                                    sum(ref_lengths[j:j + dj]), ratio)
+                if cost < costs[i + di][j + dj]:
+                    costs[i + di][j + dj] = cost
+                    moves[i + di][j + dj] = (di, dj)
+
+    segments = []
+    i, j = rows, columns
+    while i or j:
+        di, dj = moves[i][j]
+        segments.append((" ".join(hypothesis[i - di:i]), " ".join(reference[j - dj:j])))
+        i, j = i - di, j - dj
+    segments.reverse()
+    return segments
+
+
+def _length_cost(hyp_length: int, ref_length: int, ratio: float) -> float:
+    # -log of the probability of the length difference, which Gale-Church models as normally distributed
+    if not hyp_length and not ref_length:
+        return 0.0
+    mean = (hyp_length + ref_length / ratio) / 2
+    delta = (ref_length - hyp_length * ratio) / math.sqrt(max(mean, 1.0) * LENGTH_VARIANCE)
+    return -math.log(max(math.erfc(abs(delta) / math.sqrt(2)), 1e-300))
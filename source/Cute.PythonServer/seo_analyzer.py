@@ -0,0 +1,232 @@
+"""
+Local SEO content analyzer.
+
+An offline alternative to the SEO Review Tools content analysis API. A page is parsed once into an HtmlDocument
+(see html_document) and scored with rules modeled on the API's. The result has the shape of the API's `data` object, so ContentAnalysisMetric parses both the same
+way. Every check is scored out of MAX_SCORE and the overall score is the percentage of the points scored.
+"""
+
+import re
+
+from urllib.parse import urlparse
+
+import html_document
+from html_document import HtmlDocument, normalize as _normalize
+
+MAX_SCORE = 10
+
+TITLE_LENGTH = (30, 60)
+META_DESCRIPTION_LENGTH = (70, 160)
+CONTENT_LENGTH = (300, 600)
+KEYWORD_DENSITY = (0.005, 0.03)
+MAX_LINKS = 100
+
+_WORD = re.compile(r"\w+(?:['’-]\w+)*")
+
+
+def analyze(html: str | HtmlDocument, keyword: str, related_keywords: str = None, url: str = None) -> dict:
+    """
+    Analyzes the SEO of an HTML page.
+
+    Args:
+        html (str | HtmlDocument): The HTML of the page, or the page already parsed.
+        keyword (str): The focus keyword.
+        related_keywords (str): Comma separated related keywords.
+        url (str): The URL of the page, used to tell internal from external links.
+
+    Returns:
+        dict: The analysis in the shape of the SEO Review Tools API `data` object.
+    """
+    document = html if isinstance(html, HtmlDocument) else html_document.parse(html)
+
+    keyword = _normalize(keyword or '').casefold()
+    related = [k for k in (_normalize(k).casefold() for k in (related_keywords or '').split(',')) if k]
+    words = _WORD.findall(document.text.casefold())
+    # Words separated by two spaces and padded, so counting ' keyword ' counts whole-word occurrences,
+    # including adjacent ones
+    body = ' ' + '  '.join(words) + ' '
+
+    analysis = {
+        "Title Tag": _title_tag(document.title, keyword),
+        "Meta description": _meta_description(document.meta_description, keyword),
+        "Page headings": _page_headings(document.headings, keyword),
+        "Content length": _content_length(len(words)),
+        "On page links": _on_page_links(document.links, url),
+        "Image analysis": _image_analysis(document.images, keyword),
+        "Keyword usage": _keyword_usage(body, len(words), keyword),
+        "Related keywords": _related_keywords(body, related),
+    }
+
+    # Related keywords only count towards the overall score when some were given
+    checks = [check for name, check in analysis.items() if related or name != "Related keywords"]
+    scored = sum(check["SEO Score"] for check in checks)
+    available = sum(check["Max SEO score available"] for check in checks)
+
+    return {"Overview": {"Overall SEO Score": round(100 * scored / available)}, **analysis}
+
+
+def _title_tag(title: str | None, keyword: str) -> dict:
+    if not title:
+        return _check(0, Status="No title tag found.", Length="The title tag is empty.",
+                      **{"Focus keyword": "The focus keyword is not used in the title tag.",
+                         "Focus keywords position": "The focus keyword is not used in the title tag."})
+
+    position = _find(title.casefold(), keyword)
+    length_ok = TITLE_LENGTH[0] <= len(title) <= TITLE_LENGTH[1]
+    return _check(
+        4 + (2 if length_ok else 0) + (2 if position >= 0 else 0) + (2 if 0 <= position <= len(title) // 2 else 0),
+        Status="A title tag is set.",
+        Length=_length_text("title tag", len(title), TITLE_LENGTH),
+        **{"Focus keyword": _used_text("title tag", position >= 0),
+           "Focus keywords position": _position_text("title tag", position, len(title))})
+
+
+def _meta_description(description: str | None, keyword: str) -> dict:
+    if not description:
+        return _check(0, Status="No meta description found.", Length="The meta description is empty.",
+                      **{"Focus keyword": "The focus keyword is not used in the meta description.",
+                         "Focus keywords position": "The focus keyword is not used in the meta description."})
+
+    description = _normalize(description)
+    position = _find(description.casefold(), keyword)
+    length_ok = META_DESCRIPTION_LENGTH[0] <= len(description) <= META_DESCRIPTION_LENGTH[1]
+    return _check(
+        4 + (2 if length_ok else 0) + (2 if position >= 0 else 0) + (2 if 0 <= position <= len(description) // 2 else 0),
+        Status="A meta description is set.",
+        Length=_length_text("meta description", len(description), META_DESCRIPTION_LENGTH),
+        **{"Focus keyword": _used_text("meta description", position >= 0),
+           "Focus keywords position": _position_text("meta description", position, len(description))})
+
+
+def _page_headings(headings: list[tuple[str, str]], keyword: str) -> dict:
+    h1 = [text for tag, text in headings if tag == 'h1']
+    used = any(_find(text.casefold(), keyword) >= 0 for tag, text in headings if tag in ('h1', 'h2'))
+
+    if not headings:
+        status, score = "No headings found.", 0
+    elif len(h1) == 1:
+        status, score = f"One H1 heading and {len(headings) - 1} other headings found.", 5
+    elif not h1:
+        status, score = f"No H1 heading found among {len(headings)} headings.", 2
+    else:
+        status, score = f"{len(h1)} H1 headings found, use a single H1 heading.", 3
+
+    return _check(score + (5 if used else 0), Status=status,
+                  **{"Focus keyword": _used_text("H1 or H2 headings", used)})
+
+
+def _content_length(words: int) -> dict:
+    if words >= CONTENT_LENGTH[1]:
+        score, status = 10, f"The content has {words} words, that is a good length."
+    elif words >= CONTENT_LENGTH[0]:
+        score, status = 6, f"The content has {words} words, consider at least {CONTENT_LENGTH[1]} words."
+    elif words:
+        score, status = 2, f"The content has only {words} words, consider at least {CONTENT_LENGTH[1]} words."
+    else:
+        score, status = 0, "The page has no content."
+    return _check(score, Status=status)
+
+
+def _on_page_links(links: list[str], url: str | None) -> dict:
+    host = urlparse(url).netloc if url else ''
+    external = sum(1 for link in links if urlparse(link).netloc not in ('', host))
+    internal = len(links) - external
+
+    if not links:
+        score, status = 0, "No links found on the page."
+    elif len(links) > MAX_LINKS:
+        score, status = 5, f"{len(links)} links found, more than {MAX_LINKS} links may dilute their value."
+    else:
+        score, status = 10, f"{internal} internal and {external} external links found."
+    return _check(score, Status=status)
+
+
+def _image_analysis(images: list[tuple[str, str]], keyword: str) -> dict:
+    if not images:
+        return _check(0, Status="No images found on the page.",
+                      **{"Image name contains keyword": "No image name contains the focus keyword.",
+                         "Image ALT tag contains keyword": "No image ALT tag contains the focus keyword."})
+
+    slug = keyword.replace(' ', '-')
+    named = any(keyword and (slug in src.casefold() or keyword.replace(' ', '_') in src.casefold())
+                for src, alt in images)
+    described = any(_find(_normalize(alt).casefold(), keyword) >= 0 for src, alt in images)
+    missing_alt = sum(1 for src, alt in images if not alt.strip())
+
+    status = f"{len(images)} images found" + (f", {missing_alt} without ALT text." if missing_alt else ".")
+    return _check(4 + (3 if named else 0) + (3 if described else 0), Status=status,
+                  **{"Image name contains keyword": ("An image name contains the focus keyword." if named
+                                                     else "No image name contains the focus keyword."),
+                     "Image ALT tag contains keyword": ("An image ALT tag contains the focus keyword." if described
+                                                        else "No image ALT tag contains the focus keyword.")})
+
+
+def _keyword_usage(body: str, words: int, keyword: str) -> dict:
+    count = _count(body, keyword)
+    density = count * len(keyword.split()) / words if words else 0.0
+
+    if not count:
+        score, status = 0, "The focus keyword is not used in the content."
+    elif density < KEYWORD_DENSITY[0]:
+        score, status = 5, f"The focus keyword is used {count} times ({density:.1%}), consider using it more often."
+    elif density > KEYWORD_DENSITY[1]:
+        score, status = 4, f"The focus keyword is used {count} times ({density:.1%}), that may be seen as keyword stuffing."
+    else:
+        score, status = 10, f"The focus keyword is used {count} times ({density:.1%})."
+    return _check(score, Status=status)
+
+
+def _related_keywords(body: str, related: list[str]) -> dict:
+    found = [keyword for keyword in related if _count(body, keyword)]
+    not_found = [keyword for keyword in related if keyword not in found]
+
+    if not related:
+        result = _check(0, Status="No related keywords to check.")
+    else:
+        result = _check(round(MAX_SCORE * len(found) / len(related)),
+                        Status=f"{len(found)} of {len(related)} related keywords are used in the content.")
+    result["Related keywords found"] = found
+    result["Related keywords not found"] = not_found
+    return result
+
+
+def _check(score: int, **feedback: str) -> dict:
+    return {
+        "SEO Score": score,
+        "Max SEO score available": MAX_SCORE,
+        "Feedback details": {name: {"text": text} for name, text in feedback.items()}
+    }
+
+
+def _find(text: str, keyword: str) -> int:
+    if not keyword:
+        return -1
+    match = re.search(r'(?<!\w)' + re.escape(keyword) + r'(?!\w)', text)
+    return match.start() if match else -1
+
+
+def _count(body: str, keyword: str) -> int:
+    words = _WORD.findall(keyword)
+    if not words:
+        return 0
+    return body.count(' ' + '  '.join(words) + ' ')
+
+
+def _length_text(name: str, length: int, bounds: tuple[int, int]) -> str:
+    if length < bounds[0]:
+        return f"The {name} is {length} characters, shorter than the recommended {bounds[0]} to {bounds[1]}."
+    if length > bounds[1]:
+        return f"The {name} is {length} characters, longer than the recommended {bounds[0]} to {bounds[1]}."
+    return f"The {name} is {length} characters, within the recommended {bounds[0]} to {bounds[1]}."
+
+
+def _used_text(name: str, used: bool) -> str:
+    return f"The focus keyword is used in the {name}." if used else f"The focus keyword is not used in the {name}."
+
+
+def _position_text(name: str, position: int, length: int) -> str:
+    if position < 0:
+        return f"The focus keyword is not used in the {name}."
+    if position <= length // 2:
+        return f"The focus keyword is used at the start of the {name}."
+    return f"Move the focus keyword closer to the start of the {name}."
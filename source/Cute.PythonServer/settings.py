@@ -0,0 +1,42 @@
+"""
+Numeric settings read from environment variables.
+
+A setting that is missing or cannot be parsed falls back to its default, so a typo in a deployment's environment
+leaves the server running with the documented default rather than failing at startup.
+"""
+
+import os
+
+
+def int_setting(name: str, default: int) -> int:
+    """
+    Gets an integer setting.
+
+    Args:
+        name (str): The environment variable.
+        default (int): The value when the variable is missing or not an integer.
+
+    Returns:
+        int: The setting.
+    """
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def float_setting(name: str, default: float) -> float:
+    """
+    Gets a number setting.
+
+    Args:
+        name (str): The environment variable.
+        default (float): The value when the variable is missing or not a number.
+
+    Returns:
+        float: The setting.
+    """
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
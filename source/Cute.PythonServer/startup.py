@@ -0,0 +1,103 @@
+"""
+Lazy loading of the metric modules, with an optional warm-up and a startup-time report.
+
+The server starts without importing DeepEval, NLTK or the SEO backends; each endpoint family loads its
+modules on its first request, so health checks are answered right away and a translator-only deployment never
+loads DeepEval. Families can be loaded up front instead with:
+
+    CUTE_WARM_UP  Comma separated endpoint families loaded at startup: translator, generator, seo or all
+                  (default: none).
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+
+FAMILIES = {
+    "translator": ("translation_scoring",),
+    "generator": ("eval_generation", "model_registry"),
+    "seo": ("eval_seo",),
+}
+
+_started = time.perf_counter()
+_ready = None
+_loaded = {}
+_warmed = {}
+_lock = threading.Lock()
+
+
+def load(family: str):
+    """
+    Imports the modules of an endpoint family, recording how long the first import took.
+
+    Args:
+        family (str): The endpoint family ("translator", "generator" or "seo").
+    """
+    if family in _loaded:
+        return
+    with _lock:
+        if family in _loaded:
+            return
+        started = time.perf_counter()
+        for module in FAMILIES[family]:
+            importlib.import_module(module)
+        _loaded[family] = round(time.perf_counter() - started, 3)
+
+
+def warm_up(families: str = None):
+    """
+    Loads endpoint families before the first request. The translator family also loads the scoring
+    libraries and starts the metric worker processes.
+
+    Args:
+        families (str): Comma separated families, or "all". Defaults to CUTE_WARM_UP.
+    """
+    families = os.environ.get('CUTE_WARM_UP', '') if families is None else families
+    names = FAMILIES if families.strip() == 'all' else [name.strip() for name in families.split(',') if name.strip()]
+
+    for family in names:
+        if family not in FAMILIES:
+            raise ValueError(f"Invalid warm-up family '{family}'")
+        started = time.perf_counter()
+        load(family)
+        if family == "translator":
+            _warm_up_translator()
+        _warmed[family] = round(time.perf_counter() - started, 3)
+
+
+def _warm_up_translator():
+    import translation_scoring
+    import worker_pool
+
+    translation_scoring.warm_up()
+    if worker_pool.get_pool() is not None:
+        futures = [worker_pool.submit(sum, ()) for _ in range(worker_pool.worker_count())]
+        for future in futures:
+            future.result()
+
+
+def mark_ready():
+    """
+    Records that the application finished loading and can serve requests.
+    """
+    global _ready
+    if _ready is None:
+        _ready = round(time.perf_counter() - _started, 3)
+
+
+def report() -> dict:
+    """
+    Gets the startup-time report.
+
+    Returns:
+        dict: Seconds from the start of loading the application until it was ready, seconds each endpoint
+            family took to load and warm up, and whether DeepEval has been loaded into this process.
+    """
+    return {
+        "Ready": _ready,
+        "Loaded": dict(_loaded),
+        "Warmed Up": dict(_warmed),
+        "DeepEval Loaded": "deepeval" in sys.modules
+    }
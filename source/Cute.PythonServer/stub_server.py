@@ -0,0 +1,64 @@
+"""
+Local JSON stub servers standing in for the external APIs, used by the benchmarks and the tests.
+
+A stub answers every GET and POST with the reply function's result, so a benchmark or test can script statuses,
+headers and latency of an API without network access.
+"""
+
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, delayed ACKs add ~40 ms to every call
+    disable_nagle_algorithm = True
+    reply = None
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b""
+        reply = self.reply(body)
+        status, reply, headers = reply if isinstance(reply, tuple) else (200, reply, {})
+        output = json.dumps(reply).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(output)))
+        self.end_headers()
+        self.wfile.write(output)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubServer(ThreadingHTTPServer):
+    # Concurrent clients open many connections at once; the default backlog of 5 drops some of them
+    request_queue_size = 128
+
+
+def start_stub(reply) -> ThreadingHTTPServer:
+    """
+    Starts a local JSON server in a background thread.
+
+    Args:
+        reply: Function from the request body to the response object, or to a (status, response object,
+            headers) tuple.
+
+    Returns:
+        ThreadingHTTPServer: The server, listening on a free port.
+    """
+    handler = type("Handler", (_StubHandler,), {"reply": staticmethod(reply)})
+    server = _StubServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
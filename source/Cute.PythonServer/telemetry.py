@@ -0,0 +1,340 @@
+"""
+Prometheus metrics of the server, exported by /metrics in the Prometheus text format.
+
+The counters, gauges and histograms are implemented here rather than with prometheus_client, so recording a value
+is a lock and an addition. Request counts, errors, latency and in-flight requests are recorded per endpoint by
+app.py; the duration of every individual metric (GLEU, METEOR, LEPOR, answer relevancy, faithfulness, SEO) and of
+every outbound LLM or API call by the code that runs them. Cache statistics are read when the metrics are scraped,
+so they cost nothing on the request path.
+
+The translation metrics run in the worker pool. Their histograms have a fixed set of label values, and the workers
+add what they recorded to an array shared with the server process after each task, like the WordNet cache
+statistics. Each gunicorn worker process exports its own metrics; Prometheus sums them by instance.
+"""
+
+import bisect
+import threading
+import time
+
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class _Value:
+    """
+    A counter or gauge value for one set of label values.
+    """
+
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = float(value)
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        return [f"{name}{labels} {_format(self.value)}"]
+
+
+class _HistogramValue:
+    """
+    Histogram buckets for one set of label values. Counts are kept per bucket and made cumulative on export.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, count: int = 1):
+        """
+        Records a value.
+
+        Args:
+            value (float): The observed value.
+            count (int): How many times the value was observed, for the per-item time of a batch.
+        """
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += count
+            self.sum += value * count
+
+    @contextmanager
+    def time(self):
+        """
+        Records the duration of the block in seconds.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> list[float]:
+        with self.lock:
+            return self.counts + [self.sum]
+
+    def samples(self, name: str, labels: str, snapshot: list[float] = None) -> list[str]:
+        snapshot = snapshot or self.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float('inf'),), snapshot):
+            cumulative += count
+            lines.append(f"{name}_bucket{_with_label(labels, 'le', _format(bound))} {_format(cumulative)}")
+        lines.append(f"{name}_sum{labels} {_format(snapshot[-1])}")
+        lines.append(f"{name}_count{labels} {_format(cumulative)}")
+        return lines
+
+
+class _Family:
+    """
+    A metric with its values for each set of label values.
+    """
+
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.children = {}
+        self.lock = threading.Lock()
+        _families.append(self)
+
+    def labels(self, *values: str):
+        """
+        Gets the value of a set of label values, creating it on first use.
+
+        Args:
+            *values (str): The label values, in the order of the label names.
+        """
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        return _Value()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            children = sorted(self.children.items())
+        for values, child in children:
+            lines.extend(self._samples(values, child))
+        return lines
+
+    def _samples(self, values: tuple[str, ...], child) -> list[str]:
+        return child.samples(self.name, _labels(self.label_names, values))
+
+
+class Counter(_Family):
+    kind = "counter"
+
+
+class Gauge(_Family):
+    kind = "gauge"
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DURATION_BUCKETS, shared: tuple[tuple[str, ...], ...] = ()):
+        """
+        Initializes a histogram.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labels (tuple[str, ...]): The label names.
+            buckets (tuple[float, ...]): The upper bounds of the buckets.
+            shared (tuple[tuple[str, ...], ...]): The label values recorded in worker processes.
+        """
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self.shared = {}
+        for values in shared:
+            self.shared[values] = _allocate(len(self.buckets) + 2)
+            self.labels(*values)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _samples(self, values: tuple[str, ...], child) -> list[str]:
+        snapshot = child.snapshot()
+        if values in self.shared and _shared is not None and not _worker:
+            start = self.shared[values]
+            snapshot = [local + shared for local, shared in zip(snapshot, _shared[start:start + len(snapshot)])]
+        return child.samples(self.name, _labels(self.label_names, values), snapshot)
+
+
+_families = []
+_collectors = []
+
+
+def collector(fn):
+    """
+    Registers a function called on every scrape that returns extra samples as (name, kind, help, samples)
+    tuples, where samples are (labels dict, value) pairs.
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    """
+    Renders all metrics in the Prometheus text format.
+
+    Returns:
+        str: The exposition.
+    """
+    lines = []
+    for family in list(_families):
+        lines.extend(family.render())
+    for fn in _collectors:
+        for name, kind, documentation, samples in fn():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if value is not None:
+                    lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+###############################################################################################################
+# Worker process histograms
+# Worker processes add their observations of the shared histograms to an array shared with the server process
+# after each task. The array layout follows the declaration order of the histograms below, which is the same in
+# every process.
+###############################################################################################################
+_shared = None
+_shared_size = 0
+_worker = False
+_flushed = {}
+
+
+def _allocate(size: int) -> int:
+    global _shared_size
+    start = _shared_size
+    _shared_size += size
+    return start
+
+
+def create_shared_state(context):
+    """
+    Creates the array that worker processes report their shared histograms to.
+
+    Args:
+        context: The multiprocessing context of the worker pool.
+
+    Returns:
+        The shared array, to be passed to attach_shared_state in each worker.
+    """
+    global _shared
+    _shared = context.Array('d', _shared_size)
+    return _shared
+
+
+def attach_shared_state(state):
+    """
+    Makes this (worker) process report its shared histograms to the given array.
+    """
+    global _shared, _worker
+    _shared = state
+    _worker = True
+
+
+def flush():
+    """
+    Adds the observations of the shared histograms made since the last flush to the shared array.
+    """
+    if not _worker:
+        return
+    with _shared.get_lock():
+        for family in _families:
+            for values, start in getattr(family, 'shared', {}).items():
+                snapshot = family.labels(*values).snapshot()
+                flushed = _flushed.get((family.name, values), [0] * len(snapshot))
+                for i, (value, previous) in enumerate(zip(snapshot, flushed)):
+                    _shared[start + i] += value - previous
+                _flushed[(family.name, values)] = snapshot
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _with_label(labels: str, name: str, value: str) -> str:
+    label = f'{name}="{value}"'
+    return "{" + label + "}" if not labels else labels[:-1] + "," + label + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+###############################################################################################################
+# Server metrics
+###############################################################################################################
+REQUESTS = Counter("cute_http_requests_total", "HTTP requests by endpoint, measure and status.",
+                   ("endpoint", "measure", "status"))
+REQUEST_ERRORS = Counter("cute_http_request_errors_total", "HTTP requests answered with an error status.",
+                         ("endpoint", "measure"))
+REQUEST_SECONDS = Histogram("cute_http_request_duration_seconds", "HTTP request latency in seconds.",
+                            ("endpoint", "measure"))
+REQUESTS_IN_FLIGHT = Gauge("cute_http_requests_in_flight", "HTTP requests being handled.", ("endpoint",))
+
+METRIC_SECONDS = Histogram("cute_metric_duration_seconds",
+                           "Time to compute one evaluation metric for one item in seconds.", ("metric",),
+                           shared=(("gleu",), ("meteor",), ("lepor",)))
+METRIC_ERRORS = Counter("cute_metric_errors_total", "Evaluation metrics that raised an error.", ("metric",))
+
+OUTBOUND_SECONDS = Histogram("cute_outbound_request_duration_seconds",
+                             "Outbound LLM and API call latency in seconds, including retries.", ("service", "outcome"))
+
+LLM_TOKENS = Counter("cute_llm_tokens_total", "LLM tokens used by deployment and kind (prompt or completion).",
+                     ("deployment", "kind"))
+LLM_THROTTLED = Counter("cute_llm_throttled_total", "LLM calls throttled (429 or 503) by deployment.", ("deployment",))
+LLM_RETRIES = Counter("cute_llm_retries_total", "LLM calls retried by deployment.", ("deployment",))
+LLM_CONCURRENCY_LIMIT = Gauge("cute_llm_concurrency_limit", "Adaptive limit of LLM calls in flight by deployment.",
+                              ("deployment",))
+
+PIPELINE_DECISIONS = Counter("cute_pipeline_decisions_total", "Pipeline records by the tier that decided them.",
+                             ("tier",))
+
+
+def outcome(status: int = None) -> str:
+    """
+    Gets the outcome label of an outbound call: the status class ("2xx", "4xx", ...) or "error" when no
+    response was received.
+    """
+    return f"{status // 100}xx" if status else "error"
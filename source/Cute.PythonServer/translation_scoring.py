@@ -0,0 +1,277 @@
+"""
+Translation scores without the DeepEval dependency.
+
+The GLEU, METEOR and LEPOR scores, their pass/fail reasons and the batch scoring dispatched to the worker pool live
+here, so the worker processes and the batch translator endpoint never import DeepEval. The DeepEval metrics in
+eval_translation report the scores computed by these functions. NLTK's METEOR is imported on first use; hLEPOR is
+computed by the indexed engine in lepor_engine, which scores long documents in near-linear time.
+"""
+
+import time
+
+from typing import Iterable, Iterator
+
+import telemetry
+import worker_pool
+import wordnet_cache
+from lepor_engine import batch_hlepor
+from ngram_engine import gleu_from_statistics, ngram_statistics, sentence_gleu
+from preprocess import Preprocessor, TokenizedPair
+from score_summary import ScoreSummary
+
+METRICS = ("GLEU", "METEOR", "LEPOR")
+
+REASONS = {
+    "GLEU": ("The GLEU score is {} because the generated translation is a close or exact match to the reference translation.",
+             "The GLEU score is {} because the are significant differences between the generated translation and the reference translation, such as incorrect word choices, poor grammar, or missing key information."),
+    "METEOR": ("The METEOR score is {} because the generated translation is a close or exact match to the reference translation.",
+               "The METEOR score is {} because the generated translation chose the wrong words, eaving things out, or scrambling the sentence order. Even if the words are mostly correct, if the translation sounds awkward or misses the key idea, it won't score well."),
+    "LEPOR": ("The LEPOR score is {} because the generated translation is a close or exact match to the reference translation.",
+              "The LEPOR score is {} because the generated translation has poor lexical similarity, inadequate precision, and recall, as well as significant differences in word order compared to the reference translation."),
+}
+
+
+def gleu_score(pair: TokenizedPair) -> float:
+    """
+    Computes the sentence-level GLEU score of a tokenized pair.
+    """
+    return round(sentence_gleu([pair.reference.tokens], pair.hypothesis.tokens), 2)
+
+
+def gleu_scores(pairs: list[TokenizedPair]) -> list[float]:
+    """
+    Computes the sentence-level GLEU scores of many tokenized pairs at once with the vectorized n-gram engine.
+    """
+    statistics = ngram_statistics([pair.hypothesis.ids for pair in pairs], [pair.reference.ids for pair in pairs])
+    return [round(float(score), 2) for score in gleu_from_statistics(*statistics)]
+
+
+def meteor_score(pair: TokenizedPair) -> float:
+    """
+    Computes the METEOR score of a tokenized pair with the cached WordNet and stem lookups.
+    """
+    from nltk.translate.meteor_score import single_meteor_score
+
+    return round(single_meteor_score(pair.reference.normalized, pair.hypothesis.normalized,
+                                     preprocess=str, stemmer=pair.stemmer(),
+                                     wordnet=wordnet_cache.CachedWordNet()), 2)
+
+
+def lepor_score(pair: TokenizedPair) -> float:
+    """
+    Computes the hLEPOR score of a tokenized pair, 0 when either side is empty.
+    """
+    return lepor_scores([pair])[0]
+
+
+def lepor_scores(pairs: list[TokenizedPair]) -> list[float]:
+    """
+    Computes the hLEPOR scores of many tokenized pairs at once with the indexed hLEPOR engine.
+    """
+    scores = batch_hlepor([pair.reference.lepor_tokens for pair in pairs], [pair.hypothesis.lepor_tokens for pair in pairs])
+    return [round(float(score), 2) for score in scores]
+
+
+SCORERS = {
+    "GLEU": gleu_score,
+    "METEOR": meteor_score,
+    "LEPOR": lepor_score,
+}
+
+BATCH_SCORERS = {
+    "GLEU": gleu_scores,
+    "LEPOR": lepor_scores,
+}
+
+
+def score_result(name: str, score: float, th: float) -> dict:
+    """
+    Formats a score in the response format.
+
+    Args:
+        name (str): The metric name ("GLEU", "METEOR" or "LEPOR").
+        score (float): The rounded score.
+        th (float): The threshold score for success.
+
+    Returns:
+        dict: The result, score and reason of the metric.
+    """
+    success = score >= th
+    return {
+        "Result": bool(success),
+        "Score": float(score),
+        "Reason": REASONS[name][0 if success else 1].format(score)
+    }
+
+
+def metric_names(metric: str) -> tuple[str, ...]:
+    """
+    Resolves a measure name into the metrics it runs.
+
+    Args:
+        metric (str): The metric to measure ("all", "gleu", "meteor", or "lepor").
+
+    Returns:
+        tuple[str, ...]: The metric names.
+    """
+    match metric:
+        case "all":
+            return METRICS
+        case "gleu" | "meteor" | "lepor":
+            return (metric.upper(),)
+        case _:
+            raise ValueError(f"Invalid translator option '{metric}'")
+
+
+def score_pairs(metric: str, th: float, tokenizer: str, language: str, pairs: list[tuple[str, str]]) -> list[dict]:
+    """
+    Scores generated/reference pairs. This is the unit of work dispatched to the worker pool.
+
+    Args:
+        metric (str): The metric to measure ("all", "gleu", "meteor", or "lepor").
+        th (float): The threshold score for the metrics.
+        tokenizer (str): The tokenizer shared by all metrics.
+        language (str): The language of the texts.
+        pairs (list[tuple[str, str]]): The (generated, reference) pairs to score.
+
+    Returns:
+        list[dict]: For every pair, the result of each metric keyed by metric name.
+    """
+    names = metric_names(metric)
+    preprocessor = Preprocessor(tokenizer, language, max_pairs=len(pairs))
+    tokenized = [preprocessor.pair(actual_output, expected_output) for actual_output, expected_output in pairs]
+    results = [{} for _ in tokenized]
+    for name in names:
+        scores = timed_scores(name, tokenized)
+        for result, score in zip(results, scores):
+            result[name] = score_result(name, score, th)
+    wordnet_cache.flush_stats()
+    telemetry.flush()
+    return results
+
+
+def timed_scores(name: str, pairs: list[TokenizedPair]) -> list[float]:
+    """
+    Scores tokenized pairs with one metric, recording the time per pair. GLEU and LEPOR score the whole batch
+    at once, so each pair is recorded with the batch's mean time.
+    """
+    duration = telemetry.METRIC_SECONDS.labels(name.lower())
+    if name in BATCH_SCORERS:
+        started = time.perf_counter()
+        scores = BATCH_SCORERS[name](pairs)
+        if pairs:
+            duration.observe((time.perf_counter() - started) / len(pairs), len(pairs))
+        return scores
+
+    scores = []
+    for pair in pairs:
+        started = time.perf_counter()
+        scores.append(SCORERS[name](pair))
+        duration.observe(time.perf_counter() - started)
+    return scores
+
+
+def score_pair(metric: str, th: float, tokenizer: str, language: str, actual_output: str, expected_output: str) -> dict:
+    """
+    Scores a single generated/reference pair with one metric in the worker pool.
+
+    Args:
+        metric (str): The metric to measure ("gleu", "meteor", or "lepor").
+        th (float): The threshold score for the metric.
+        tokenizer (str): The tokenizer ("simple", "word" or "nltk").
+        language (str): The language of the texts.
+        actual_output (str): The generated translation.
+        expected_output (str): The reference translation.
+
+    Returns:
+        dict: The result, score and reason of the metric.
+    """
+    results = worker_pool.submit(score_pairs, metric, th, tokenizer, language, [(actual_output, expected_output)]).result()
+    return results[0][metric.upper()]
+
+
+def warm_up():
+    """
+    Loads the scoring libraries and the WordNet synonym table (or corpus) up front.
+    """
+    wordnet_cache.warm_up()
+
+    import nltk.translate.meteor_score
+
+
+class EvalTranslationBatch:
+    """
+    Class for evaluating translation metrics over many generated/reference pairs in a single call.
+    The pairs are scored in chunks in the worker pool, so per-request overhead is amortized over the batch.
+    """
+
+    def __init__(self, llm_model: str, th: float, items: Iterable[dict], tokenizer: str = "simple", language: str = "english"):
+        """
+        Initializes an instance of EvalTranslationBatch.
+
+        Args:
+            llm_model (str): The language model used for evaluation.
+            th (float): The threshold score for the metrics.
+            items (Iterable[dict]): The pairs to score, each with "generated-content", "reference-content"
+                and optionally "id" and "prompt-field". Items are read lazily, once.
+            tokenizer (str): The tokenizer shared by all metrics ("simple", "word" or "nltk").
+            language (str): The language of the translations, used by language-aware tokenizers.
+        """
+        self.llm_model = llm_model
+        self.threshold = th
+        self.tokenizer = tokenizer
+        self.language = language
+        self.items = items
+        self.count = 0
+        self.summaries = {}
+
+    def evaluate(self, metric: str = "all") -> dict:
+        """
+        Scores every pair in the batch in the worker pool and aggregates the results per metric.
+
+        Args:
+            metric (str): The metric to measure ("all", "gleu", "meteor", or "lepor").
+
+        Returns:
+            dict: The per-item results and the aggregate summary.
+        """
+        results = list(self.iter_results(metric))
+        return {
+            "Items": results,
+            "Summary": self.summary()
+        }
+
+    def iter_results(self, metric: str = "all") -> Iterator[dict]:
+        """
+        Scores the pairs in the worker pool, yielding each item's result as soon as it is available.
+        Only the aggregate statistics are kept, so memory stays flat regardless of the batch size.
+
+        Args:
+            metric (str): The metric to measure ("all", "gleu", "meteor", or "lepor").
+
+        Returns:
+            Iterator[dict]: The result of each item, in the order of the items.
+        """
+        scored = worker_pool.map_chunked(score_pairs, self.items, metric, self.threshold,
+                                         self.tokenizer, self.language,
+                                         prepare=lambda item: (item['generated-content'], item['reference-content']))
+
+        for item, scores in scored:
+            result = {"Index": self.count, "Id": item.get('id')}
+            for name, score in scores.items():
+                result[name] = score
+                self.summaries.setdefault(name, ScoreSummary()).add(score["Score"], score["Result"])
+            self.count += 1
+            yield result
+
+    def summary(self) -> dict:
+        """
+        Gets the aggregate statistics of the items scored so far.
+
+        Returns:
+            dict: The number of items and the summary of each metric.
+        """
+        return {
+            "Count": self.count,
+            "Metrics": {name: summary.to_dict() for name, summary in self.summaries.items()}
+        }
@@ -0,0 +1,305 @@
+"""
+Memoized WordNet synonym and stem lookups for the METEOR metric.
+
+METEOR looks up the WordNet synonyms and Porter stem of every token of every pair. Content in a locale repeats
+heavily, so lookups are kept in bounded in-process LRU caches. Synonyms are read from a precomputed, memory-mapped
+table when one has been built (see build_synonym_table, run by nltk_download.py at image build time), so worker
+processes share one copy through the OS page cache instead of each loading the WordNet corpus. Words missing from
+the table (mostly inflected forms) fall back to the corpus.
+
+    CUTE_WORDNET_CACHE_SIZE  Maximum number of words kept in each LRU cache (default: 100000).
+    CUTE_WORDNET_TABLE       Path of the synonym table (default: wordnet_synonyms.bin next to this module).
+"""
+
+import bisect
+import mmap
+import os
+import struct
+
+from functools import lru_cache
+
+import settings
+
+_MAGIC = b'CUTEWN01'
+_HEADER = struct.Struct('<8sQ')
+_OFFSET = struct.Struct('<Q')
+
+_CACHE_SIZE = settings.int_setting('CUTE_WORDNET_CACHE_SIZE', 100000)
+
+TABLE_PATH = os.environ.get('CUTE_WORDNET_TABLE',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wordnet_synonyms.bin'))
+
+
+class SynonymTable:
+    """
+    Read-only, memory-mapped table mapping words to their WordNet synonyms.
+
+    The file holds a header, the sorted record offsets, and one record per word of the form
+    word NUL synonym TAB synonym ...
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self.data, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"'{path}' is not a synonym table")
+        self.offsets = memoryview(self.data)[_HEADER.size:_HEADER.size + (self.count + 1) * _OFFSET.size].cast('Q')
+        self.base = _HEADER.size + (self.count + 1) * _OFFSET.size
+        self.words = _Keys(self)
+
+    def key(self, index: int) -> bytes:
+        start = self.base + self.offsets[index]
+        return self.data[start:self.data.find(b'\0', start)]
+
+    def get(self, word: str) -> frozenset[str] | None:
+        """
+        Looks up the synonyms of a word.
+
+        Args:
+            word (str): The word to look up.
+
+        Returns:
+            frozenset[str] | None: The synonyms, or None when the word is not in the table.
+        """
+        key = word.encode('utf-8')
+        index = bisect.bisect_left(self.words, key)
+        if index == self.count or self.key(index) != key:
+            return None
+        start = self.base + self.offsets[index] + len(key) + 1
+        end = self.base + self.offsets[index + 1]
+        value = self.data[start:end].decode('utf-8')
+        return frozenset(value.split('\t')) if value else frozenset()
+
+
+class _Keys:
+    """
+    Sequence view of the table keys for binary search.
+    """
+
+    def __init__(self, table: SynonymTable):
+        self.table = table
+
+    def __len__(self):
+        return self.table.count
+
+    def __getitem__(self, index: int) -> bytes:
+        return self.table.key(index)
+
+
+def build_synonym_table(path: str = TABLE_PATH) -> int:
+    """
+    Builds the synonym table from the NLTK WordNet corpus.
+
+    Args:
+        path (str): The file to write.
+
+    Returns:
+        int: The number of words in the table.
+    """
+    from nltk.corpus import wordnet
+
+    records = []
+    for word in wordnet.all_lemma_names():
+        if '_' in word:
+            continue
+        records.append((word.encode('utf-8'), '\t'.join(sorted(_corpus_synonyms(word))).encode('utf-8')))
+    records.sort()
+
+    offsets = []
+    position = 0
+    for key, value in records:
+        offsets.append(position)
+        position += len(key) + 1 + len(value)
+    offsets.append(position)
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(records)))
+        f.write(b''.join(_OFFSET.pack(offset) for offset in offsets))
+        for key, value in records:
+            f.write(key + b'\0' + value)
+    os.replace(temporary, path)
+    return len(records)
+
+
+class CachedWordNet:
+    """
+    Stand-in for the NLTK WordNet corpus reader accepted by nltk.translate.meteor_score, answering
+    synset lookups from the caches. All synonyms of a word are returned as one synset.
+    """
+
+    def synsets(self, word: str) -> list["_SynonymSet"]:
+        synonyms = synonyms_of(word)
+        return [_SynonymSet(synonyms)] if synonyms else []
+
+
+class CachedStemmer:
+    """
+    Porter stemmer backed by the stem cache.
+    """
+
+    def stem(self, word: str) -> str:
+        return stem(word)
+
+
+class _SynonymSet:
+
+    def __init__(self, names: frozenset[str]):
+        self.names = names
+
+    def lemmas(self) -> list["_Lemma"]:
+        return [_Lemma(name) for name in self.names]
+
+
+class _Lemma:
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def name(self) -> str:
+        return self._name
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def synonyms_of(word: str) -> frozenset[str]:
+    """
+    Gets the WordNet synonyms of a word (lemma names without underscores, over all its synsets).
+
+    Args:
+        word (str): The word to look up.
+
+    Returns:
+        frozenset[str]: The synonyms of the word.
+    """
+    table = _table()
+    if table is not None:
+        synonyms = table.get(word)
+        if synonyms is not None:
+            return synonyms
+    return _corpus_synonyms(word)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def stem(word: str) -> str:
+    """
+    Gets the Porter stem of a word.
+
+    Args:
+        word (str): The word to stem.
+
+    Returns:
+        str: The stem.
+    """
+    return _porter().stem(word)
+
+
+def _corpus_synonyms(word: str) -> frozenset[str]:
+    from nltk.corpus import wordnet
+    return frozenset(lemma.name() for synset in wordnet.synsets(word) for lemma in synset.lemmas()
+                     if lemma.name().find('_') < 0)
+
+
+_synonym_table = None
+_porter_stemmer = None
+
+
+def _table() -> SynonymTable | None:
+    global _synonym_table
+    if _synonym_table is None:
+        _synonym_table = SynonymTable(TABLE_PATH) if os.path.exists(TABLE_PATH) else False
+    return _synonym_table or None
+
+
+def _porter():
+    global _porter_stemmer
+    if _porter_stemmer is None:
+        from nltk.stem.porter import PorterStemmer
+        _porter_stemmer = PorterStemmer()
+    return _porter_stemmer
+
+
+def warm_up():
+    """
+    Opens the synonym table, or loads the WordNet corpus when no table has been built.
+    """
+    if _table() is None:
+        try:
+            from nltk.corpus import wordnet
+            wordnet.ensure_loaded()
+        except LookupError:
+            pass
+    _porter()
+
+
+###############################################################################################################
+# Cache statistics
+# Worker processes add their hits and misses to counters shared with the server process after each task.
+###############################################################################################################
+_shared_counters = None
+_flushed = [0, 0, 0, 0]
+
+
+def create_shared_counters(context):
+    """
+    Creates the counters that worker processes report their cache statistics to.
+
+    Args:
+        context: The multiprocessing context of the worker pool.
+
+    Returns:
+        The shared counters, to be passed to attach_shared_counters in each worker.
+    """
+    global _shared_counters
+    _shared_counters = context.Array('q', 4)
+    return _shared_counters
+
+
+def attach_shared_counters(counters):
+    """
+    Makes this (worker) process report its cache statistics to the given counters.
+    """
+    global _shared_counters
+    _shared_counters = counters
+
+
+def _local_counters() -> list[int]:
+    synonyms, stems = synonyms_of.cache_info(), stem.cache_info()
+    return [synonyms.hits, synonyms.misses, stems.hits, stems.misses]
+
+
+def flush_stats():
+    """
+    Adds the cache statistics gathered since the last flush to the shared counters.
+    """
+    global _flushed
+    if _shared_counters is None:
+        return
+    counters = _local_counters()
+    with _shared_counters.get_lock():
+        for i, value in enumerate(counters):
+            _shared_counters[i] += value - _flushed[i]
+    _flushed = counters
+
+
+def stats() -> dict:
+    """
+    Gets the hit rates of the synonym and stem caches over this process and its workers.
+
+    Returns:
+        dict: Hits, misses and hit rate of each cache, and whether the synonym table is in use.
+    """
+    counters = _local_counters()
+    if _shared_counters is not None:
+        counters = [local - flushed + shared
+                    for local, flushed, shared in zip(counters, _flushed, _shared_counters[:])]
+
+    def summary(hits: int, misses: int) -> dict:
+        total = hits + misses
+        return {"Hits": hits, "Misses": misses, "Hit Rate": round(hits / total, 4) if total else None}
+
+    return {
+        "Synonyms": summary(counters[0], counters[1]),
+        "Stems": summary(counters[2], counters[3]),
+        "Synonym Table": TABLE_PATH if _table() is not None else None
+    }
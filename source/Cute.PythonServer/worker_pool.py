@@ -0,0 +1,162 @@
+"""
+Worker process pool for the CPU-bound evaluation metrics.
+
+The translation metrics are pure CPU work, so running them on the request thread limits a server to a single
+core. This module owns a lazily created pool of worker processes that both the single-pair and batch scoring
+paths dispatch to. The pool is configured with environment variables:
+
+    CUTE_EVAL_WORKERS       Number of worker processes (default: number of CPUs, 0 runs everything inline).
+    CUTE_EVAL_CHUNK_SIZE    Number of items sent to a worker in one task for batch scoring (default: 64).
+    CUTE_EVAL_START_METHOD  Multiprocessing start method for the workers (default: spawn).
+"""
+
+import os
+import threading
+import multiprocessing
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+
+import settings
+import telemetry
+import wordnet_cache
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def worker_count() -> int:
+    """
+    Gets the configured number of worker processes.
+
+    Returns:
+        int: The number of worker processes, 0 when metrics run inline.
+    """
+    return max(0, settings.int_setting('CUTE_EVAL_WORKERS', os.cpu_count() or 1))
+
+
+def chunk_size() -> int:
+    """
+    Gets the configured number of items per worker task for batch scoring.
+
+    Returns:
+        int: The chunk size.
+    """
+    return max(1, settings.int_setting('CUTE_EVAL_CHUNK_SIZE', 64))
+
+
+def get_pool() -> ProcessPoolExecutor | None:
+    """
+    Gets the shared worker pool, creating it on first use.
+
+    Returns:
+        ProcessPoolExecutor | None: The pool, or None when metrics run inline.
+    """
+    global _pool
+
+    if _pool is None and worker_count() > 0:
+        with _pool_lock:
+            if _pool is None:
+                context = multiprocessing.get_context(os.environ.get('CUTE_EVAL_START_METHOD', 'spawn'))
+                counters = wordnet_cache.create_shared_counters(context)
+                metrics = telemetry.create_shared_state(context)
+                _pool = ProcessPoolExecutor(max_workers=worker_count(), mp_context=context,
+                                            initializer=_warm_up, initargs=(counters, metrics))
+    return _pool
+
+
+def shutdown():
+    """
+    Shuts the worker pool down, waiting for running tasks to complete.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def submit(fn, *args) -> Future:
+    """
+    Runs a function in the worker pool, or inline when the pool is disabled.
+
+    Args:
+        fn: A picklable module-level function.
+        *args: The arguments to pass to the function.
+
+    Returns:
+        Future: The future holding the function's result.
+    """
+    pool = get_pool()
+    if pool is not None:
+        return pool.submit(fn, *args)
+
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def map_chunked(fn, items, *args, prepare=None, size: int = None):
+    """
+    Applies a function to items in chunks distributed over the worker pool.
+
+    The function is called as fn(*args, chunk) and must return one result per item in the chunk. Items are
+    read lazily and only a bounded number of chunks is in flight at a time, so memory use does not grow
+    with the number of items.
+
+    Args:
+        fn: A picklable module-level function.
+        items (Iterable): The items to process.
+        *args: Leading arguments passed to every call.
+        prepare: Optional function converting an item into what is sent to the worker.
+        size (int): Items per task. Defaults to CUTE_EVAL_CHUNK_SIZE.
+
+    Returns:
+        Iterator: (item, result) tuples in the order of the items.
+    """
+    size = size or chunk_size()
+    window = 2 * max(1, worker_count())
+    task = partial(fn, *args)
+    in_flight = deque()
+
+    def chunks():
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    for chunk in chunks():
+        work = [prepare(item) for item in chunk] if prepare is not None else chunk
+        in_flight.append((chunk, submit(task, work)))
+        if len(in_flight) >= window:
+            done, future = in_flight.popleft()
+            yield from zip(done, future.result())
+
+    while in_flight:
+        done, future = in_flight.popleft()
+        yield from zip(done, future.result())
+
+
+def _warm_up(counters, metrics):
+    """
+    Initializes a worker process by loading the WordNet synonym table (or corpus) and scoring libraries
+    up front, so the first task in each worker does not pay the loading cost.
+
+    Args:
+        counters: The shared counters the worker reports its WordNet cache statistics to.
+        metrics: The shared array the worker reports its metric durations to.
+    """
+    wordnet_cache.attach_shared_counters(counters)
+    telemetry.attach_shared_state(metrics)
+
+    import translation_scoring
+    translation_scoring.warm_up()
@@ -0,0 +1,14 @@
+"""
+Shared setup of the Cute Python Server tests: the server modules are imported from source/Cute.PythonServer.
+"""
+
+import os
+import sys
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "source", "Cute.PythonServer")
+sys.path.insert(0, os.path.abspath(SERVER))
+
+# Score in-process and keep caches in memory, so tests neither spawn metric workers nor write databases
+os.environ.setdefault("CUTE_EVAL_WORKERS", "0")
+os.environ.setdefault("CUTE_CACHE_BACKEND", "none")
+os.environ.setdefault("CUTE_EXTRACTION_CACHE_PATH", "none")
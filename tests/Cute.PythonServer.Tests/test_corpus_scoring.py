@@ -0,0 +1,99 @@
+"""
+Equivalence of the corpus scores with nltk.translate's corpus_gleu and corpus_bleu, and the bootstrap intervals.
+"""
+
+import warnings
+
+import numpy as np
+import pytest
+
+from nltk.translate.bleu_score import corpus_bleu as nltk_corpus_bleu
+from nltk.translate.gleu_score import corpus_gleu as nltk_corpus_gleu
+
+import corpus_scoring
+from test_ngram_engine import random_pairs
+
+
+def items(pairs: list[tuple[list[str], list[str]]]) -> list[dict]:
+    return [{"generated-content": " ".join(hypothesis), "reference-content": " ".join(reference)}
+            for hypothesis, reference in pairs]
+
+
+def nltk_scores(pairs: list[tuple[list[str], list[str]]]) -> tuple[float, float]:
+    references = [[reference] for _, reference in pairs]
+    hypotheses = [hypothesis for hypothesis, _ in pairs]
+    with warnings.catch_warnings():
+        # NLTK warns about orders without matches
+        warnings.simplefilter("ignore")
+        return nltk_corpus_gleu(references, hypotheses), nltk_corpus_bleu(references, hypotheses)
+
+
+# The simple tokenizer splits on single spaces, so texts are joined from non-empty token lists
+CORPORA = [
+    [pair for pair in random_pairs(200, seed, vocabulary_size, max_length) if pair[0] and pair[1]]
+    for seed, vocabulary_size, max_length in ((11, 5, 12), (12, 50, 40), (13, 1000, 60))
+]
+
+
+@pytest.mark.parametrize("pairs", CORPORA)
+def test_corpus_scores_match_nltk(pairs):
+    result = corpus_scoring.EvalTranslationCorpus(0.5, items(pairs)).evaluate(samples=0)
+    gleu, bleu = nltk_scores(pairs)
+
+    assert result["Count"] == len(pairs)
+    assert result["GLEU"]["Score"] == pytest.approx(gleu, abs=1e-4)
+    assert result["BLEU"]["Score"] == pytest.approx(bleu, abs=1e-4)
+    assert result["GLEU"]["Result"] == (result["GLEU"]["Score"] >= 0.5)
+    assert "Bootstrap" not in result
+
+
+def test_corpus_scores_without_matches():
+    pairs = [(["a", "b"], ["c", "d"]), (["e"], ["f", "g", "h"])]
+    result = corpus_scoring.EvalTranslationCorpus(0.5, items(pairs)).evaluate(samples=0)
+
+    assert result["GLEU"]["Score"] == 0
+    assert result["BLEU"]["Score"] == 0
+    assert result["BLEU"]["Precisions"] == [0, 0, 0, 0]
+
+
+def test_bootstrap_matches_resampling_with_nltk():
+    # The same draws as the bootstrap makes, scored one resample at a time by NLTK
+    pairs = CORPORA[1][:40]
+    samples, seed = 50, 7
+    draws = np.random.default_rng(seed).integers(0, len(pairs), size=(samples, len(pairs)))
+    gleu, bleu = zip(*(nltk_scores([pairs[i] for i in draw]) for draw in draws))
+
+    result = corpus_scoring.EvalTranslationCorpus(0.5, items(pairs)).evaluate(samples, 0.9, seed)
+
+    assert result["Bootstrap"] == {"Samples": samples, "Confidence": 0.9}
+    for name, scores in (("GLEU", gleu), ("BLEU", bleu)):
+        lower, upper = np.percentile(scores, [5, 95])
+        assert result[name]["Lower"] == pytest.approx(lower, abs=1e-4)
+        assert result[name]["Upper"] == pytest.approx(upper, abs=1e-4)
+
+
+def test_bootstrap_is_reproducible_with_a_seed():
+    pairs = CORPORA[0]
+
+    def evaluate(seed):
+        return corpus_scoring.EvalTranslationCorpus(0.5, items(pairs)).evaluate(200, 0.95, seed)
+
+    first, second = evaluate(3), evaluate(3)
+
+    assert first == second
+    for name in ("GLEU", "BLEU"):
+        assert first[name]["Lower"] <= first[name]["Score"] <= first[name]["Upper"]
+        assert first[name]["Lower"] < first[name]["Upper"]
+
+
+def test_bootstrap_of_identical_segments_has_no_spread():
+    pairs = [(["a", "b", "c", "d", "e"], ["a", "b", "c", "d", "f"])] * 10
+    result = corpus_scoring.EvalTranslationCorpus(0.5, items(pairs)).evaluate(100, 0.95, 1)
+
+    for name in ("GLEU", "BLEU"):
+        assert result[name]["Lower"] == result[name]["Score"] == result[name]["Upper"]
+
+
+def test_invalid_confidence_is_rejected():
+    with pytest.raises(ValueError):
+        corpus_scoring.EvalTranslationCorpus(0.5, items(CORPORA[0])).evaluate(confidence=1)
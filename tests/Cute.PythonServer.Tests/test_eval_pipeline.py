@@ -0,0 +1,187 @@
+"""
+The tier decisions of the evaluation pipeline, with the LLM tier run against a stub chat deployment.
+"""
+
+import json
+
+import pytest
+
+import async_runner
+import eval_pipeline
+import language_id
+from eval_pipeline import EvalPipeline
+from model_registry import AzureChatModel
+from stub_server import start_stub
+
+# JSON that fits every DeepEval schema used by the generator metrics, so every escalated record passes
+CONTENT = json.dumps({
+    "statements": ["The answer names the capital."],
+    "truths": ["Paris is the capital of France."],
+    "claims": ["Paris is the capital of France."],
+    "verdicts": [{"verdict": "yes", "reason": "Supported."}],
+    "reason": "The output is relevant and supported by the context."
+})
+
+ENGLISH = "The capital of France is Paris, and it is one of the largest cities of Europe."
+FRENCH = "La capitale de la France est Paris, et elle est une des plus grandes villes de l'Europe."
+RUSSIAN = "Столица Франции Париж, один из крупнейших городов Европы."
+
+
+@pytest.fixture(scope="module")
+def model():
+    def reply(body: bytes) -> dict:
+        return {
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": CONTENT}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}
+        }
+
+    server = start_stub(reply)
+    model = AzureChatModel(f"http://127.0.0.1:{server.server_port}", "pipeline", "stub")
+    yield model
+    # The async client is closed on the loop it runs on, see test_llm_governor
+    model.model.close()
+    async_runner.run(model.async_model.close())
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def lexical_scores(monkeypatch):
+    # Scripted lexical scores by generated content, to place records exactly on the band edges
+    scores = {}
+
+    def score_pairs(metric, threshold, tokenizer, language, pairs):
+        return [{"GLEU": {"Score": scores[generated]}} for generated, _ in pairs]
+
+    monkeypatch.setattr(eval_pipeline, "score_pairs", score_pairs)
+    return scores
+
+
+def record(generated: str, reference: str = ENGLISH, **fields) -> dict:
+    return {"prompt-field": "What is the capital of France?", "generated-content": generated,
+            "reference-content": reference, "facts": "Paris is the capital of France.", **fields}
+
+
+def pipeline(items: list[dict], llm_model="stub", **options) -> EvalPipeline:
+    return EvalPipeline(llm_model, 0.5, items, "answer", **options)
+
+
+def test_length_checks():
+    checks = {}
+    gate = pipeline([], min_words=3, max_length_ratio=2.0)
+
+    assert gate.check_length(record("  "), checks) == "The generated content is empty."
+    assert "fewer than 3" in gate.check_length(record("Paris, France"), checks)
+    assert "beyond a ratio of 2.0" in gate.check_length(record("Paris is the capital."), checks)
+    assert "beyond a ratio of 2.0" in gate.check_length(record(ENGLISH * 3), checks)
+    assert gate.check_length(record(ENGLISH[:len(ENGLISH) // 2 + 1]), checks) is None
+    assert checks["Length"]["Reference Characters"] == len("".join(ENGLISH.split()))
+    # Without a reference or with a ratio of 0, only the words are counted
+    assert gate.check_length(record("Paris is the capital.", ""), checks) is None
+    assert pipeline([], max_length_ratio=0).check_length(record("Paris is it.", ENGLISH * 10), checks) is None
+
+
+def test_language_identification():
+    assert language_id.identify(ENGLISH) == ("english", "Latin")
+    assert language_id.identify(FRENCH) == ("french", "Latin")
+    assert language_id.identify("Η πρωτεύουσα της Γαλλίας είναι το Παρίσι.") == ("greek", "Greek")
+    # Several languages are written in Cyrillic, so the script alone does not tell which
+    assert language_id.identify(RUSSIAN) == (None, "Cyrillic")
+    # Too few function words to tell the language
+    assert language_id.identify("Paris, France") == (None, "Latin")
+    assert language_id.identify("2024 — 42") == (None, None)
+
+
+def test_language_mismatch():
+    assert language_id.mismatch(FRENCH, "english") == ("french", "Latin", True)
+    assert language_id.mismatch(RUSSIAN, "English") == (None, "Cyrillic", True)
+    assert language_id.mismatch(ENGLISH, "english") == ("english", "Latin", False)
+    assert language_id.mismatch("Paris, France", "english")[2] is False
+    # Languages not known here are only ruled out by their script
+    assert language_id.mismatch(ENGLISH, "finnish")[2] is False
+    assert language_id.mismatch(RUSSIAN, "ukrainian")[2] is False
+    assert language_id.mismatch(ENGLISH, "ukrainian")[2] is True
+    assert language_id.mismatch("東京都", "japanese")[2] is False
+
+
+def test_language_gate(lexical_scores):
+    lexical_scores.update({ENGLISH: 1.0, FRENCH: 1.0})
+    items = [record(FRENCH, FRENCH), record(ENGLISH), record(RUSSIAN, RUSSIAN)]
+
+    result = pipeline(items).evaluate()
+    assert [item["Tier"] for item in result["Items"]] == ["Language", "Lexical", "Language"]
+    assert result["Items"][0]["Reason"] == "The generated content is written in french, not english."
+    assert result["Items"][0]["Checks"]["Language"] == {"Detected": "french", "Script": "Latin"}
+    assert result["Items"][2]["Reason"] == "The generated content is written in Cyrillic script, not english."
+
+    result = pipeline(items[:2], language="french").evaluate()
+    assert [item["Tier"] for item in result["Items"]] == ["Lexical", "Language"]
+
+    result = pipeline(items[:2], detect_language=False).evaluate()
+    assert [item["Tier"] for item in result["Items"]] == ["Lexical", "Lexical"]
+    assert "Language" not in result["Items"][0]["Checks"]
+
+
+def test_detect_language_must_be_a_boolean():
+    with pytest.raises(ValueError, match="detect-language"):
+        pipeline([], detect_language="false")
+
+
+def test_lexical_band_edges(lexical_scores, model):
+    texts = [f"{ENGLISH} Variant {index}." for index in range(4)]
+    lexical_scores.update(zip(texts, (0.0999, 0.1, 0.8999, 0.9)))
+    measured = []
+
+    result = pipeline([record(text) for text in texts], model).evaluate(
+                store=lambda item, outcome: measured.append(item['generated-content']))
+    items = result["Items"]
+
+    assert [(item["Tier"], item["Result"]) for item in items] == [
+        ("Lexical", False), ("LLM", True), ("LLM", True), ("Lexical", True)]
+    assert items[0]["Reason"] == "The lexical score 0.0999 is below 0.1."
+    assert items[1]["Reason"] == "The lexical score 0.1 is within the uncertainty band [0.1, 0.9)."
+    assert items[3]["Reason"] == "The lexical score 0.9 is at least 0.9."
+    # Only the records in the band reach the LLM
+    assert measured == texts[1:3]
+    assert items[1]["Answer Relevancy"]["Score"] == 1.0
+    assert "Answer Relevancy" not in items[0] and "Answer Relevancy" not in items[3]
+
+
+def test_only_undecided_records_are_escalated(lexical_scores, model):
+    lexical_scores.update({ENGLISH: 0.5, "Paris is the capital of France.": 0.95})
+    items = [
+        record(""),
+        record(RUSSIAN),
+        record("Paris is the capital of France.", "Paris is the capital city of France."),
+        record(ENGLISH),
+        record(ENGLISH, "", id="no-reference"),
+    ]
+    measured = []
+
+    result = pipeline(items, model).evaluate(store=lambda item, outcome: measured.append(item))
+
+    assert [item["Tier"] for item in result["Items"]] == ["Length", "Language", "Lexical", "LLM", "LLM"]
+    assert result["Items"][4]["Reason"] == "There is no reference content to score the generated content against."
+    assert result["Items"][4]["Id"] == "no-reference"
+    assert "Lexical" not in result["Items"][4]["Checks"]
+    # The record without reference content is escalated before the lexical tier runs
+    assert measured == [items[4], items[3]]
+
+    summary = result["Summary"]
+    assert summary["Tiers"] == {"Length": 1, "Language": 1, "Lexical": 1, "LLM": 2}
+    assert summary["Escalation Rate"] == 0.4
+    assert summary["Pass Rate"] == 0.6
+    assert summary["LLM"]["Count"] == 2
+    assert summary["Usage"]["Calls"] > 0
+
+
+def test_nothing_is_escalated_when_the_gates_decide(lexical_scores):
+    lexical_scores[ENGLISH] = 1.0
+
+    # The LLM tier is never reached, so the model is never called
+    result = pipeline([record(ENGLISH), record("")], object()).evaluate()
+
+    assert result["Summary"]["Tiers"] == {"Length": 1, "Language": 0, "Lexical": 1, "LLM": 0}
+    assert result["Summary"]["LLM"] is None
+    assert result["Summary"]["Usage"]["Calls"] == 0
@@ -0,0 +1,155 @@
+"""
+The shared HTTP client's retries, Retry-After handling and rate limiting against a local stub API.
+"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+import http_client
+from stub_server import start_stub
+
+
+class Api:
+    """
+    Stub API answering with the scripted statuses first, then with successes.
+    """
+
+    def __init__(self, script: list[int] = (), retry_after: str = None):
+        self.script = list(script)
+        self.retry_after = retry_after
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = start_stub(self.reply)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def reply(self, body: bytes):
+        with self.lock:
+            self.requests += 1
+            status = self.script.pop(0) if self.script else 200
+        if status != 200:
+            return status, {"error": status}, {"Retry-After": self.retry_after} if self.retry_after else {}
+        return {"ok": True}
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class CountingLimiter(http_client.RateLimiter):
+    """
+    Rate limiter counting the tokens taken.
+    """
+
+    def __init__(self, rate: float = 0, burst: int = 1):
+        super().__init__(rate, burst)
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+        super().acquire()
+
+
+@pytest.fixture
+def apis(monkeypatch):
+    monkeypatch.setenv("CUTE_HTTP_RETRIES", "3")
+    monkeypatch.setenv("CUTE_HTTP_BACKOFF", "0")
+    started = []
+
+    def start(*args, **kwargs) -> Api:
+        started.append(Api(*args, **kwargs))
+        return started[-1]
+
+    yield start
+    for api in started:
+        api.stop()
+
+
+def test_retryable_statuses_are_retried(apis):
+    api = apis([503, 429, 500])
+    limiter = CountingLimiter()
+
+    response = http_client.request("GET", api.url, limiter)
+
+    assert response.json() == {"ok": True}
+    assert api.requests == 4
+    assert limiter.acquired == 4
+
+
+def test_other_errors_are_not_retried(apis):
+    api = apis([400])
+
+    with pytest.raises(requests.HTTPError) as error:
+        http_client.request("GET", api.url)
+    assert error.value.response.status_code == 400
+    assert api.requests == 1
+
+
+def test_errors_are_raised_after_the_retries(apis, monkeypatch):
+    monkeypatch.setenv("CUTE_HTTP_RETRIES", "2")
+    api = apis([503] * 5)
+
+    with pytest.raises(requests.HTTPError) as error:
+        http_client.request("GET", api.url)
+    assert error.value.response.status_code == 503
+    assert api.requests == 3
+
+
+def test_retry_after_is_honored(apis):
+    api = apis([429], retry_after="0.3")
+
+    started = time.monotonic()
+    http_client.request("GET", api.url)
+
+    assert time.monotonic() - started >= 0.3
+    assert api.requests == 2
+
+
+def test_retry_after_beyond_the_cap_is_not_waited_for(apis):
+    api = apis([429], retry_after=str(int(http_client.MAX_BACKOFF) + 60))
+
+    started = time.monotonic()
+    with pytest.raises(requests.HTTPError) as error:
+        http_client.request("GET", api.url)
+
+    assert error.value.response.status_code == 429
+    assert time.monotonic() - started < 1
+    assert api.requests == 1
+
+
+def test_connection_errors_are_retried(apis):
+    api = apis()
+    api.stop()
+    limiter = CountingLimiter()
+
+    with pytest.raises(requests.ConnectionError):
+        http_client.request("GET", api.url, limiter)
+    assert limiter.acquired == 4
+
+
+def test_every_attempt_takes_a_token(apis):
+    # 10 calls per second: the two retries each wait a tenth of a second for their token
+    api = apis([503, 503])
+    limiter = CountingLimiter(rate=10)
+
+    started = time.monotonic()
+    http_client.request("GET", api.url, limiter)
+
+    assert time.monotonic() - started >= 0.18
+    assert limiter.acquired == 3
+    assert api.requests == 3
+
+
+def test_rate_limiter_allows_bursts():
+    limiter = http_client.RateLimiter(rate=10, burst=3)
+
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    burst = time.monotonic() - started
+    limiter.acquire()
+
+    assert burst < 0.05
+    assert time.monotonic() - started >= 0.09
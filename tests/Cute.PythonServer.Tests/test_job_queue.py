@@ -0,0 +1,218 @@
+"""
+The persistent job queue run against a temporary SQLite database.
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import job_queue
+from job_queue import JobCancelled, JobQueue
+
+
+class FastJobQueue(JobQueue):
+    """
+    Job queue polling and sending heartbeats often, so requeued jobs are picked up within a test.
+    """
+
+    POLL_INTERVAL = 0.05
+    HEARTBEAT_INTERVAL = 0.05
+    STALE_AFTER = 0.5
+
+
+class Runner:
+    """
+    Job runner recording the jobs it ran. Jobs with a "wait" option block until released.
+    """
+
+    def __init__(self):
+        self.ran = []
+        self.payloads = {}
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, job: job_queue.Job) -> dict:
+        self.ran.append(job.payload['options']['name'])
+        self.payloads[job.id] = job.payload
+        self.started.set()
+        options = job.payload['options']
+        for item in range(options.get('items', 0)):
+            if job.cancelled():
+                raise JobCancelled()
+            job.add_result({"Item": item})
+            time.sleep(0.01)
+        if options.get('wait'):
+            self.release.wait(10)
+        return {"Name": options['name']}
+
+
+@pytest.fixture
+def queues(tmp_path):
+    started = []
+
+    def start(runner, workers: int = 1, **kwargs) -> JobQueue:
+        started.append(FastJobQueue(str(tmp_path / "jobs.sqlite3"), runner, workers, **kwargs))
+        return started[-1]
+
+    yield start
+    for queue in started:
+        if not queue.stopping:
+            queue.stop()
+
+
+def submit(queue: JobQueue, name: str, priority: int = 0, family: str = "translator", **options) -> str:
+    return queue.submit(f"{family}/all", family, {"options": {"name": name, **options}}, priority)["Id"]
+
+
+def wait_for(queue: JobQueue, job_id: str, statuses: tuple = ("completed", "failed", "cancelled")) -> dict:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        status = queue.get(job_id)
+        if status["Status"] in statuses:
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} is still {queue.get(job_id)['Status']}")
+
+
+def test_jobs_run_in_priority_order(queues):
+    runner = Runner()
+    queue = queues(runner)
+    # The only worker is busy while the other jobs are queued
+    blocker = submit(queue, "blocker", wait=True)
+    assert runner.started.wait(5)
+    low, high, later_high = submit(queue, "low"), submit(queue, "high", 5), submit(queue, "later high", 5)
+
+    assert queue.get(later_high)["Position"] == 2
+    assert queue.get(low)["Position"] == 3
+    runner.release.set()
+
+    for job_id in (blocker, low, high, later_high):
+        assert wait_for(queue, job_id)["Status"] == "completed"
+    assert runner.ran == ["blocker", "high", "later high", "low"]
+    assert queue.get(high)["Result"] == {"Name": "high"}
+
+
+def test_family_limits(queues):
+    runner = Runner()
+    queue = queues(runner, workers=2, limits={"seo": 1})
+    first = submit(queue, "first", family="seo", wait=True)
+    assert runner.started.wait(5)
+    second = submit(queue, "second", family="seo")
+    other = submit(queue, "other")
+
+    # The second worker skips the SEO job over the limit and takes the next family's job
+    assert wait_for(queue, other)["Status"] == "completed"
+    assert queue.get(second)["Status"] == "queued"
+    runner.release.set()
+    assert wait_for(queue, second)["Status"] == "completed"
+    assert runner.ran == ["first", "other", "second"]
+    assert queue.get(first)["Status"] == "completed"
+
+
+def test_queue_size_is_bounded(queues):
+    queue = queues(Runner(), workers=0, max_queued=2)
+    submit(queue, "first")
+    submit(queue, "second")
+
+    with pytest.raises(job_queue.QueueFull):
+        submit(queue, "third")
+    assert queue.stats()["Jobs"]["Queued"] == 2
+
+
+def test_cancel_queued_job(queues):
+    queue = queues(Runner(), workers=0)
+    job_id = submit(queue, "queued")
+
+    status = queue.cancel(job_id)
+
+    assert status["Status"] == "cancelled" and status["Finished"] is not None
+    assert queue.cancel("missing") is None
+
+
+def test_cancel_running_batch_job(queues):
+    runner = Runner()
+    queue = queues(runner)
+    job_id = submit(queue, "batch", items=10000)
+    # Once results are stored, the runner is past its first check for cancellation, which reads the database at
+    # once; later checks are half a second apart
+    while queue.get(job_id)["Completed Items"] == 0:
+        time.sleep(0.02)
+
+    assert queue.cancel(job_id)["Cancelling"] is True
+    status = wait_for(queue, job_id)
+
+    assert status["Status"] == "cancelled"
+    assert "Result" not in status
+    # The results stored before the job stopped can still be read
+    assert 0 < status["Completed Items"] < 10000
+    assert len(status["Results"]["Items"]) == status["Completed Items"]
+    assert queue.get(job_id, offset=status["Completed Items"] - 1)["Results"]["Items"] == [
+        {"Item": status["Completed Items"] - 1}]
+
+
+def test_job_of_a_stopped_process_is_requeued(queues):
+    # The first process stops sending heartbeats while its job runs, as if it was killed
+    stalled = Runner()
+    first = queues(stalled)
+    job_id = submit(first, "stalled", wait=True)
+    assert stalled.started.wait(5)
+    first.stop()
+
+    runner = Runner()
+    runner.release.set()
+    second = queues(runner)
+    status = wait_for(second, job_id, ("completed",))
+    assert runner.ran == ["stalled"]
+    assert status["Result"] == {"Name": "stalled"}
+
+    # The abandoned run no longer owns the job, so finishing it does not overwrite the result
+    stalled.release.set()
+    time.sleep(0.1)
+    assert second.get(job_id)["Status"] == "completed"
+
+
+def test_queued_jobs_resume_after_a_restart(queues):
+    first = queues(Runner(), workers=0)
+    jobs = [submit(first, name) for name in ("one", "two")]
+    first.stop()
+
+    runner = Runner()
+    second = queues(runner)
+
+    assert [wait_for(second, job_id)["Status"] for job_id in jobs] == ["completed", "completed"]
+    assert runner.ran == ["one", "two"]
+
+
+def test_api_keys_stay_in_memory(queues, tmp_path):
+    runner = Runner()
+    queue = queues(runner)
+    env = {"Cute__OpenAiApiKey": "secret", "Cute__OpenAiEndpoint": "https://example"}
+    job_id = queue.submit("generator/all", "generator", {"options": {"name": "keyed"}, "env": env})["Id"]
+
+    wait_for(queue, job_id)
+
+    assert runner.payloads[job_id]["env"] == env
+    with sqlite3.connect(tmp_path / "jobs.sqlite3") as connection:
+        assert "secret" not in connection.execute("SELECT payload FROM jobs").fetchone()[0]
+
+
+def test_resume_starts_the_queue_of_an_existing_database(tmp_path, monkeypatch):
+    path = tmp_path / "resumed.sqlite3"
+    monkeypatch.setenv("CUTE_JOB_PATH", str(path))
+    # A malformed limit is ignored instead of failing the server at startup
+    monkeypatch.setenv("CUTE_JOB_LIMITS", "seo=two,generator=2")
+    monkeypatch.setattr(job_queue, "_queue", None)
+    runner = Runner()
+
+    job_queue.resume(runner)
+    assert job_queue.started() is None
+
+    sqlite3.connect(path).close()
+    try:
+        job_queue.resume(runner)
+        assert job_queue.started().limits == {"generator": 2}
+    finally:
+        job_queue.shutdown()
+    assert job_queue.started() is None
@@ -0,0 +1,109 @@
+"""
+Equivalence of the indexed hLEPOR engine with hlepor.single_hlepor_score.
+"""
+
+import random
+
+import pytest
+
+from hlepor import single_hlepor_score
+
+import lepor_engine
+
+SENTENCES = ["the cat sat on the mat and the dog sat on the rug",
+             "a quick brown fox jumps over the lazy dog",
+             "the house at the end of the street is the oldest house in the town",
+             "she said that the report was ready but the report was not ready"]
+
+
+def package_hlepor(reference: list[str], hypothesis: list[str]) -> float:
+    # The tokens are joined and split again by the package, without its preprocessing
+    return float(single_hlepor_score(" ".join(reference), " ".join(hypothesis), preprocess=str,
+                                     separate_punctuation=False))
+
+
+def perturb(tokens: list[str], rng: random.Random, vocabulary: list[str], rate: float = 0.2) -> list[str]:
+    output = []
+    for token in tokens:
+        roll = rng.random()
+        if roll < rate / 2:
+            output.append(rng.choice(vocabulary))
+        elif roll >= rate * 3 / 4:
+            output.append(token)
+    if len(output) > 2 and rng.random() < rate:
+        i = rng.randrange(len(output) - 1)
+        output[i], output[i + 1] = output[i + 1], output[i]
+    return output
+
+
+def random_pairs(count: int, seed: int, vocabulary_size: int, max_length: int) -> list[tuple[list[str], list[str]]]:
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(vocabulary_size)]
+    pairs = []
+    for _ in range(count):
+        reference = rng.choices(vocabulary, k=rng.randint(1, max_length))
+        hypothesis = perturb(reference, rng, vocabulary, 0.4) or [rng.choice(vocabulary)]
+        pairs.append((reference, hypothesis))
+    return pairs
+
+
+def long_document(words: int, seed: int) -> tuple[list[str], list[str]]:
+    rng = random.Random(seed)
+    sentences = [sentence.split() for sentence in SENTENCES]
+    vocabulary = sorted({word for sentence in sentences for word in sentence})
+    reference = []
+    while len(reference) < words:
+        reference += rng.choice(sentences)
+    return reference, perturb(reference, rng, vocabulary)
+
+
+FIXED = [
+    (["a"], ["a"]),
+    (["a"], ["b"]),
+    (["a", "b", "c"], ["c", "b", "a"]),
+    (["the", "cat", "sat"], ["the", "cat", "sat", "down"]),
+    (["the", "the", "the", "the"], ["the", "cat"]),
+    (["the", "cat"], ["the", "the", "the", "the"]),
+    (["a", "b", "a", "b", "a", "b"], ["b", "a", "b", "a"]),
+    (["x", "y", "x", "z", "x", "y", "x"], ["x", "x", "y", "z", "y", "x"]),
+    (SENTENCES[0].split(), SENTENCES[0].split()),
+    (SENTENCES[0].split(), "on the rug the dog sat and the cat sat on the mat".split()),
+    (SENTENCES[3].split(), "the report was not ready she said but the report was ready".split()),
+]
+
+# Small vocabularies repeat words, whose occurrences are aligned by their context
+CORPORA = random_pairs(300, 1, 4, 12) + random_pairs(300, 2, 30, 40) + random_pairs(50, 3, 500, 150)
+
+
+@pytest.mark.parametrize("reference, hypothesis", FIXED)
+def test_sentence_hlepor_fixed_pairs(reference, hypothesis):
+    assert lepor_engine.sentence_hlepor(reference, hypothesis) == pytest.approx(package_hlepor(reference, hypothesis))
+
+
+def test_batch_hlepor_random_corpora():
+    pairs = FIXED + CORPORA
+    scores = lepor_engine.batch_hlepor([reference for reference, _ in pairs], [hypothesis for _, hypothesis in pairs])
+    expected = [package_hlepor(reference, hypothesis) for reference, hypothesis in pairs]
+    assert scores.tolist() == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("words, seed", [(1000, 1), (2000, 2)])
+def test_sentence_hlepor_long_documents(words, seed):
+    reference, hypothesis = long_document(words, seed)
+    assert lepor_engine.sentence_hlepor(reference, hypothesis) == pytest.approx(package_hlepor(reference, hypothesis))
+
+
+@pytest.mark.parametrize("n, alpha, beta", [(1, 9.0, 1.0), (3, 1.0, 1.0)])
+def test_batch_hlepor_parameters(n, alpha, beta):
+    pairs = CORPORA[:200]
+    scores = lepor_engine.batch_hlepor([reference for reference, _ in pairs], [hypothesis for _, hypothesis in pairs],
+                                       alpha=alpha, beta=beta, n=n)
+    expected = [float(single_hlepor_score(" ".join(reference), " ".join(hypothesis), alpha=alpha, beta=beta, n=n,
+                                          preprocess=str, separate_punctuation=False))
+                for reference, hypothesis in pairs]
+    assert scores.tolist() == pytest.approx(expected)
+
+
+def test_batch_hlepor_empty_sides():
+    scores = lepor_engine.batch_hlepor([[], ["a"], []], [["a"], [], []])
+    assert scores.tolist() == [0.0, 0.0, 0.0]
@@ -0,0 +1,187 @@
+"""
+The LLM governor driven through the model client against a stub deployment that throttles with 429 and Retry-After.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import async_runner
+import llm_governor
+from model_registry import AzureChatModel
+from stub_server import start_stub
+
+PROMPT_TOKENS = 100
+COMPLETION_TOKENS = 20
+
+
+class Deployment:
+    """
+    Stub chat completions deployment answering with the scripted statuses first, then with successes.
+    """
+
+    def __init__(self, script: list[int] = (), retry_after: str = "0.2", latency: float = 0.0,
+                 prompt_tokens: int = PROMPT_TOKENS, completion_tokens: int = COMPLETION_TOKENS):
+        self.script = list(script)
+        self.retry_after = retry_after
+        self.latency = latency
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.requests = 0
+        self.in_flight = 0
+        self.most_in_flight = 0
+        # The window of the governor calling the deployment, as seen by each request
+        self.limits = []
+        self.governor = None
+        self.models = []
+        self.lock = threading.Lock()
+        self.server = start_stub(self.reply)
+
+    def reply(self, body: bytes):
+        with self.lock:
+            self.requests += 1
+            status = self.script.pop(0) if self.script else 200
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+            self.limits.append(self.governor.limit)
+        try:
+            time.sleep(self.latency)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        if status != 200:
+            return status, {"error": {"code": str(status), "message": "Rate limit exceeded."}}, \
+                {"retry-after": self.retry_after}
+        return {
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+            "usage": {"prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens,
+                      "total_tokens": self.prompt_tokens + self.completion_tokens}
+        }
+
+    def model(self, governor: llm_governor.Governor) -> AzureChatModel:
+        model = AzureChatModel(f"http://127.0.0.1:{self.server.server_port}", governor.name, "stub")
+        model.governor = self.governor = governor
+        self.models.append(model)
+        return model
+
+    def stop(self):
+        # The async clients are closed on the loop they run on, not when they are collected, which would close
+        # their sockets behind the loop's back
+        for model in self.models:
+            model.model.close()
+            async_runner.run(model.async_model.close())
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def deployments():
+    started = []
+
+    def start(*args, **kwargs) -> Deployment:
+        started.append(Deployment(*args, **kwargs))
+        return started[-1]
+
+    yield start
+    for deployment in started:
+        deployment.stop()
+
+
+def generate_all(model: AzureChatModel, calls: int) -> tuple[list, llm_governor.Usage]:
+    async def evaluate():
+        return await asyncio.gather(*(model.a_generate("Say ok.") for _ in range(calls)))
+
+    # On the shared event loop, like the generator endpoints, which the async client stays bound to
+    return async_runner.run(llm_governor.metered(evaluate()))
+
+
+def test_throttled_call_is_retried_after_retry_after(deployments):
+    deployment = deployments([429])
+    governor = llm_governor.Governor("throttled", maximum=8, initial=8, retries=3, backoff=0.01)
+
+    started = time.monotonic()
+    results, usage = generate_all(deployment.model(governor), 1)
+
+    assert results == ["ok"]
+    assert time.monotonic() - started >= 0.2
+    assert deployment.requests == 2
+    assert governor.limit == 4
+    assert usage.to_dict() == {"Calls": 1, "Retries": 1, "Throttled": 1, "Prompt Tokens": PROMPT_TOKENS,
+                               "Completion Tokens": COMPLETION_TOKENS,
+                               "Total Tokens": PROMPT_TOKENS + COMPLETION_TOKENS, "Cost": 0.0}
+    assert governor.stats() | {"Latency": None} == {"Concurrency Limit": 4, "In Flight": 0, "Latency": None,
+                                                     "Failures": 0, **usage.to_dict()}
+
+
+def test_window_shrinks_on_throttling_and_recovers(deployments):
+    deployment = deployments([429] * 8, retry_after="0.05", latency=0.02)
+    governor = llm_governor.Governor("recovering", maximum=8, initial=8, retries=5, backoff=0.01)
+    model = deployment.model(governor)
+
+    # The window is halved by the throttled calls, and their retries are sent through the smaller window
+    results, usage = generate_all(model, 8)
+    assert results == ["ok"] * 8
+    assert usage.throttled == 8 and usage.retries == 8 and usage.calls == 8
+    shrunk = min(deployment.limits)
+    assert shrunk <= 4
+
+    # Successful calls that use up the window grow it again, without exceeding the maximum
+    results, usage = generate_all(model, 80)
+    assert usage.calls == 80 and usage.throttled == 0
+    assert governor.limit > shrunk
+    assert governor.limit <= 8
+    assert deployment.most_in_flight <= 8
+    assert governor.stats()["Calls"] == 88
+
+
+def test_token_budget_holds_calls_back(deployments):
+    # Each call uses the whole quota of 30000 tokens per minute, so the next waits for the bucket to refill
+    deployment = deployments(prompt_tokens=29500, completion_tokens=500)
+    governor = llm_governor.Governor("budget", tokens_per_minute=30000)
+    model = deployment.model(governor)
+
+    started = time.monotonic()
+    model.generate("Say ok.")
+    first = time.monotonic() - started
+    model.generate("Say ok.")
+    second = time.monotonic() - started - first
+
+    assert first < 0.3
+    assert second >= 0.4
+    assert governor.stats()["Total Tokens"] == 60000
+
+
+def test_token_budget_reserve_and_settle():
+    budget = llm_governor.TokenBudget(600)
+    now = budget.updated
+
+    assert budget.reserve(500, now) == 0
+    assert budget.reserve(200, now) == pytest.approx(10)
+    # The call used more tokens than it reserved
+    budget.settle(300)
+    assert budget.level == -200
+    assert budget.reserve(100, now + 10) == pytest.approx(20)
+    assert llm_governor.TokenBudget(0).reserve(10 ** 9, now) == 0
+
+
+def test_failures_are_raised_and_counted(deployments, monkeypatch):
+    monkeypatch.setenv("CUTE_LLM_PROMPT_PRICE", "2")
+    monkeypatch.setenv("CUTE_LLM_COMPLETION_PRICE", "10")
+    deployment = deployments([429, 429, 400], retry_after="0")
+    governor = llm_governor.Governor("failing", retries=1, backoff=0.01)
+    model = deployment.model(governor)
+
+    with pytest.raises(Exception) as error:
+        model.generate("Say ok.")
+    assert getattr(error.value, "status_code", None) == 429
+    with pytest.raises(Exception) as error:
+        model.generate("Say ok.")
+    assert getattr(error.value, "status_code", None) == 400
+    assert model.generate("Say ok.") == "ok"
+
+    stats = governor.stats()
+    assert (stats["Calls"], stats["Retries"], stats["Throttled"], stats["Failures"]) == (1, 1, 2, 2)
+    assert stats["Cost"] == (PROMPT_TOKENS * 2 + COMPLETION_TOKENS * 10) / 1_000_000
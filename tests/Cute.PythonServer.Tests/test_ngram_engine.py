@@ -0,0 +1,79 @@
+"""
+Equivalence of the vectorized GLEU engine with nltk.translate.gleu_score.
+"""
+
+import random
+
+import pytest
+
+from nltk.translate.gleu_score import sentence_gleu as nltk_sentence_gleu
+
+import ngram_engine
+
+
+def random_pairs(count: int, seed: int, vocabulary_size: int, max_length: int) -> list[tuple[list[str], list[str]]]:
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(vocabulary_size)]
+    pairs = []
+    for _ in range(count):
+        reference = rng.choices(vocabulary, k=rng.randint(0, max_length))
+        hypothesis = [token if rng.random() > 0.3 else rng.choice(vocabulary) for token in reference]
+        if hypothesis and rng.random() < 0.3:
+            del hypothesis[rng.randrange(len(hypothesis))]
+        pairs.append((hypothesis, reference))
+    return pairs
+
+
+EDGE_CASES = [
+    ([], []),
+    ([], ["a", "b", "c"]),
+    (["a", "b", "c"], []),
+    (["a"], ["a"]),
+    (["a"], ["b"]),
+    (["a", "b"], ["a", "b", "c"]),
+    (["a", "b", "c"], ["c", "b", "a"]),
+    (["the", "the", "the", "the"], ["the", "cat"]),
+    (["a", "b", "a", "b", "a", "b"], ["a", "b", "a", "b"]),
+    (["x", "y", "x", "y", "x"], ["x", "y", "x", "y", "x"]),
+]
+
+# Small vocabularies repeat n-grams often, which exercises the clipping of repeated n-gram counts
+CORPORA = random_pairs(300, 1, 5, 12) + random_pairs(300, 2, 50, 40) + random_pairs(50, 3, 1000, 200)
+
+
+@pytest.mark.parametrize("hypothesis, reference", EDGE_CASES)
+def test_sentence_gleu_edge_cases(hypothesis, reference):
+    assert ngram_engine.sentence_gleu([reference], hypothesis) == pytest.approx(
+        nltk_sentence_gleu([reference], hypothesis))
+
+
+def test_sentence_gleu_random_corpora():
+    for hypothesis, reference in CORPORA:
+        assert ngram_engine.sentence_gleu([reference], hypothesis) == pytest.approx(
+            nltk_sentence_gleu([reference], hypothesis)), (hypothesis, reference)
+
+
+def test_sentence_gleu_multiple_references():
+    pairs = random_pairs(100, 4, 8, 15)
+    for (hypothesis, first), (_, second) in zip(pairs, pairs[1:]):
+        references = [first, second]
+        assert ngram_engine.sentence_gleu(references, hypothesis) == pytest.approx(
+            nltk_sentence_gleu(references, hypothesis))
+
+
+@pytest.mark.parametrize("min_len, max_len", [(1, 1), (2, 3), (1, 2)])
+def test_sentence_gleu_orders(min_len, max_len):
+    for hypothesis, reference in CORPORA[:200]:
+        assert ngram_engine.sentence_gleu([reference], hypothesis, min_len, max_len) == pytest.approx(
+            nltk_sentence_gleu([reference], hypothesis, min_len, max_len))
+
+
+def test_batch_gleu_matches_sentence_gleu():
+    pairs = EDGE_CASES + CORPORA
+    scores = ngram_engine.batch_gleu([hypothesis for hypothesis, _ in pairs], [reference for _, reference in pairs])
+    expected = [nltk_sentence_gleu([reference], hypothesis) for hypothesis, reference in pairs]
+    assert scores.tolist() == pytest.approx(expected)
+
+
+def test_batch_gleu_empty_batch():
+    assert len(ngram_engine.batch_gleu([], [])) == 0
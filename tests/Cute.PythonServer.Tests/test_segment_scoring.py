@@ -0,0 +1,136 @@
+"""
+Sentence alignment and segment caching of the segmented translation scores.
+"""
+
+import pytest
+
+import segment_scoring
+from segment_scoring import EvalTranslationSegments, align, split_sentences
+
+SENTENCES = [
+    "The first sentence is here and it is fairly long.",
+    "Then a second one follows it closely.",
+    "A third sentence talks about the weather today.",
+    "The fifth sentence describes the city at night.",
+    "And the last sentence closes the whole text.",
+]
+LONG = "A long sentence that covers both of the reference parts here."
+SPLIT = ["A long sentence that covers", "both of the reference parts here."]
+
+
+def test_split_sentences():
+    assert split_sentences("One. Two!\nThree?  Four") == ["One.", "Two!", "Three?", "Four"]
+    assert split_sentences("一。二！") == ["一。", "二！"]
+    assert split_sentences(" \n ") == []
+
+
+def test_align_one_to_one():
+    assert align(SENTENCES, SENTENCES) == list(zip(SENTENCES, SENTENCES))
+
+
+def test_align_sentence_split_by_the_translation():
+    hypothesis = SENTENCES[:2] + SPLIT + SENTENCES[2:]
+    reference = SENTENCES[:2] + [LONG] + SENTENCES[2:]
+
+    assert align(hypothesis, reference) == (list(zip(SENTENCES[:2], SENTENCES[:2])) + [(" ".join(SPLIT), LONG)]
+                                            + list(zip(SENTENCES[2:], SENTENCES[2:])))
+
+
+def test_align_sentences_merged_by_the_translation():
+    hypothesis = SENTENCES[:2] + [LONG] + SENTENCES[2:]
+    reference = SENTENCES[:2] + SPLIT + SENTENCES[2:]
+
+    assert align(hypothesis, reference) == (list(zip(SENTENCES[:2], SENTENCES[:2])) + [(LONG, " ".join(SPLIT))]
+                                            + list(zip(SENTENCES[2:], SENTENCES[2:])))
+
+
+def test_align_sentences_without_counterpart():
+    # A sentence is only left unmatched when there is no neighbour to merge it with
+    assert align([], SENTENCES[:2]) == [("", SENTENCES[0]), ("", SENTENCES[1])]
+    assert align(SENTENCES[:1], []) == [(SENTENCES[0], "")]
+    assert align([], []) == []
+
+
+def test_unmatched_sentences_score_zero():
+    result = EvalTranslationSegments(0.5, "", " ".join(SENTENCES[:2])).evaluate("gleu")
+
+    assert result["GLEU"]["Score"] == 0
+    assert [segment["Scores"]["GLEU"] for segment in result["Segments"]] == [0.0, 0.0]
+    assert result["Segmentation"] == {"Segments": 2, "Scored": 0, "Cached": 2}
+
+
+class SegmentCache:
+    """
+    Segment score store counting lookups and stores.
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self.lookups = 0
+        self.stores = 0
+
+    def lookup(self, name: str, generated: str, reference: str) -> float | None:
+        self.lookups += 1
+        return self.scores.get((name, generated, reference))
+
+    def store(self, name: str, generated: str, reference: str, score: float):
+        self.stores += 1
+        self.scores[(name, generated, reference)] = score
+
+
+def evaluate(generated: list[str], cache: SegmentCache, metric: str = "gleu") -> dict:
+    reference = " ".join(SENTENCES)
+    return EvalTranslationSegments(0.5, " ".join(generated), reference).evaluate(metric, cache.lookup, cache.store)
+
+
+def test_segments_are_scored_once(monkeypatch):
+    scored = []
+    score_pairs = segment_scoring.score_pairs
+
+    def counting_score_pairs(metric, threshold, tokenizer, language, pairs):
+        scored.extend(pairs)
+        return score_pairs(metric, threshold, tokenizer, language, pairs)
+
+    monkeypatch.setattr(segment_scoring, "score_pairs", counting_score_pairs)
+    cache = SegmentCache()
+    generated = list(SENTENCES)
+    generated[1] = "Then a second one follows it."
+
+    first = evaluate(generated, cache)
+    assert first["Segmentation"] == {"Segments": 5, "Scored": 5, "Cached": 0}
+    assert cache.stores == 5 and len(scored) == 5
+
+    # Re-evaluating the same field finds every segment
+    second = evaluate(generated, cache)
+    assert second["Segmentation"] == {"Segments": 5, "Scored": 0, "Cached": 5}
+    assert cache.stores == 5 and len(scored) == 5
+    assert second["Segments"] == first["Segments"]
+
+    # Editing one sentence only scores that segment
+    generated[3] = "The fifth sentence describes the town by night."
+    third = evaluate(generated, cache)
+    assert third["Segmentation"] == {"Segments": 5, "Scored": 1, "Cached": 4}
+    assert scored[-1] == (generated[3], SENTENCES[3])
+
+
+def test_segments_missing_a_metric_are_rescored():
+    cache = SegmentCache()
+    evaluate(SENTENCES, cache, "gleu")
+
+    result = evaluate(SENTENCES, cache, "lepor")
+
+    assert result["Segmentation"] == {"Segments": 5, "Scored": 5, "Cached": 0}
+    assert {name for name, _, _ in cache.scores} == {"GLEU", "LEPOR"}
+
+
+def test_impacts_add_up_to_the_lost_score():
+    generated = list(SENTENCES)
+    generated[2] = "Something else entirely."
+    generated[4] = "And the last sentence ends the text."
+
+    result = evaluate(generated, SegmentCache())
+    impacts = [segment["Impact"] for segment in result["Segments"]]
+
+    assert sum(impacts) == pytest.approx(1 - result["GLEU"]["Score"], abs=0.01)
+    assert result["Weakest Segments"] == [2, 4]
+    assert impacts[0] == impacts[1] == impacts[3] == 0